@@ -0,0 +1,264 @@
+"""Zmaterializowana warstwa agregatów miesięcznych, wspólna dla modułów panelu.
+
+Kostka ma jeden wiersz na (Rok, Miesiąc, Indeks, Kategoria, Rodzaj promocji) i sumy
+miar. Tabele i wykresy liczymy z niej tanim groupby, zamiast skanować surowe wiersze
+przy każdym przebiegu skryptu.
+
+Liczności unikalnych wartości da się zwijać: Indeks jest częścią klucza kostki, a dla
+Id promocji trzymamy osobny zbiór (komórka kostki bez Indeksu, Id promocji). Zliczenie
+unikalnych po dowolnym zwinięciu lub filtrze to wtedy nunique na tych tabelach.
+
+Dane rynkowe są powtórzone w każdym wierszu leku w danym miesiącu, więc nie wolno
+ich sumować po wierszach. Trzymamy je w osobnym wymiarze – jeden wiersz na
+(Rok, Miesiąc, Indeks) – i dołączamy do sum NEUCA dopiero przy liczeniu udziałów.
+
+Wszystkie trzy tabele mają wiersze tylko z jednego miesiąca, więc zapisujemy je
+w magazynie partycjami Rok/Miesiąc. Nowy miesiąc danych przelicza wtedy tylko
+swoje partycje (przelicz_okresy), a panel wczytuje gotowe agregaty z dysku.
+"""
+import os
+import shutil
+import threading
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import dane
+
+BRAK_PROMOCJI = "Normalna sprzedaż"
+
+# Koszyk promocji wynika z rodzaju promocji, więc nie zwiększa liczby wierszy kostki
+KLUCZ_KOSTKI = ["Rok", "Miesiąc", "Indeks", "Kategoria nazwa", "Rodzaj promocji poziom 2", "Koszyk promocji"]
+KLUCZ_PROMOCJI = ["Rok", "Miesiąc", "Kategoria nazwa", "Rodzaj promocji poziom 2", "Id promocji"]
+KLUCZ_RYNKU = ["Rok", "Miesiąc", "Indeks"]
+MIARY = [
+    "Sprzedaż ilość",
+    "Sprzedaż budżetowa",
+    "Sprzedaż budżetowa ZP",
+    "Sprzedaż budżetowa promocyjna",
+]
+MIARY_RYNKU = ["Sprzedaż rynek ilość", "Sprzedaż rynek wartość"]
+# Kolumny magazynu potrzebne do zbudowania agregatów (koszyk promocji dolicza warstwa danych)
+KOLUMNY_KOSTKI = ["Rok", "Miesiąc", "Indeks", "Kategoria nazwa", "Rodzaj promocji poziom 2", "Id promocji"] + MIARY + MIARY_RYNKU
+
+_KATALOG_AGREGATOW = "agregaty"
+_TABELE = ["kostka", "promocje", "rynek"]
+# Kolumny liczone przy odczycie z klucza okresu – nie zapisujemy ich
+_KOLUMNY_WYLICZANE = ["Okres", "Data"]
+
+_blokada_zapisu = threading.Lock()
+
+
+def _blokada_agregatow(katalog):
+    # Osobny plik niż blokada magazynu – przygotuj_agregaty trzyma ją, oznaczając agregaty w metadanych
+    return dane.blokada_plikowa(os.path.join(katalog, _KATALOG_AGREGATOW + ".blokada"), _blokada_zapisu)
+
+
+@dataclass
+class Agregaty:
+    """Kostka miar, zbiór unikalnych promocji i wymiar rynku wraz z przesunięciami leków."""
+
+    kostka: pd.DataFrame
+    promocje: pd.DataFrame
+    rynek: pd.DataFrame
+    indeks_kostki: dane.IndeksLekow
+    indeks_rynku: dane.IndeksLekow
+    okresy: list
+
+    def widok(self):
+        """Płytka kopia (Copy-on-Write) – bez kopiowania danych, zmiany nie trafiają do cache."""
+        return replace(
+            self,
+            kostka=self.kostka.copy(deep=False),
+            promocje=self.promocje.copy(deep=False),
+            rynek=self.rynek.copy(deep=False),
+        )
+
+    def kostka_leku(self, indeks):
+        return self.kostka.iloc[self.indeks_kostki.zakres(indeks)]
+
+    def rynek_leku(self, indeks):
+        return self.rynek.iloc[self.indeks_rynku.zakres(indeks)]
+
+
+def uzupelnij_promocje(rodzaj_promocji):
+    """Zastępuje brak rodzaju promocji wartością "Normalna sprzedaż" (także dla kolumny kategorycznej)."""
+    if isinstance(rodzaj_promocji.dtype, pd.CategoricalDtype):
+        kategorie = rodzaj_promocji.cat.categories.union([BRAK_PROMOCJI])
+        rodzaj_promocji = rodzaj_promocji.cat.set_categories(kategorie)
+    return rodzaj_promocji.fillna(BRAK_PROMOCJI)
+
+
+def zbuduj_kostke(df):
+    """Buduje kostkę miar i zbiór unikalnych promocji z surowych wierszy.
+
+    Miary nieaddytywne liczymy per wiersz przed agregacją: budżet "pozostały"
+    (przycięty do zera) oraz sumę i liczbę cen jednostkowych do średniej.
+    Kostka jest posortowana po Indeksie i okresie, żeby dało się ją ciąć IndeksemLekow
+    i dane.wytnij_okres; kolumna Data (początek miesiąca) służy wykresom trendów.
+    """
+    zp = df["Sprzedaż budżetowa ZP"].fillna(0)
+    promocyjna = df["Sprzedaż budżetowa promocyjna"].fillna(0)
+    ilosc = df["Sprzedaż ilość"].astype("float64")
+    ramka = df[KLUCZ_KOSTKI + ["Id promocji"] + MIARY].assign(**{
+        "Rodzaj promocji poziom 2": uzupelnij_promocje(df["Rodzaj promocji poziom 2"]),
+        "Budżet normalna": (df["Sprzedaż budżetowa"] - zp - promocyjna).clip(lower=0),
+        "Cena jednostkowa": df["Sprzedaż budżetowa"] / ilosc.where(ilosc != 0, np.nan),
+    })
+
+    kostka = (
+        ramka.groupby(KLUCZ_KOSTKI, observed=True, dropna=False, sort=False)
+        .agg(
+            **{miara: (miara, "sum") for miara in MIARY + ["Budżet normalna"]},
+            **{
+                "Suma cen jednostkowych": ("Cena jednostkowa", "sum"),
+                "Liczba cen": ("Cena jednostkowa", "count"),
+                "Liczba wierszy": ("Rok", "size"),
+            },
+        )
+        .reset_index()
+    )
+    kostka = uporzadkuj_po_lekach(kostka)
+    kostka["Data"] = dane.poczatek_miesiaca(kostka["Okres"])
+
+    # Brak Id promocji zostaje jako osobny wiersz – dzięki temu komórki bez promocji
+    # dają liczność 0 zamiast znikać z tabel
+    promocje = ramka[KLUCZ_PROMOCJI].drop_duplicates(ignore_index=True)
+    promocje["Okres"] = dane.klucz_okresu(promocje["Rok"], promocje["Miesiąc"])
+    return kostka, promocje
+
+
+def uporzadkuj_po_lekach(ramka):
+    """Dodaje klucz okresu i sortuje po (Indeks, Okres) – układ wymagany przez IndeksLekow i wytnij_okres."""
+    ramka["Okres"] = dane.klucz_okresu(ramka["Rok"], ramka["Miesiąc"])
+    return ramka.sort_values(["Indeks", "Okres"], kind="stable", ignore_index=True)
+
+
+def zbuduj_wymiar_rynku(df):
+    """Dane rynkowe raz na (Rok, Miesiąc, Indeks) – jedno liniowe groupby zamiast drop_duplicates."""
+    rynek = df.groupby(KLUCZ_RYNKU, observed=True, sort=False)[MIARY_RYNKU].first().reset_index()
+    return uporzadkuj_po_lekach(rynek)
+
+
+def zbuduj_agregaty(df):
+    kostka, promocje = zbuduj_kostke(df)
+    return zloz_agregaty(kostka, promocje, zbuduj_wymiar_rynku(df))
+
+
+def zloz_agregaty(kostka, promocje, rynek):
+    """Agregaty z gotowych tabel (posortowanych przez uporzadkuj_po_lekach) – wspólne dla silników."""
+    return Agregaty(
+        kostka=kostka,
+        promocje=promocje,
+        rynek=rynek,
+        indeks_kostki=dane.IndeksLekow(kostka["Indeks"]),
+        indeks_rynku=dane.IndeksLekow(rynek["Indeks"]),
+        okresy=np.unique(kostka["Okres"]).tolist(),
+    )
+
+
+def udzialy_miesieczne(agregaty):
+    """Udział NEUCA w rynku i struktura sprzedaży (ZP / promocyjna / pozostała) wg miesięcy."""
+    neuca = agregaty.kostka.groupby(["Rok", "Miesiąc"]).agg(
+        Neuca_sprzedaz=("Sprzedaż budżetowa", "sum"),
+        Sprzedaz_zp=("Sprzedaż budżetowa ZP", "sum"),
+        Sprzedaz_promo=("Sprzedaż budżetowa promocyjna", "sum"),
+    )
+    rynek = agregaty.rynek.groupby(["Rok", "Miesiąc"]).agg(
+        Rynek_sprzedaz=("Sprzedaż rynek wartość", "sum"),
+    )
+    dane_miesieczne = neuca.join(rynek, how="left").reset_index()
+
+    # Udział NEUCA na rynku
+    dane_miesieczne["Udział NEUCA [%]"] = round(
+        100 * dane_miesieczne["Neuca_sprzedaz"] / dane_miesieczne["Rynek_sprzedaz"], 2
+    )
+    # Struktura sprzedaży wewnątrz NEUCA
+    dane_miesieczne["ZP - %"] = round(100 * dane_miesieczne["Sprzedaz_zp"] / dane_miesieczne["Neuca_sprzedaz"], 2)
+    dane_miesieczne["Promo - %"] = round(100 * dane_miesieczne["Sprzedaz_promo"] / dane_miesieczne["Neuca_sprzedaz"], 2)
+    dane_miesieczne["Pozostałe - %"] = 100 - dane_miesieczne["ZP - %"] - dane_miesieczne["Promo - %"]
+    return dane_miesieczne
+
+
+# --------------- ZAPIS W MAGAZYNIE ----------------------
+def _sciezka(katalog, tabela):
+    return os.path.join(katalog, _KATALOG_AGREGATOW, tabela)
+
+
+def _do_zapisu(ramka):
+    # Kategorie zapisujemy jako zwykłe wartości – przy odczycie zastosuj_schemat odtworzy
+    # słownik posortowany tak samo, jak przy budowie z surowych danych
+    ramka = ramka.drop(columns=_KOLUMNY_WYLICZANE, errors="ignore")
+    ramka = ramka.astype({
+        **{
+            kolumna: ramka[kolumna].cat.categories.dtype
+            for kolumna in ramka.columns if isinstance(ramka[kolumna].dtype, pd.CategoricalDtype)
+        },
+        **{kolumna: "int64" for kolumna in dane.KOLUMNY_PARTYCJI},
+    })
+    return pa.Table.from_pandas(ramka, preserve_index=False)
+
+
+def zapisz_agregaty(agregaty, katalog=dane.KATALOG_MAGAZYNU):
+    """Zapisuje wszystkie agregaty od nowa (podmiana całego katalogu agregatów)."""
+    docelowy = os.path.join(katalog, _KATALOG_AGREGATOW)
+    nowy = dane.katalog_tymczasowy(docelowy, "nowe")
+    try:
+        for nazwa in _TABELE:
+            ds.write_dataset(
+                _do_zapisu(getattr(agregaty, nazwa)), os.path.join(nowy, nazwa),
+                format="parquet", partitioning=dane.partycjonowanie(),
+            )
+        dane.podmien_katalog(nowy, docelowy)
+    finally:
+        shutil.rmtree(nowy, ignore_errors=True)
+
+
+def wczytaj_agregaty(katalog=dane.KATALOG_MAGAZYNU):
+    """Agregaty zapisane w magazynie, w tym samym układzie co zbuduj_agregaty."""
+    tabele = {}
+    for nazwa in _TABELE:
+        tabela = ds.dataset(_sciezka(katalog, nazwa), format="parquet", partitioning=dane.partycjonowanie()).to_table()
+        # Kolumny partycji odczyt dokleja na końcu, a każda tabela zaczyna się od Rok, Miesiąc
+        tabela = tabela.select(
+            dane.KOLUMNY_PARTYCJI + [kolumna for kolumna in tabela.column_names if kolumna not in dane.KOLUMNY_PARTYCJI]
+        )
+        tabele[nazwa], _ = dane.zastosuj_schemat(tabela)
+    kostka = uporzadkuj_po_lekach(tabele["kostka"])
+    kostka["Data"] = dane.poczatek_miesiaca(kostka["Okres"])
+    promocje = tabele["promocje"]
+    promocje["Okres"] = dane.klucz_okresu(promocje["Rok"], promocje["Miesiąc"])
+    return zloz_agregaty(kostka, promocje, uporzadkuj_po_lekach(tabele["rynek"]))
+
+
+def przygotuj_agregaty(wersja, katalog=dane.KATALOG_MAGAZYNU, zbuduj=None):
+    """Agregaty dla wersji danych: z magazynu, a gdy ich brak lub są nieaktualne – budowane
+    od zera (funkcją `zbuduj` albo z surowych danych w pandas) i zapisywane.
+    """
+    with _blokada_agregatow(katalog):
+        if dane.wersja_agregatow(katalog) != wersja:
+            if zbuduj is None:
+                df, _ = dane.wczytaj_sprzedaz(kolumny=KOLUMNY_KOSTKI, katalog=katalog)
+                agregaty = zbuduj_agregaty(df)
+                del df
+            else:
+                agregaty = zbuduj()
+            zapisz_agregaty(agregaty, katalog)
+            dane.oznacz_agregaty(wersja, katalog)
+    return wczytaj_agregaty(katalog)
+
+
+def przelicz_okresy(okresy, katalog=dane.KATALOG_MAGAZYNU):
+    """Przelicza z surowych danych i podmienia w magazynie agregaty tylko wskazanych miesięcy.
+
+    Koszt zależy od wielkości tych miesięcy, nie całej historii.
+    """
+    df, _ = dane.wczytaj_sprzedaz(kolumny=KOLUMNY_KOSTKI, katalog=katalog, okresy=okresy)
+    kostka, promocje = zbuduj_kostke(df)
+    tabele = {"kostka": kostka, "promocje": promocje, "rynek": zbuduj_wymiar_rynku(df)}
+    with _blokada_agregatow(katalog):
+        for nazwa in _TABELE:
+            dane.zapisz_partycje(_do_zapisu(tabele[nazwa]), _sciezka(katalog, nazwa), okresy=okresy)
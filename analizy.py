@@ -0,0 +1,443 @@
+"""Obliczenia panelu bez Streamlita – te same liczby w panelu, benchmarkach i zadaniach wsadowych.
+
+Każda funkcja dostaje uchwyt danych (Agregaty, a dla wierszy leku ramkę surową z
+IndeksemLekow) oraz parametry filtrów i zwraca małą ramkę wyników. Okres to para
+kluczy dane.klucz_okresu (Rok*12+Miesiąc) włącznie; None oznacza brak ograniczenia.
+Panel tylko wyświetla wyniki, więc każdą funkcję można osobno cache'ować, mierzyć
+albo uruchomić w wątku roboczym.
+"""
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import agregaty
+import dane
+import pomiary
+import rownolegle
+
+# Sumy raportowane w tabelach wg typu i grupy promocji
+_SUMY_PROMOCJI = {
+    "liczba_obserwacji": ("Liczba wierszy", "sum"),
+    "suma_sprzedaz_ilosc": ("Sprzedaż ilość", "sum"),
+    "suma_sprzedaz_promocyjna": ("Sprzedaż budżetowa promocyjna", "sum"),
+    "suma_sprzedaz_zp": ("Sprzedaż budżetowa ZP", "sum"),
+    "suma_sprzedaz_budzetowa": ("Sprzedaż budżetowa", "sum"),
+}
+
+
+# --------------- FILTRY ----------------------
+def _granice(od, do):
+    return (-np.inf if od is None else od), (np.inf if do is None else do)
+
+
+def w_okresie(ramka, okresy, od=None, do=None):
+    """Wiersze ramki z kolumną Okres w zakresie [od, do]; pełny zakres zwraca ramkę bez maski i kopii."""
+    od, do = _granice(od, do)
+    # Bez okresów (pusty magazyn) ramka też jest pusta – nie ma czego filtrować
+    if len(okresy) == 0 or (od <= okresy[0] and do >= okresy[-1]):
+        return ramka
+    return ramka[ramka["Okres"].between(od, do)]
+
+
+def kostka_okresu(agr, od=None, do=None):
+    return w_okresie(agr.kostka, agr.okresy, od, do)
+
+
+def promocje_okresu(agr, od=None, do=None):
+    return w_okresie(agr.promocje, agr.okresy, od, do)
+
+
+def kostka_leku(agr, indeks, od=None, do=None):
+    """Kostka jednego leku w okresie – wycinek po IndeksieLekow i dwa searchsorted."""
+    return dane.wytnij_okres(agr.kostka_leku(indeks), *_granice(od, do))
+
+
+def rynek_leku(agr, indeks, od=None, do=None):
+    return dane.wytnij_okres(agr.rynek_leku(indeks), *_granice(od, do))
+
+
+def dostepne_wartosci(agr, od=None, do=None):
+    """Lata i kategorie obecne w okresie – opcje list wyboru w panelu."""
+    kostka = kostka_okresu(agr, od, do)
+    return sorted(kostka["Rok"].dropna().unique()), sorted(kostka["Kategoria nazwa"].dropna().unique())
+
+
+# --------------- LEK ----------------------
+@dataclass
+class PodsumowanieLeku:
+    """Sumy sprzedaży leku i rynku w okresie wraz z udziałami NEUCA."""
+
+    ilosc: float
+    wartosc: float
+    ilosc_rynek: float
+    wartosc_rynek: float
+
+    @property
+    def udzial_ilosciowy(self):
+        return self.ilosc / self.ilosc_rynek * 100
+
+    @property
+    def udzial_wartosciowy(self):
+        return self.wartosc / self.wartosc_rynek * 100
+
+
+def wiersze_leku(df, indeks_lekow, indeks):
+    """Surowe wiersze leku – wycinek danych posortowanych po Indeksie."""
+    return df.iloc[indeks_lekow.zakres(indeks)]
+
+
+def opis_leku(wiersze):
+    """Kategorie, rodzaje promocji i producenci występujący w wierszach leku."""
+    return {
+        kolumna: wiersze[kolumna].dropna().unique()
+        for kolumna in ["Kategoria nazwa", "Rodzaj promocji poziom 2", "Producent sprzedażowy kod"]
+    }
+
+
+def podsumowanie_leku(agr, indeks, od=None, do=None):
+    # Wymiar rynku ma dane rynkowe raz na rok, miesiąc i lek – można je po prostu zsumować
+    kostka = kostka_leku(agr, indeks, od, do)
+    rynek = rynek_leku(agr, indeks, od, do)
+    return PodsumowanieLeku(
+        ilosc=kostka["Sprzedaż ilość"].sum(),
+        wartosc=kostka["Sprzedaż budżetowa"].sum(),
+        ilosc_rynek=rynek["Sprzedaż rynek ilość"].sum(),
+        wartosc_rynek=rynek["Sprzedaż rynek wartość"].sum(),
+    )
+
+
+def sprzedaz_koszykow(agr, indeks, od=None, do=None):
+    """Sprzedaż leku (sztuki) w każdej grupie promocji i jej udział w sumie grup."""
+    kostka = kostka_leku(agr, indeks, od, do)
+    sprzedaz = (
+        kostka[kostka["Koszyk promocji"] >= 0]
+        .groupby("Koszyk promocji")["Sprzedaż ilość"]
+        .sum()
+        .reindex(range(len(dane.KOSZYKI_PROMOCJI)), fill_value=0)
+    )
+    suma = sprzedaz.sum()
+    return pd.DataFrame({
+        "Grupa promocji": dane.KOSZYKI_PROMOCJI,
+        "Sprzedaż ilość": sprzedaz.to_numpy(),
+        "Udział [%]": (sprzedaz / suma * 100 if suma else sprzedaz * 0).to_numpy(),
+    })
+
+
+def struktura_budzetu(agr, indeksy, wnioski, od=None, do=None):
+    """Podział sprzedaży budżetowej (ZP / promocyjna / pozostała) dla leków, malejąco po sumie.
+
+    Budżet "pozostały" jest w kostce liczony per wiersz, przed sumowaniem.
+    """
+    kostka = pd.concat([kostka_leku(agr, indeks, od, do) for indeks in indeksy])
+    podsumowanie = (
+        kostka.groupby("Indeks")[["Sprzedaż budżetowa ZP", "Sprzedaż budżetowa promocyjna", "Budżet normalna"]]
+        .sum()
+        .rename(columns={
+            "Sprzedaż budżetowa ZP": "Budget_ZP",
+            "Sprzedaż budżetowa promocyjna": "Budget_Promocyjna",
+            "Budżet normalna": "Budget_Normalna",
+        })
+        .reset_index()
+    )
+    podsumowanie["Suma_budzetowa"] = podsumowanie[["Budget_ZP", "Budget_Promocyjna", "Budget_Normalna"]].sum(axis=1)
+    podsumowanie = podsumowanie.merge(wnioski[["Indeks", "Nazwa leku"]], on="Indeks", how="left")
+    for skladnik in ["Budget_ZP", "Budget_Promocyjna", "Budget_Normalna"]:
+        podsumowanie[f"Percent_{skladnik}"] = podsumowanie[skladnik] / podsumowanie["Suma_budzetowa"] * 100
+    return podsumowanie.sort_values(by="Suma_budzetowa", ascending=False)
+
+
+def trend_sprzedazy(agr, indeks, od=None, do=None):
+    """Miesięczna sprzedaż leku w sztukach (kolumna Data – początek miesiąca)."""
+    return kostka_leku(agr, indeks, od, do).groupby("Data")["Sprzedaż ilość"].sum().reset_index()
+
+
+def ceny_jednostkowe(agr, indeks, od=None, do=None):
+    """Średnia z cen jednostkowych wierszy w miesiącu, zwinięta z sum i liczności w kostce."""
+    ceny = kostka_leku(agr, indeks, od, do).groupby("Data")[["Suma cen jednostkowych", "Liczba cen"]].sum().reset_index()
+    ceny["Cena jednostkowa"] = ceny["Suma cen jednostkowych"] / ceny["Liczba cen"]
+    return ceny
+
+
+@dataclass
+class WidokLeku:
+    """Komplet wyników widoku leku dla okresu – jedna jednostka cache'owania."""
+
+    podsumowanie: PodsumowanieLeku
+    koszyki: pd.DataFrame
+    budzet: pd.DataFrame
+    trend: pd.DataFrame
+    ceny: pd.DataFrame
+
+
+def widok_leku(agr, indeks, wnioski, od=None, do=None):
+    return WidokLeku(
+        podsumowanie=podsumowanie_leku(agr, indeks, od, do),
+        koszyki=sprzedaz_koszykow(agr, indeks, od, do),
+        budzet=struktura_budzetu(agr, [indeks], wnioski, od, do),
+        trend=trend_sprzedazy(agr, indeks, od, do),
+        ceny=ceny_jednostkowe(agr, indeks, od, do),
+    )
+
+
+# --------------- RAPORT I PORÓWNANIE LEKÓW ----------------------
+def wiersze_lekow(ramka, indeks_lekow, indeksy):
+    """Wiersze wybranych leków (w kolejności `indeksy`) – wycinki IndeksuLekow zamiast isin na całej ramce.
+
+    Koszt rośnie z liczbą wybranych wierszy, nie z rozmiarem ramki.
+    """
+    zakresy = [indeks_lekow.zakres(indeks) for indeks in indeksy]
+    pozycje = np.concatenate([np.arange(zakres.start, zakres.stop) for zakres in zakresy] + [np.empty(0, dtype=np.intp)])
+    return ramka.iloc[pozycje]
+
+
+def raport_lekow(agr, wnioski, od=None, do=None, indeksy=None):
+    """Liczby widoku leku dla wszystkich leków okresu (albo tylko `indeksy`) w kilku grupowaniach po Indeksie.
+
+    Zwraca (podsumowanie, trend): wiersz na lek z sumami, udziałami w rynku, podziałem
+    budżetu i sprzedażą grup promocji oraz wiersz na lek i miesiąc ze sprzedażą i średnią
+    ceną jednostkową – te same wartości co widok_leku dla każdego leku z osobna.
+    """
+    kostka, rynek = agr.kostka, agr.rynek
+    if indeksy is not None:
+        indeksy = sorted(set(indeksy))
+        kostka = wiersze_lekow(kostka, agr.indeks_kostki, indeksy)
+        rynek = wiersze_lekow(rynek, agr.indeks_rynku, indeksy)
+    kostka = w_okresie(kostka, agr.okresy, od, do)
+    rynek = w_okresie(rynek, agr.okresy, od, do)
+
+    podsumowanie = (
+        kostka.groupby("Indeks", observed=True)[[
+            "Sprzedaż ilość", "Sprzedaż budżetowa",
+            "Sprzedaż budżetowa ZP", "Sprzedaż budżetowa promocyjna", "Budżet normalna",
+        ]]
+        .sum()
+        .rename(columns={
+            "Sprzedaż budżetowa ZP": "Budget_ZP",
+            "Sprzedaż budżetowa promocyjna": "Budget_Promocyjna",
+            "Budżet normalna": "Budget_Normalna",
+        })
+    )
+    # Lek bez danych rynkowych w okresie ma sumę rynku 0, jak w podsumowanie_leku
+    podsumowanie = podsumowanie.join(
+        rynek.groupby("Indeks", observed=True)[agregaty.MIARY_RYNKU].sum()
+    ).fillna({miara: 0 for miara in agregaty.MIARY_RYNKU})
+    podsumowanie["Udział ilościowy [%]"] = podsumowanie["Sprzedaż ilość"] / podsumowanie["Sprzedaż rynek ilość"] * 100
+    podsumowanie["Udział wartościowy [%]"] = podsumowanie["Sprzedaż budżetowa"] / podsumowanie["Sprzedaż rynek wartość"] * 100
+
+    podsumowanie["Suma_budzetowa"] = podsumowanie[["Budget_ZP", "Budget_Promocyjna", "Budget_Normalna"]].sum(axis=1)
+    for skladnik in ["Budget_ZP", "Budget_Promocyjna", "Budget_Normalna"]:
+        podsumowanie[f"Percent_{skladnik}"] = podsumowanie[skladnik] / podsumowanie["Suma_budzetowa"] * 100
+
+    # Grupy promocji: kolumna na grupę zamiast wiersza na (lek, grupa) – udział w sumie grup leku
+    koszyki = (
+        kostka[kostka["Koszyk promocji"] >= 0]
+        .groupby(["Indeks", "Koszyk promocji"], observed=True)["Sprzedaż ilość"]
+        .sum()
+        .unstack(fill_value=0)
+        .reindex(index=podsumowanie.index, columns=range(len(dane.KOSZYKI_PROMOCJI)), fill_value=0)
+    )
+    suma_koszykow = koszyki.sum(axis=1)
+    udzialy = koszyki.div(suma_koszykow.where(suma_koszykow != 0), axis=0).mul(100).fillna(0)
+    for numer, koszyk in enumerate(dane.KOSZYKI_PROMOCJI):
+        podsumowanie[f"{koszyk} – ilość"] = koszyki[numer]
+        podsumowanie[f"{koszyk} – udział [%]"] = udzialy[numer]
+
+    nazwy = wnioski.drop_duplicates("Indeks").set_index("Indeks")["Nazwa leku"]
+    podsumowanie.insert(0, "Nazwa leku", podsumowanie.index.map(nazwy))
+    podsumowanie = podsumowanie.reset_index()
+
+    trend = (
+        kostka.groupby(["Indeks", "Data"], observed=True)[["Sprzedaż ilość", "Suma cen jednostkowych", "Liczba cen"]]
+        .sum()
+        .reset_index()
+    )
+    trend["Cena jednostkowa"] = trend.pop("Suma cen jednostkowych") / trend.pop("Liczba cen")
+    return podsumowanie, trend
+
+
+# --------------- UNIKALNOŚĆ ----------------------
+# Z szkice (słownik szkice.zbuduj_szkice) liczby unikalnych są przybliżone (HyperLogLog):
+# łączymy rejestry komórek zamiast liczyć nunique
+def _liczba_unikalnych(agr, kolumna, klucz, od=None, do=None, szkice=None):
+    if szkice is not None:
+        return szkice[kolumna].unikalne(klucz, od, do)
+    zrodlo = kostka_okresu(agr, od, do) if kolumna == "Indeks" else promocje_okresu(agr, od, do)
+    return zrodlo.groupby(klucz, observed=True)[kolumna].nunique()
+
+
+def _unikalne_produkty(agr, klucz, sortowanie, rosnaco=True, od=None, do=None, szkice=None):
+    return (
+        _liczba_unikalnych(agr, "Indeks", klucz, od, do, szkice)
+        .reset_index()
+        .rename(columns={"Indeks": "Liczba unikalnych produktów"})
+        .sort_values(by=sortowanie, ascending=rosnaco)
+    )
+
+
+def produkty_wg_kategorii(agr, od=None, do=None, szkice=None):
+    return _unikalne_produkty(agr, "Kategoria nazwa", "Liczba unikalnych produktów", False, od, do, szkice)
+
+
+def produkty_wg_roku(agr, od=None, do=None, szkice=None):
+    return _unikalne_produkty(agr, "Rok", "Rok", True, od, do, szkice)
+
+
+def produkty_wg_miesiaca(agr, od=None, do=None, szkice=None):
+    return _unikalne_produkty(agr, ["Rok", "Miesiąc", "Kategoria nazwa"], ["Rok", "Miesiąc"], True, od, do, szkice)
+
+
+def produkty_wg_rodzaju(agr, od=None, do=None, szkice=None):
+    return _unikalne_produkty(agr, "Rodzaj promocji poziom 2", "Liczba unikalnych produktów", False, od, do, szkice)
+
+
+def produkty_w_kategoriach(agr, kategorie, od=None, do=None, szkice=None):
+    """Liczba unikalnych produktów łącznie w wybranych kategoriach."""
+    if szkice is not None:
+        return szkice["Indeks"].razem(od, do, kategorie)
+    kostka = kostka_okresu(agr, od, do)
+    return int(kostka.loc[kostka["Kategoria nazwa"].isin(kategorie), "Indeks"].nunique())
+
+
+def promocje_wg_miesiaca(agr, od=None, do=None, szkice=None):
+    """Liczba unikalnych promocji wg roku, miesiąca i rodzaju promocji."""
+    return (
+        _liczba_unikalnych(agr, "Id promocji", ["Rok", "Miesiąc", "Rodzaj promocji poziom 2"], od, do, szkice)
+        .reset_index()
+        .rename(columns={"Id promocji": "Liczba unikalnych promocji"})
+        .sort_values(by=["Rok", "Miesiąc"])
+    )
+
+
+# --------------- SPRZEDAŻ ----------------------
+def sprzedaz_wg_miesiaca(agr, od=None, do=None):
+    return (
+        kostka_okresu(agr, od, do)
+        .groupby(["Rok", "Miesiąc"])["Sprzedaż ilość"]
+        .sum()
+        .reset_index()
+        .sort_values(by=["Rok", "Miesiąc"])
+    )
+
+
+def sprzedaz_wg_roku(agr, od=None, do=None):
+    return (
+        kostka_okresu(agr, od, do)
+        .groupby("Rok")["Sprzedaż ilość"]
+        .sum()
+        .reset_index()
+        .rename(columns={"Sprzedaż ilość": "Liczba sprzedanych sztuk"})
+        .sort_values(by="Rok")
+    )
+
+
+def sprzedaz_wg_rodzaju(agr, od=None, do=None):
+    """Sprzedane sztuki wg roku, miesiąca i rodzaju promocji."""
+    return (
+        kostka_okresu(agr, od, do)
+        .groupby(["Rok", "Miesiąc", "Rodzaj promocji poziom 2"], observed=True)["Sprzedaż ilość"]
+        .sum()
+        .reset_index()
+        .rename(columns={"Sprzedaż ilość": "Liczba sprzedanych sztuk"})
+    )
+
+
+# --------------- TYPY PROMOCJI ----------------------
+def tabela_typow_promocji(agr, od=None, do=None):
+    return kostka_okresu(agr, od, do).groupby("Rodzaj promocji poziom 2", observed=True).agg(**_SUMY_PROMOCJI).reset_index()
+
+
+def tabela_grup_promocji(agr, od=None, do=None):
+    """Te same sumy wg grup promocji, co na wykresie w widoku leku."""
+    tabela = kostka_okresu(agr, od, do).groupby("Koszyk promocji").agg(**_SUMY_PROMOCJI).reset_index()
+    tabela.insert(0, "Grupa promocji", dane.nazwy_koszykow(tabela.pop("Koszyk promocji")))
+    return tabela
+
+
+def zbiorcze_wg_kategorii(agr, od=None, do=None):
+    """Sumy wg rodzaju promocji i kategorii; liczba obserwacji to liczba wierszy z niepustym Indeksem."""
+    kostka = kostka_okresu(agr, od, do)
+    return kostka.assign(
+        Wiersze_z_indeksem=kostka["Liczba wierszy"].where(kostka["Indeks"].notna(), 0)
+    ).groupby(["Rodzaj promocji poziom 2", "Kategoria nazwa"], observed=True).agg(
+        Liczba_obserwacji=("Wiersze_z_indeksem", "sum"),
+        Suma_sprzedaz_ilosc=("Sprzedaż ilość", "sum"),
+        Suma_sprzedaz_promocyjna=("Sprzedaż budżetowa promocyjna", "sum"),
+        Suma_sprzedaz_zp=("Sprzedaż budżetowa ZP", "sum"),
+        Suma_sprzedaz_budzetowa=("Sprzedaż budżetowa", "sum"),
+    ).reset_index()
+
+
+def udzial_kategorii(zbiorcze, kategorie):
+    """Procentowy udział wybranych kategorii w liczbie obserwacji każdego rodzaju promocji."""
+    udzialy = zbiorcze[zbiorcze["Kategoria nazwa"].isin(kategorie)].copy()
+    udzialy["Liczba_obserwacji"] = udzialy["Liczba_obserwacji"].astype(float)
+    suma = udzialy.groupby("Rodzaj promocji poziom 2", observed=True)["Liczba_obserwacji"].transform("sum")
+    udzialy["Udział (%)"] = udzialy["Liczba_obserwacji"] / suma * 100
+    return udzialy
+
+
+def srednia_na_promocje(agr, od=None, do=None, szkice=None):
+    """Średnia liczba sprzedanych sztuk na jedną unikalną promocję wg rodzaju promocji."""
+    srednia = pd.concat([
+        kostka_okresu(agr, od, do).groupby("Rodzaj promocji poziom 2", observed=True)["Sprzedaż ilość"].sum(),
+        _liczba_unikalnych(agr, "Id promocji", "Rodzaj promocji poziom 2", od, do, szkice),
+    ], axis=1).reset_index()
+    srednia["Średnia liczba sztuk na promocję"] = srednia["Sprzedaż ilość"] / srednia["Id promocji"]
+    return srednia[["Rodzaj promocji poziom 2", "Średnia liczba sztuk na promocję"]]
+
+
+# --------------- UDZIAŁY ----------------------
+def tabela_udzialowa(agr, od=None, do=None):
+    """Miesięczny udział NEUCA w rynku i struktura sprzedaży w okresie."""
+    miesiace = agregaty.udzialy_miesieczne(agr)
+    od, do = _granice(od, do)
+    return miesiace[dane.klucz_okresu(miesiace["Rok"], miesiace["Miesiąc"]).between(od, do)]
+
+
+# --------------- KOMPLET TABEL MODUŁU ----------------------
+# Tabele modułu "Podstawowe analizy" – niezależne od siebie, więc liczone równolegle
+TABELE_ANALIZ = [
+    dostepne_wartosci,
+    produkty_wg_kategorii,
+    produkty_wg_roku,
+    produkty_wg_miesiaca,
+    produkty_wg_rodzaju,
+    promocje_wg_miesiaca,
+    sprzedaz_wg_miesiaca,
+    sprzedaz_wg_roku,
+    sprzedaz_wg_rodzaju,
+    tabela_typow_promocji,
+    tabela_grup_promocji,
+    zbiorcze_wg_kategorii,
+    srednia_na_promocje,
+]
+
+
+# Tabele z liczbami unikalnych – z szkicami liczone w przybliżeniu
+TABELE_PRZYBLIZANE = {
+    produkty_wg_kategorii,
+    produkty_wg_roku,
+    produkty_wg_miesiaca,
+    produkty_wg_rodzaju,
+    promocje_wg_miesiaca,
+    srednia_na_promocje,
+}
+
+
+def tabele_analiz(agr, od=None, do=None, watki=None, szkice=None):
+    """Wszystkie tabele modułu jako słownik {nazwa funkcji: wynik}; watki=1 – po kolei.
+
+    Z szkicami HLL liczby unikalnych produktów i promocji są przybliżone. Czas każdej
+    tabeli trafia do pomiarów jako "analiza · <nazwa>".
+    """
+    return rownolegle.policz(
+        {
+            funkcja.__name__: functools.partial(
+                pomiary.mierzona(f"analiza · {funkcja.__name__}")(funkcja), agr, od, do, **({"szkice": szkice} if funkcja in TABELE_PRZYBLIZANE else {})
+            )
+            for funkcja in TABELE_ANALIZ
+        },
+        watki,
+    )
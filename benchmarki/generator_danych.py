@@ -0,0 +1,135 @@
+"""Deterministyczny generator syntetycznych danych o schemacie pełne_dane.csv / nazwy.csv.
+
+Prawdziwych wyciągów nie można udostępniać, więc pomiary i porównania robimy na
+danych sztucznych. Ten sam (liczba_wierszy, ziarno) daje zawsze te same pliki.
+Dane powstają paczkami, więc generator skaluje się od 100 tys. do 50 mln wierszy
+bez trzymania całości w pamięci.
+
+    python -m benchmarki.generator_danych 1000000 --katalog /tmp/dane_1m
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+ROZMIAR_PACZKI = 500000
+LATA = (2022, 2023, 2024)
+# Dane rynkowe są dostępne tylko od tego roku (jak w prawdziwym wyciągu)
+PIERWSZY_ROK_RYNKU = 2023
+
+KATEGORIE = [
+    "Leki OTC", "Leki Rx", "Suplementy diety", "Dermokosmetyki", "Wyroby medyczne",
+    "Żywność specjalnego przeznaczenia", "Leki weterynaryjne", "Higiena", "Dla dzieci",
+    "Ortopedia", "Diagnostyka", "Pozostałe",
+]
+RODZAJE_PROMOCJI = [
+    "Centralne", "Partner", "Promocje regionalne pozostałe", "IPRA", "RPM",
+    "Promocje sieciowe", "ZGZ", "Synoptis - akcje własne", "Gazetka",
+]
+# Udział wierszy bez promocji (pusty rodzaj promocji – "Normalna sprzedaż" w panelu)
+UDZIAL_BEZ_PROMOCJI = 0.45
+PROMOCJI_NA_RODZAJ_I_MIESIAC = 40
+
+
+def _liczba_lekow(liczba_wierszy):
+    return int(np.clip(liczba_wierszy // 2000, 200, 20000))
+
+
+def generuj_leki(liczba_wierszy, ziarno=0):
+    """Słownik leków: Indeks, nazwa, kategoria, producent i bazowe wartości do losowania."""
+    rng = np.random.default_rng([ziarno, 0])
+    liczba = _liczba_lekow(liczba_wierszy)
+    indeksy = 100000 + np.sort(rng.choice(900000, size=liczba, replace=False))
+    return pd.DataFrame({
+        "Indeks": indeksy,
+        "Nazwa leku": [f"Lek syntetyczny {indeks}" for indeks in indeksy],
+        "Kategoria nazwa": rng.choice(KATEGORIE, size=liczba),
+        "Producent sprzedażowy kod": [f"PRD{kod:04d}" for kod in rng.integers(0, max(liczba // 10, 1), size=liczba)],
+        "Cena": np.round(rng.lognormal(3.0, 0.8, size=liczba), 2),
+        "Popularność": rng.pareto(1.5, size=liczba) + 1,
+        "Rynek": rng.integers(200, 20000, size=liczba),
+    })
+
+
+def _paczka(leki, liczba, nr, ziarno):
+    # Każda paczka ma własny strumień losowy – wynik nie zależy od kolejności generowania
+    rng = np.random.default_rng([ziarno, nr + 1])
+    waga = leki["Popularność"].to_numpy()
+    lek = rng.choice(len(leki), size=liczba, p=waga / waga.sum())
+    rok = rng.choice(LATA, size=liczba)
+    miesiac = rng.integers(1, 13, size=liczba)
+
+    promocja = rng.integers(0, len(RODZAJE_PROMOCJI), size=liczba)
+    bez_promocji = rng.random(liczba) < UDZIAL_BEZ_PROMOCJI
+    rodzaj = np.array(RODZAJE_PROMOCJI, dtype=object)[promocja]
+    rodzaj[bez_promocji] = None
+    id_promocji = (
+        (rok - LATA[0]) * 12 + miesiac - 1
+    ) * len(RODZAJE_PROMOCJI) * PROMOCJI_NA_RODZAJ_I_MIESIAC + promocja * PROMOCJI_NA_RODZAJ_I_MIESIAC + rng.integers(
+        0, PROMOCJI_NA_RODZAJ_I_MIESIAC, size=liczba
+    )
+    id_promocji = np.where(bez_promocji, np.nan, id_promocji.astype(float))
+
+    ilosc = rng.poisson(12, size=liczba).astype(float)
+    budzetowa = np.round(ilosc * leki["Cena"].to_numpy()[lek] * rng.uniform(0.85, 1.15, size=liczba), 2)
+    zp = np.where(rng.random(liczba) < 0.3, np.round(budzetowa * rng.uniform(0.05, 0.4, size=liczba), 2), np.nan)
+    promocyjna = np.where(bez_promocji, np.nan, np.round(budzetowa * rng.uniform(0.2, 0.8, size=liczba), 2))
+
+    # Rynek zależy tylko od (lek, rok, miesiąc) – ta sama wartość w każdym wierszu leku w miesiącu
+    rynek_ilosc = leki["Rynek"].to_numpy()[lek] * (1 + ((rok * 12 + miesiac) % 7) / 10)
+    rynek_ilosc = np.where(rok >= PIERWSZY_ROK_RYNKU, np.round(rynek_ilosc), np.nan)
+    rynek_wartosc = np.round(rynek_ilosc * leki["Cena"].to_numpy()[lek] * 1.1, 2)
+
+    return pd.DataFrame({
+        "Indeks": leki["Indeks"].to_numpy()[lek],
+        "Rok": rok,
+        "Miesiąc": miesiac,
+        "Kategoria nazwa": leki["Kategoria nazwa"].to_numpy()[lek],
+        "Rodzaj promocji poziom 2": rodzaj,
+        "Id promocji": id_promocji,
+        "Producent sprzedażowy kod": leki["Producent sprzedażowy kod"].to_numpy()[lek],
+        "Sprzedaż ilość": ilosc,
+        "Sprzedaż budżetowa": budzetowa,
+        "Sprzedaż budżetowa ZP": zp,
+        "Sprzedaż budżetowa promocyjna": promocyjna,
+        "Sprzedaż rynek ilość": rynek_ilosc,
+        "Sprzedaż rynek wartość": rynek_wartosc,
+    })
+
+
+def generuj_paczki(liczba_wierszy, ziarno=0, rozmiar_paczki=ROZMIAR_PACZKI):
+    """Generator kolejnych paczek wierszy (DataFrame) o łącznej długości liczba_wierszy."""
+    leki = generuj_leki(liczba_wierszy, ziarno)
+    for nr, poczatek in enumerate(range(0, liczba_wierszy, rozmiar_paczki)):
+        paczka = _paczka(leki, min(rozmiar_paczki, liczba_wierszy - poczatek), nr, ziarno)
+        paczka.index = pd.RangeIndex(poczatek, poczatek + len(paczka))
+        yield paczka
+
+
+def generuj_dane(liczba_wierszy, ziarno=0):
+    """Całe dane w pamięci: (df, wnioski) – jak zwracane przez wczytanie CSV."""
+    df = pd.concat(generuj_paczki(liczba_wierszy, ziarno))
+    wnioski = generuj_leki(liczba_wierszy, ziarno)[["Indeks", "Nazwa leku"]]
+    return df, wnioski
+
+
+def zapisz_csv(katalog, liczba_wierszy, ziarno=0):
+    """Zapisuje pełne_dane.csv i nazwy.csv do katalogu (paczkami). Zwraca ścieżki plików."""
+    os.makedirs(katalog, exist_ok=True)
+    sciezka_danych = os.path.join(katalog, "pełne_dane.csv")
+    sciezka_nazw = os.path.join(katalog, "nazwy.csv")
+    for nr, paczka in enumerate(generuj_paczki(liczba_wierszy, ziarno)):
+        paczka.to_csv(sciezka_danych, mode="w" if nr == 0 else "a", header=nr == 0)
+    generuj_leki(liczba_wierszy, ziarno)[["Indeks", "Nazwa leku"]].to_csv(sciezka_nazw)
+    return sciezka_danych, sciezka_nazw
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generuje syntetyczne pełne_dane.csv i nazwy.csv.")
+    parser.add_argument("liczba_wierszy", type=int)
+    parser.add_argument("--katalog", default=".", help="katalog docelowy (domyślnie bieżący)")
+    parser.add_argument("--ziarno", type=int, default=0)
+    argumenty = parser.parse_args()
+    for sciezka in zapisz_csv(argumenty.katalog, argumenty.liczba_wierszy, argumenty.ziarno):
+        print(sciezka)
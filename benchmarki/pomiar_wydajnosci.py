@@ -0,0 +1,221 @@
+"""Pomiar czasu i pamięci bloków analitycznych panelu – bez Streamlita, na danych syntetycznych.
+
+Dla każdego rozmiaru danych generuje (raz) pliki CSV, buduje magazyn i mierzy kolejne
+bloki: wczytanie, budowę agregatów, filtr leku, filtr okresu, deduplikację rynku,
+podział promocji, tabele unikalnych produktów (dokładnie i ze szkiców HLL), tabelę udziałową i komplet tabel modułu
+analiz (po kolei i w puli NEUCA_WATKI wątków) – tymi samymi funkcjami
+modułu analizy, których używa panel. Czas to najlepszy
+z kilku przebiegów, pamięć to szczyt alokacji NumPy i Pythona (tracemalloc, osobny
+przebieg; bez puli pamięci Arrow).
+
+    python -m benchmarki.pomiar_wydajnosci --rozmiary 100000 1000000 --json wyniki.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import agregaty
+import analizy
+import dane
+import migawka
+import rownolegle
+import szkice
+from benchmarki import generator_danych
+
+# Tyle losowych leków sprawdzamy w blokach "per lek"; czas podajemy na jeden lek
+PROBKA_LEKOW = 100
+
+
+def _przygotuj_pliki(katalog_roboczy, liczba_wierszy, ziarno):
+    katalog = os.path.join(katalog_roboczy, f"wiersze_{liczba_wierszy}_ziarno_{ziarno}")
+    sciezka_danych = os.path.join(katalog, "pełne_dane.csv")
+    sciezka_nazw = os.path.join(katalog, "nazwy.csv")
+    if not (os.path.exists(sciezka_danych) and os.path.exists(sciezka_nazw)):
+        generator_danych.zapisz_csv(katalog, liczba_wierszy, ziarno)
+    return sciezka_danych, sciezka_nazw, os.path.join(katalog, "magazyn_danych")
+
+
+def _probka_lekow(indeks_lekow, ziarno):
+    rng = np.random.default_rng(ziarno)
+    return rng.choice(indeks_lekow.lista, size=min(PROBKA_LEKOW, len(indeks_lekow.lista)), replace=False).tolist()
+
+
+# --------------- BLOKI ----------------------
+# Każdy blok dostaje kontekst z wynikami wcześniejszych bloków i zwraca
+# (wynik, liczba operacji) – dla bloków "per lek" czas dzielimy przez liczbę leków
+def _wczytanie(k):
+    df, _ = dane.wczytaj_sprzedaz(katalog=k["magazyn"])
+    return df, 1
+
+
+def _wczytanie_migawki(k):
+    # Pierwsze powtórzenie zapisuje migawkę, kolejne tylko mapują plik (zob. czas min)
+    df, _ = migawka.wczytaj_sprzedaz(dane.wersja_magazynu(k["magazyn"]), katalog=k["magazyn"])
+    return df, 1
+
+
+def _agregaty(k):
+    return agregaty.zbuduj_agregaty(k["df"]), 1
+
+
+def _indeks_lekow(k):
+    return dane.IndeksLekow(k["df"]["Indeks"], k["wnioski"]), 1
+
+
+def _filtr_leku(k):
+    wyniki = [analizy.wiersze_leku(k["df"], k["indeks_lekow"], lek) for lek in k["leki"]]
+    return wyniki, len(k["leki"])
+
+
+def _filtr_okresu(k):
+    od, do = k["agregaty"].okresy[0] + 3, k["agregaty"].okresy[-1] - 3
+    wyniki = [analizy.podsumowanie_leku(k["agregaty"], lek, od, do) for lek in k["leki"]]
+    return wyniki, len(k["leki"])
+
+
+def _deduplikacja_rynku(k):
+    return agregaty.zbuduj_wymiar_rynku(k["df"]), 1
+
+
+def _podzial_promocji(k):
+    wyniki = [analizy.sprzedaz_koszykow(k["agregaty"], lek) for lek in k["leki"]]
+    return wyniki, len(k["leki"])
+
+
+def _unikalne_produkty(k):
+    wyniki = [
+        funkcja(k["agregaty"])
+        for funkcja in [
+            analizy.produkty_wg_kategorii, analizy.produkty_wg_roku, analizy.produkty_wg_miesiaca,
+            analizy.produkty_wg_rodzaju, analizy.promocje_wg_miesiaca,
+        ]
+    ]
+    return wyniki, 1
+
+
+def _tabele_szeregowo(k):
+    return analizy.tabele_analiz(k["agregaty"], watki=1), 1
+
+
+def _tabele_rownolegle(k):
+    return analizy.tabele_analiz(k["agregaty"]), 1
+
+
+def _szkice(k):
+    return szkice.zbuduj_szkice(k["agregaty"]), 1
+
+
+def _unikalne_przyblizone(k):
+    wyniki = [
+        funkcja(k["agregaty"], szkice=k["szkice"])
+        for funkcja in [
+            analizy.produkty_wg_kategorii, analizy.produkty_wg_roku, analizy.produkty_wg_miesiaca,
+            analizy.produkty_wg_rodzaju, analizy.promocje_wg_miesiaca,
+        ]
+    ]
+    return wyniki, 1
+
+
+def _widok_leku(k):
+    wyniki = [analizy.widok_leku(k["agregaty"], lek, k["wnioski"]) for lek in k["leki"]]
+    return wyniki, len(k["leki"])
+
+
+def _raport_lekow(k):
+    # Wszystkie leki jednym przebiegiem – czas na lek porównywalny z blokiem "widok leku"
+    return analizy.raport_lekow(k["agregaty"], k["wnioski"]), len(k["agregaty"].indeks_kostki.lista)
+
+
+def _porownanie_lekow(k):
+    return analizy.raport_lekow(k["agregaty"], k["wnioski"], indeksy=k["leki"]), len(k["leki"])
+
+
+def _tabela_udzialowa(k):
+    return analizy.tabela_udzialowa(k["agregaty"]), 1
+
+
+# (nazwa bloku, funkcja, klucz kontekstu na wynik)
+BLOKI = [
+    ("wczytanie", _wczytanie, "df"),
+    ("wczytanie z migawki (mmap)", _wczytanie_migawki, None),
+    ("budowa agregatów", _agregaty, "agregaty"),
+    ("indeks leków", _indeks_lekow, "indeks_lekow"),
+    ("filtr leku", _filtr_leku, None),
+    ("filtr okresu", _filtr_okresu, None),
+    ("deduplikacja rynku", _deduplikacja_rynku, None),
+    ("podział promocji", _podzial_promocji, None),
+    ("widok leku", _widok_leku, None),
+    ("raport leków – wszystkie", _raport_lekow, None),
+    (f"porównanie {PROBKA_LEKOW} leków", _porownanie_lekow, None),
+    ("unikalne produkty", _unikalne_produkty, None),
+    ("szkice HLL", _szkice, "szkice"),
+    ("unikalne produkty – HLL", _unikalne_przyblizone, None),
+    ("tabela udziałowa", _tabela_udzialowa, None),
+    ("tabele analiz – szeregowo", _tabele_szeregowo, None),
+    (f"tabele analiz – pula {rownolegle.WATKI}", _tabele_rownolegle, None),
+]
+
+
+def _zmierz(funkcja, kontekst, powtorzenia):
+    czasy = []
+    for _ in range(powtorzenia):
+        start = time.perf_counter()
+        wynik, operacje = funkcja(kontekst)
+        czasy.append((time.perf_counter() - start) / operacje)
+    del wynik
+    tracemalloc.start()
+    wynik, _ = funkcja(kontekst)
+    _, szczyt = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return wynik, min(czasy), statistics.median(czasy), szczyt
+
+
+def zmierz_rozmiar(liczba_wierszy, katalog_roboczy, powtorzenia=3, ziarno=0):
+    """Mierzy wszystkie bloki dla jednego rozmiaru danych; zwraca listę słowników z wynikami."""
+    sciezka_danych, sciezka_nazw, magazyn = _przygotuj_pliki(katalog_roboczy, liczba_wierszy, ziarno)
+
+    start = time.perf_counter()
+    dane.zbuduj_magazyn(sciezka_danych, sciezka_nazw, magazyn)
+    wyniki = [{
+        "Wiersze": liczba_wierszy, "Blok": "konwersja CSV → Parquet",
+        "Czas min [ms]": 1000 * (time.perf_counter() - start), "Czas mediana [ms]": None, "Szczyt pamięci [MB]": None,
+    }]
+
+    kontekst = {"magazyn": magazyn, "wnioski": dane.wczytaj_nazwy(magazyn)}
+    for nazwa, funkcja, klucz in BLOKI:
+        if nazwa == "filtr leku":
+            kontekst["leki"] = _probka_lekow(kontekst["indeks_lekow"], ziarno)
+        wynik, najlepszy, mediana, szczyt = _zmierz(funkcja, kontekst, powtorzenia)
+        if klucz is not None:
+            kontekst[klucz] = wynik
+        wyniki.append({
+            "Wiersze": liczba_wierszy, "Blok": nazwa,
+            "Czas min [ms]": 1000 * najlepszy, "Czas mediana [ms]": 1000 * mediana,
+            "Szczyt pamięci [MB]": szczyt / 2**20,
+        })
+    return wyniki
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pomiar wydajności bloków analitycznych panelu.")
+    parser.add_argument("--rozmiary", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--katalog", default=os.path.join("benchmarki", "dane"), help="katalog na dane syntetyczne")
+    parser.add_argument("--powtorzenia", type=int, default=3)
+    parser.add_argument("--ziarno", type=int, default=0)
+    parser.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    argumenty = parser.parse_args()
+
+    wszystkie = []
+    for rozmiar in argumenty.rozmiary:
+        wszystkie += zmierz_rozmiar(rozmiar, argumenty.katalog, argumenty.powtorzenia, argumenty.ziarno)
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.float_format", "{:,.2f}".format):
+        print(pd.DataFrame(wszystkie).to_string(index=False))
+    if argumenty.json:
+        with open(argumenty.json, "w", encoding="utf-8") as plik:
+            json.dump(wszystkie, plik, ensure_ascii=False, indent=2)
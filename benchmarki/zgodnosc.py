@@ -0,0 +1,159 @@
+"""Zgodność silników zapytań z wersją pandas – te same agregaty, tabele modułów i wiersze leków.
+
+Dla każdego silnika (duckdb, polars) buduje agregaty wprost z magazynu i porównuje z
+agregatami pandas: kostkę, zbiór promocji i wymiar rynku, wszystkie tabele modułu
+"Podstawowe analizy" i tabelę udziałową (pełny zakres i wycinek okresu), widok leku
+oraz surowe wiersze dla próbki leków. Silnik bez zainstalowanej biblioteki jest pomijany.
+Kod wyjścia 1 oznacza różnicę. Te same sprawdzenia na małych danych uruchamia
+pytest (tests/test_zgodnosc.py).
+
+    python -m benchmarki.zgodnosc --wiersze 1000000
+    python -m benchmarki.zgodnosc --magazyn magazyn_danych --silniki polars
+"""
+import argparse
+import dataclasses
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import agregaty
+import analizy
+import dane
+from benchmarki import pomiar_wydajnosci
+
+# Tolerancja względna dla sum zmiennoprzecinkowych liczonych w innej kolejności
+TOLERANCJA = 1e-9
+
+
+def _silnik_duckdb(silnik_duckdb, magazyn):
+    polaczenie = silnik_duckdb.polacz(magazyn)
+    return (
+        lambda: silnik_duckdb.zbuduj_agregaty(polaczenie),
+        lambda indeks: silnik_duckdb.wiersze_leku(polaczenie, indeks, magazyn),
+    )
+
+
+def _silnik_polars(silnik_polars, magazyn):
+    return (
+        lambda: silnik_polars.zbuduj_agregaty(magazyn),
+        lambda indeks: silnik_polars.wiersze_leku(indeks, magazyn),
+    )
+
+
+# silnik -> (moduł, funkcja zwracająca (budowa agregatów, wiersze leku))
+SILNIKI = {
+    "duckdb": ("silnik_duckdb", _silnik_duckdb),
+    "polars": ("silnik_polars", _silnik_polars),
+}
+
+
+def _roznica(oczekiwany, wynik):
+    """Opis pierwszej różnicy między wynikami albo None."""
+    if isinstance(oczekiwany, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(
+                oczekiwany.reset_index(drop=True), wynik.reset_index(drop=True),
+                check_dtype=False, check_categorical=False, rtol=TOLERANCJA,
+            )
+        except AssertionError as blad:
+            return " ".join(str(blad).split())[:300]
+        return None
+    if dataclasses.is_dataclass(oczekiwany):
+        for pole in dataclasses.fields(oczekiwany):
+            roznica = _roznica(getattr(oczekiwany, pole.name), getattr(wynik, pole.name))
+            if roznica:
+                return f"{pole.name}: {roznica}"
+        return None
+    if isinstance(oczekiwany, (tuple, list)):
+        roznice = [_roznica(a, b) for a, b in zip(oczekiwany, wynik)]
+        return next((r for r in roznice if r), None if len(oczekiwany) == len(wynik) else "inna długość")
+    if isinstance(oczekiwany, float):
+        return None if np.isclose(oczekiwany, wynik, rtol=TOLERANCJA, equal_nan=True) else f"{oczekiwany} != {wynik}"
+    return None if oczekiwany == wynik else f"{oczekiwany!r} != {wynik!r}"
+
+
+def _po_kluczu(ramka, klucz):
+    # Kolejność wierszy w obrębie leku i okresu zależy od silnika – porównujemy po pełnym kluczu
+    return ramka.sort_values(klucz, kind="stable", ignore_index=True)
+
+
+def sprawdz(magazyn, silniki, liczba_lekow=50, ziarno=0):
+    """Lista słowników (Silnik, Sprawdzenie, Wynik, Szczegóły) – po jednym na porównanie."""
+    wnioski = dane.wczytaj_nazwy(magazyn)
+    start = time.perf_counter()
+    df, _ = dane.wczytaj_sprzedaz(katalog=magazyn)
+    wzorzec = agregaty.zbuduj_agregaty(df)
+    czas_pandas = time.perf_counter() - start
+    indeks_lekow = dane.IndeksLekow(df["Indeks"], wnioski)
+    leki = pomiar_wydajnosci._probka_lekow(indeks_lekow, ziarno)[:liczba_lekow]
+    od, do = wzorzec.okresy[len(wzorzec.okresy) // 4], wzorzec.okresy[-len(wzorzec.okresy) // 4]
+
+    wyniki = []
+    for nazwa in silniki:
+        modul, przygotuj = SILNIKI[nazwa]
+        try:
+            silnik = importlib.import_module(modul)
+        except ImportError as blad:
+            wyniki.append({"Silnik": nazwa, "Sprawdzenie": "import", "Wynik": "pominięty", "Szczegóły": str(blad)})
+            continue
+        zbuduj, wiersze_leku = przygotuj(silnik, magazyn)
+
+        start = time.perf_counter()
+        agr = zbuduj()
+        czas = time.perf_counter() - start
+        porownania = [(
+            "budowa agregatów", None,
+            f"{czas:.2f} s (pandas z wczytaniem {czas_pandas:.2f} s)",
+        )]
+        porownania += [
+            ("kostka", _roznica(_po_kluczu(wzorzec.kostka, agregaty.KLUCZ_KOSTKI), _po_kluczu(agr.kostka, agregaty.KLUCZ_KOSTKI)), ""),
+            ("promocje", _roznica(_po_kluczu(wzorzec.promocje, agregaty.KLUCZ_PROMOCJI), _po_kluczu(agr.promocje, agregaty.KLUCZ_PROMOCJI)), ""),
+            ("rynek", _roznica(wzorzec.rynek, agr.rynek), ""),
+        ]
+        for zakres in [(None, None), (od, do)]:
+            opis = "pełny zakres" if zakres == (None, None) else "wycinek okresu"
+            oczekiwane, otrzymane = analizy.tabele_analiz(wzorzec, *zakres), analizy.tabele_analiz(agr, *zakres)
+            porownania += [(f"{tabela} ({opis})", _roznica(oczekiwane[tabela], otrzymane[tabela]), "") for tabela in oczekiwane]
+            porownania.append((
+                f"tabela_udzialowa ({opis})",
+                _roznica(analizy.tabela_udzialowa(wzorzec, *zakres), analizy.tabela_udzialowa(agr, *zakres)), "",
+            ))
+        widoki = [_roznica(analizy.widok_leku(wzorzec, lek, wnioski, od, do), analizy.widok_leku(agr, lek, wnioski, od, do)) for lek in leki]
+        wiersze = [_roznica(analizy.wiersze_leku(df, indeks_lekow, lek), wiersze_leku(lek)) for lek in leki]
+        porownania += [
+            (f"widok leku ({len(leki)} leków)", next((r for r in widoki if r), None), ""),
+            (f"wiersze leku ({len(leki)} leków)", next((r for r in wiersze if r), None), ""),
+        ]
+        wyniki += [
+            {"Silnik": nazwa, "Sprawdzenie": sprawdzenie, "Wynik": "różnica" if roznica else "zgodne", "Szczegóły": roznica or uwagi}
+            for sprawdzenie, roznica, uwagi in porownania
+        ]
+    return wyniki
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zgodność silników zapytań panelu z wersją pandas.")
+    zrodlo = parser.add_mutually_exclusive_group()
+    zrodlo.add_argument("--magazyn", help="istniejący magazyn danych (np. magazyn_danych)")
+    zrodlo.add_argument("--wiersze", type=int, default=100000, help="rozmiar danych syntetycznych")
+    parser.add_argument("--katalog", default=os.path.join("benchmarki", "dane"), help="katalog na dane syntetyczne")
+    parser.add_argument("--silniki", nargs="+", choices=list(SILNIKI), default=list(SILNIKI))
+    parser.add_argument("--leki", type=int, default=50, help="liczba leków w próbce")
+    parser.add_argument("--ziarno", type=int, default=0)
+    argumenty = parser.parse_args()
+
+    magazyn = argumenty.magazyn
+    if magazyn is None:
+        sciezka_danych, sciezka_nazw, magazyn = pomiar_wydajnosci._przygotuj_pliki(
+            argumenty.katalog, argumenty.wiersze, argumenty.ziarno
+        )
+        dane.przygotuj_magazyn(sciezka_danych, sciezka_nazw, magazyn)
+
+    wyniki = pd.DataFrame(sprawdz(magazyn, argumenty.silniki, argumenty.leki, argumenty.ziarno))
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.max_colwidth", 120):
+        print(wyniki.to_string(index=False))
+    sys.exit(1 if (wyniki["Wynik"] == "różnica").any() else 0)
@@ -0,0 +1,88 @@
+"""Ograniczony bufor wyników (LRU) wspólny dla sesji panelu, z licznikami trafień.
+
+Klucz wyniku zawiera wersję danych, więc po dopisaniu miesiąca stare wpisy nie są
+już trafiane i same wypadają z bufora jako najdawniej używane. Limit jest w bajtach,
+liczonych z memory_usage(deep=True) ramek w wyniku.
+"""
+import dataclasses
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def rozmiar(obiekt):
+    """Przybliżony rozmiar wyniku w bajtach: ramki i serie liczymy z memory_usage."""
+    if isinstance(obiekt, pd.DataFrame):
+        return int(obiekt.memory_usage(index=True, deep=True).sum())
+    if isinstance(obiekt, pd.Series):
+        return int(obiekt.memory_usage(index=True, deep=True))
+    if dataclasses.is_dataclass(obiekt) and not isinstance(obiekt, type):
+        return sum(rozmiar(getattr(obiekt, pole.name)) for pole in dataclasses.fields(obiekt))
+    if isinstance(obiekt, dict):
+        return sum(rozmiar(wartosc) for wartosc in obiekt.values())
+    if isinstance(obiekt, (list, tuple)):
+        return sum(rozmiar(element) for element in obiekt)
+    return sys.getsizeof(obiekt)
+
+
+class BuforWynikow:
+    """Bufor LRU z limitem pamięci; bezpieczny dla wielu wątków (sesji Streamlita).
+
+    Wynik liczymy poza blokadą, więc dwie sesje proszące naraz o ten sam brakujący
+    klucz policzą go obie – to rzadkie i tańsze niż blokowanie całego bufora.
+    Zwracane wyniki są współdzielone: wywołujący nie może ich modyfikować.
+    """
+
+    def __init__(self, limit_bajtow):
+        self.limit_bajtow = limit_bajtow
+        self._wpisy = OrderedDict()
+        self._bajty = 0
+        self._blokada = threading.Lock()
+        self.trafienia = 0
+        self.chybienia = 0
+        self.wyrzucenia = 0
+
+    def pobierz(self, klucz, policz):
+        """Wynik dla klucza z bufora albo policz() – zapamiętany, jeśli mieści się w limicie."""
+        with self._blokada:
+            if klucz in self._wpisy:
+                self._wpisy.move_to_end(klucz)
+                self.trafienia += 1
+                return self._wpisy[klucz][0]
+            self.chybienia += 1
+
+        wynik = policz()
+        bajty = rozmiar(wynik)
+        if bajty > self.limit_bajtow:
+            return wynik
+
+        with self._blokada:
+            if klucz in self._wpisy:
+                self._bajty -= self._wpisy.pop(klucz)[1]
+            self._wpisy[klucz] = (wynik, bajty)
+            self._bajty += bajty
+            while self._bajty > self.limit_bajtow:
+                _, (_, wyrzucone) = self._wpisy.popitem(last=False)
+                self._bajty -= wyrzucone
+                self.wyrzucenia += 1
+        return wynik
+
+    def wyczysc(self):
+        with self._blokada:
+            self._wpisy.clear()
+            self._bajty = 0
+
+    def statystyki(self):
+        with self._blokada:
+            zapytania = self.trafienia + self.chybienia
+            return {
+                "Wpisy": len(self._wpisy),
+                "Zajęte [MB]": self._bajty / 2**20,
+                "Limit [MB]": self.limit_bajtow / 2**20,
+                "Trafienia": self.trafienia,
+                "Chybienia": self.chybienia,
+                "Wyrzucenia": self.wyrzucenia,
+                "Skuteczność [%]": 100 * self.trafienia / zapytania if zapytania else 0.0,
+            }
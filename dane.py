@@ -0,0 +1,690 @@
+"""Warstwa danych panelu – kolumnowy magazyn Parquet budowany z pełne_dane.csv.
+
+Plik CSV jest parsowany tylko raz: przy pierwszym uruchomieniu lub gdy zmieni
+się jego zawartość. Panel czyta potem partycjonowany (Rok/Miesiąc) zbiór
+Parquet, wybierając tylko potrzebne kolumny.
+
+Ręczna przebudowa magazynu:  python dane.py [--wymus]
+Dopisanie nowych miesięcy:   python dopisz_dane.py delta.csv
+"""
+import argparse
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import operator
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows – blokady tylko między wątkami jednego procesu
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Ramki z tej warstwy są współdzielone przez sesje (st.cache_resource), więc polegamy na
+# Copy-on-Write: wycinki i płytkie kopie nie kopiują danych, a zapis do nich nigdy nie
+# dotyka wspólnego bufora. W pandas 3 tryb jest zawsze włączony, w 2.x włączamy go jawnie
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+PLIK_DANYCH = "pełne_dane.csv"
+PLIK_NAZW = "nazwy.csv"
+KATALOG_MAGAZYNU = "magazyn_danych"
+
+ROZMIAR_PACZKI = 100000
+KOLUMNY_PARTYCJI = ["Rok", "Miesiąc"]
+
+# Silnik zapytań panelu: "pandas" – dane i agregaty liczone w pamięci procesu,
+# "duckdb" – agregaty liczone zapytaniami SQL wprost na magazynie (zob. silnik_duckdb),
+# "polars" – to samo leniwymi zapytaniami Polars (zob. silnik_polars)
+SILNIKI = ["pandas", "duckdb", "polars"]
+SILNIK = os.environ.get("NEUCA_SILNIK", "pandas").lower()
+if SILNIK not in SILNIKI:
+    raise ValueError(f"Nieznany silnik NEUCA_SILNIK={SILNIK!r}, dostępne: {', '.join(SILNIKI)}")
+
+_PODKATALOG_SPRZEDAZY = "sprzedaz"
+_PLIK_NAZW_PARQUET = "nazwy.parquet"
+_PLIK_METADANYCH = "metadane.json"
+
+# Docelowe typy kolumn w pamięci: kategorie dla tekstów o małej liczbie wartości,
+# najwęższe typy całkowite dla roku i miesiąca
+TYPY_KOLUMN = {
+    "Rok": "int16",
+    "Miesiąc": "int8",
+    "Kategoria nazwa": "category",
+    "Rodzaj promocji poziom 2": "category",
+    "Producent sprzedażowy kod": "category",
+    "Id promocji": "category",
+}
+# Kolumny zawężane do int32 tylko wtedy, gdy nic nie tracimy (brak ułamków i braków).
+# Kwoty zostają float64 – float32 nie trzyma groszy, a sumy po milionach wierszy się rozjeżdżają
+KOLUMNY_CALKOWITE = ["Indeks", "Sprzedaż ilość", "Sprzedaż rynek ilość"]
+
+# Grupy (koszyki) rodzajów promocji wspólne dla wszystkich modułów. Reguły sprawdzamy po
+# kolei i wygrywa pierwsza pasująca: "rowne" porównuje dokładnie, "zawiera" działa jak
+# str.contains(..., case=False). Kod koszyka to pozycja na liście KOSZYKI_PROMOCJI,
+# a -1 oznacza sprzedaż spoza tych grup (także normalną)
+REGULY_PROMOCJI = [
+    ("Centralne", "rowne", "Centralne"),
+    ("Partner", "rowne", "Partner"),
+    ("Regionalne", "zawiera", "regionalne pozostałe|IPRA|RPM"),
+    ("Sieciowe", "zawiera", "sieciowe"),
+    ("ZGZ", "zawiera", "ZGZ"),
+    ("Synoptis", "zawiera", "Synoptis - akcje własne"),
+]
+KOSZYKI_PROMOCJI = list(dict.fromkeys(koszyk for koszyk, _, _ in REGULY_PROMOCJI))
+KOSZYK_POZA_GRUPAMI = "Pozostałe"
+
+_blokada_budowy = threading.Lock()
+
+
+# --------------- BLOKADY I PODMIANA KATALOGÓW ----------------------
+@contextlib.contextmanager
+def blokada_plikowa(sciezka, blokada_watkow):
+    """Blokada wyłączna dla wątków procesu (blokada_watkow) i innych procesów (flock na pliku).
+
+    Chroni zapisy magazynu, gdy korzysta z niego kilka replik panelu albo panel i skrypty
+    (dopisz_dane.py, raport_lekow.py) naraz. Plik blokady leży obok chronionego katalogu.
+    """
+    with blokada_watkow:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(sciezka)), exist_ok=True)
+        with open(sciezka, "a") as plik:
+            fcntl.flock(plik, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(plik, fcntl.LOCK_UN)
+
+
+def _blokada_magazynu(katalog):
+    return blokada_plikowa(katalog + ".blokada", _blokada_budowy)
+
+
+def katalog_tymczasowy(katalog, rodzaj):
+    """Nowy, pusty katalog o unikalnej nazwie obok `katalog` (ten sam system plików – os.replace działa)."""
+    sciezka = os.path.abspath(katalog)
+    os.makedirs(os.path.dirname(sciezka), exist_ok=True)
+    nowy = tempfile.mkdtemp(prefix=f"{os.path.basename(sciezka)}.{rodzaj}-", dir=os.path.dirname(sciezka))
+    # mkdtemp tworzy katalog tylko dla właściciela, a po podmianie czytają go też inni
+    os.chmod(nowy, 0o755)
+    return nowy
+
+
+def podmien_katalog(nowy, katalog):
+    """Podmienia `katalog` na `nowy` – czytelnicy nigdy nie widzą katalogu zapisanego w połowie."""
+    stary = katalog_tymczasowy(katalog, "stary")
+    try:
+        if os.path.exists(katalog):
+            os.replace(katalog, os.path.join(stary, "katalog"))
+        os.replace(nowy, katalog)
+    finally:
+        shutil.rmtree(stary, ignore_errors=True)
+
+
+# --------------- ODCISK PLIKÓW ŹRÓDŁOWYCH ----------------------
+def _skrot_pliku(sciezka):
+    skrot = hashlib.sha256()
+    with open(sciezka, "rb") as plik:
+        for blok in iter(lambda: plik.read(1 << 20), b""):
+            skrot.update(blok)
+    return skrot.hexdigest()
+
+
+def _odcisk(sciezka):
+    stat = os.stat(sciezka)
+    return {"mtime_ns": stat.st_mtime_ns, "rozmiar": stat.st_size}
+
+
+def _wczytaj_metadane(katalog):
+    try:
+        with open(os.path.join(katalog, _PLIK_METADANYCH), encoding="utf-8") as plik:
+            return json.load(plik)
+    except (OSError, ValueError):
+        return None
+
+
+def _zapisz_metadane(katalog, metadane):
+    sciezka = os.path.join(katalog, _PLIK_METADANYCH)
+    with open(sciezka + ".tmp", "w", encoding="utf-8") as plik:
+        json.dump(metadane, plik, ensure_ascii=False, indent=2)
+    os.replace(sciezka + ".tmp", sciezka)
+
+
+def _zrodlo_aktualne(wpis, sciezka):
+    """Porównuje plik z zapisanym odciskiem: najpierw mtime, a przy zmianie – skrót treści."""
+    if wpis is None:
+        return False
+    odcisk = _odcisk(sciezka)
+    if odcisk == {"mtime_ns": wpis["mtime_ns"], "rozmiar": wpis["rozmiar"]}:
+        return True
+    if odcisk["rozmiar"] != wpis["rozmiar"] or _skrot_pliku(sciezka) != wpis["sha256"]:
+        return False
+    # Plik tylko "dotknięty" – treść ta sama, aktualizujemy mtime bez przebudowy
+    wpis.update(odcisk)
+    return True
+
+
+def _wersja(metadane):
+    wersja = metadane["zrodla"]["dane"]["sha256"][:12] + "-" + metadane["zrodla"]["nazwy"]["sha256"][:12]
+    if metadane.get("dopiski"):
+        # Każdy dopisany plik miesięczny zmienia wersję, także gdy zastępuje już dopisany miesiąc
+        skrot = hashlib.sha256("".join(dopisek["sha256"] for dopisek in metadane["dopiski"]).encode())
+        wersja += "-" + skrot.hexdigest()[:12]
+    return wersja
+
+
+# --------------- BUDOWA MAGAZYNU ----------------------
+def _schemat_paczki(paczka):
+    # Schemat ustalamy na pierwszej paczce; kolumny liczbowe całkowite mogą w dalszych
+    # paczkach mieć braki, więc trzymamy je jako int64 z wartościami null
+    pola = []
+    for kolumna, typ in paczka.dtypes.items():
+        if pd.api.types.is_bool_dtype(typ):
+            pola.append(pa.field(kolumna, pa.bool_()))
+        elif pd.api.types.is_integer_dtype(typ):
+            pola.append(pa.field(kolumna, pa.int64()))
+        elif pd.api.types.is_float_dtype(typ):
+            pola.append(pa.field(kolumna, pa.float64()))
+        else:
+            pola.append(pa.field(kolumna, pa.string()))
+    return pa.schema(pola)
+
+
+def _dopasuj_paczke(paczka, schemat):
+    paczka = paczka.reindex(columns=schemat.names)
+    for pole in schemat:
+        kolumna = paczka[pole.name]
+        if pa.types.is_string(pole.type):
+            if not (pd.api.types.is_object_dtype(kolumna) or pd.api.types.is_string_dtype(kolumna)):
+                paczka[pole.name] = kolumna.astype("string")
+        elif pa.types.is_integer(pole.type):
+            paczka[pole.name] = pd.to_numeric(kolumna, errors="coerce").astype("Int64")
+        elif pa.types.is_floating(pole.type):
+            paczka[pole.name] = pd.to_numeric(kolumna, errors="coerce")
+    return pa.RecordBatch.from_pandas(paczka, schema=schemat, preserve_index=False)
+
+
+def partycjonowanie():
+    """Partycjonowanie hive po Rok/Miesiąc – wspólne dla danych i zapisanych agregatów."""
+    return ds.partitioning(
+        pa.schema([(kolumna, pa.int64()) for kolumna in KOLUMNY_PARTYCJI]), flavor="hive"
+    )
+
+
+def zbuduj_magazyn(sciezka_danych=PLIK_DANYCH, sciezka_nazw=PLIK_NAZW, katalog=KATALOG_MAGAZYNU):
+    """Konwertuje CSV do partycjonowanego zbioru Parquet (paczkami, bez pełnej kopii w pamięci)."""
+    nowy = katalog_tymczasowy(katalog, "nowy")
+    try:
+        metadane = _zapisz_magazyn(sciezka_danych, sciezka_nazw, nowy)
+        podmien_katalog(nowy, katalog)
+    finally:
+        shutil.rmtree(nowy, ignore_errors=True)
+    return metadane
+
+
+def _zapisz_magazyn(sciezka_danych, sciezka_nazw, nowy):
+    paczki = pd.read_csv(sciezka_danych, chunksize=ROZMIAR_PACZKI, index_col=0, low_memory=False)
+    pierwsza = next(paczki)
+    schemat = _schemat_paczki(pierwsza)
+    ds.write_dataset(
+        (_dopasuj_paczke(paczka, schemat) for paczka in itertools.chain([pierwsza], paczki)),
+        sciezka_sprzedazy(nowy),
+        schema=schemat,
+        format="parquet",
+        partitioning=partycjonowanie(),
+        existing_data_behavior="delete_matching",
+    )
+
+    wnioski = pd.read_csv(sciezka_nazw, index_col=0)
+    pq.write_table(pa.Table.from_pandas(wnioski, preserve_index=False), os.path.join(nowy, _PLIK_NAZW_PARQUET))
+
+    metadane = {
+        "kolumny": schemat.names,
+        "zrodla": {
+            "dane": {**_odcisk(sciezka_danych), "sha256": _skrot_pliku(sciezka_danych)},
+            "nazwy": {**_odcisk(sciezka_nazw), "sha256": _skrot_pliku(sciezka_nazw)},
+        },
+    }
+    _zapisz_metadane(nowy, metadane)
+    return metadane
+
+
+def przygotuj_magazyn(sciezka_danych=PLIK_DANYCH, sciezka_nazw=PLIK_NAZW, katalog=KATALOG_MAGAZYNU, wymus=False):
+    """Przebudowuje magazyn tylko wtedy, gdy zmieniły się pliki CSV. Zwraca wersję danych."""
+    # Blokada między procesami: przebudowuje tylko pierwszy, kolejne widzą już nowe metadane
+    with _blokada_magazynu(katalog):
+        metadane = _wczytaj_metadane(katalog)
+        if wymus or metadane is None:
+            metadane = zbuduj_magazyn(sciezka_danych, sciezka_nazw, katalog)
+        else:
+            zrodla = metadane["zrodla"]
+            przed = json.dumps(zrodla, sort_keys=True)
+            if not (_zrodlo_aktualne(zrodla["dane"], sciezka_danych)
+                    and _zrodlo_aktualne(zrodla["nazwy"], sciezka_nazw)):
+                metadane = zbuduj_magazyn(sciezka_danych, sciezka_nazw, katalog)
+            elif json.dumps(zrodla, sort_keys=True) != przed:
+                _zapisz_metadane(katalog, metadane)
+        return _wersja(metadane)
+
+
+def wersja_magazynu(katalog=KATALOG_MAGAZYNU):
+    """Bieżąca wersja danych magazynu (bez sprawdzania plików CSV); None, gdy magazynu nie ma."""
+    metadane = _wczytaj_metadane(katalog)
+    return None if metadane is None else _wersja(metadane)
+
+
+# --------------- DOPISYWANIE MIESIĘCY ----------------------
+def _partycja(rok, miesiac):
+    return os.path.join(f"{KOLUMNY_PARTYCJI[0]}={rok}", f"{KOLUMNY_PARTYCJI[1]}={miesiac}")
+
+
+def zapisz_partycje(dane_do_zapisu, katalog_zbioru, schemat=None, okresy=()):
+    """Zapisuje tabelę (lub paczki) Arrow jako partycje Rok/Miesiąc, zastępując w całości te,
+    które już istnieją; pozostałych partycji zbioru nie dotyka.
+
+    Partycje powstają obok zbioru i są podmieniane pojedynczo, więc czytelnik widzi
+    każdą partycję albo w starej, albo w nowej postaci. Partycje z `okresy` (pary rok,
+    miesiąc), dla których nie ma nowych wierszy, są usuwane. Zwraca listę podmienionych partycji.
+    """
+    nowy, stary = katalog_tymczasowy(katalog_zbioru, "nowe"), katalog_tymczasowy(katalog_zbioru, "stare")
+    try:
+        ds.write_dataset(dane_do_zapisu, nowy, schema=schemat, format="parquet", partitioning=partycjonowanie())
+
+        partycje = sorted(
+            os.path.relpath(korzen, nowy) for korzen, _, pliki in os.walk(nowy) if pliki
+        )
+        for partycja in partycje:
+            cel = os.path.join(katalog_zbioru, partycja)
+            os.makedirs(os.path.dirname(cel), exist_ok=True)
+            if os.path.exists(cel):
+                os.makedirs(os.path.dirname(os.path.join(stary, partycja)), exist_ok=True)
+                os.replace(cel, os.path.join(stary, partycja))
+            os.replace(os.path.join(nowy, partycja), cel)
+        for rok, miesiac in okresy:
+            if _partycja(rok, miesiac) not in partycje:
+                shutil.rmtree(os.path.join(katalog_zbioru, _partycja(rok, miesiac)), ignore_errors=True)
+    finally:
+        for katalog in (nowy, stary):
+            shutil.rmtree(katalog, ignore_errors=True)
+    return partycje
+
+
+def schemat_magazynu(katalog=KATALOG_MAGAZYNU):
+    """Schemat Arrow danych sprzedażowych w kolejności kolumn z pliku CSV."""
+    zbior = ds.dataset(sciezka_sprzedazy(katalog), format="parquet", partitioning=partycjonowanie())
+    return pa.schema([zbior.schema.field(kolumna) for kolumna in kolumny_magazynu(katalog)])
+
+
+def dopisz_partycje(sciezka_delty, katalog=KATALOG_MAGAZYNU):
+    """Zapisuje do magazynu miesiące z pliku delty (CSV o schemacie pełne_dane.csv).
+
+    Każdy miesiąc obecny w delcie zastępuje w całości swoją partycję – delta musi więc
+    zawierać komplet wierszy tych miesięcy. Nie przelicza agregatów i nie zmienia
+    wersji danych (zob. zarejestruj_dopisek). Zwraca posortowaną listę par (rok, miesiąc).
+    """
+    if _wczytaj_metadane(katalog) is None:
+        raise FileNotFoundError(f"Brak magazynu danych w {katalog!r} – najpierw zbuduj go z pełnych danych")
+    schemat = schemat_magazynu(katalog)
+    okresy = set()
+
+    def paczki():
+        for paczka in pd.read_csv(sciezka_delty, chunksize=ROZMIAR_PACZKI, index_col=0, low_memory=False):
+            if set(paczka.columns) != set(schemat.names):
+                raise ValueError(
+                    f"Kolumny pliku {sciezka_delty!r} różnią się od magazynu: "
+                    f"{sorted(set(paczka.columns) ^ set(schemat.names))}"
+                )
+            okresy.update(zip(paczka["Rok"].astype(int), paczka["Miesiąc"].astype(int)))
+            yield _dopasuj_paczke(paczka, schemat)
+
+    with _blokada_magazynu(katalog):
+        zapisz_partycje(paczki(), sciezka_sprzedazy(katalog), schemat)
+    return sorted(okresy)
+
+
+def zarejestruj_dopisek(sciezka_delty, okresy, katalog=KATALOG_MAGAZYNU):
+    """Zapisuje dopisany plik w metadanych i zwraca nową wersję danych.
+
+    Wołane po przeliczeniu agregatów dotkniętych miesięcy: jeśli agregaty były aktualne,
+    ta sama atomowa zmiana metadanych oznacza je jako aktualne dla nowej wersji.
+    """
+    with _blokada_magazynu(katalog):
+        metadane = _wczytaj_metadane(katalog)
+        agregaty_aktualne = metadane.get("agregaty") == _wersja(metadane)
+        metadane.setdefault("dopiski", []).append({
+            "plik": os.path.basename(sciezka_delty),
+            "sha256": _skrot_pliku(sciezka_delty),
+            "okresy": ["{}-{:02d}".format(rok, miesiac) for rok, miesiac in okresy],
+        })
+        if agregaty_aktualne:
+            metadane["agregaty"] = _wersja(metadane)
+        _zapisz_metadane(katalog, metadane)
+        return _wersja(metadane)
+
+
+def wersja_agregatow(katalog=KATALOG_MAGAZYNU):
+    """Wersja danych, dla której zapisano agregaty w magazynie (None – brak lub nieznana)."""
+    metadane = _wczytaj_metadane(katalog)
+    return None if metadane is None else metadane.get("agregaty")
+
+
+def oznacz_agregaty(wersja, katalog=KATALOG_MAGAZYNU):
+    with _blokada_magazynu(katalog):
+        metadane = _wczytaj_metadane(katalog)
+        metadane["agregaty"] = wersja
+        _zapisz_metadane(katalog, metadane)
+
+
+# --------------- SCHEMAT W PAMIĘCI ----------------------
+def _rozmiar_domyslny(kolumna):
+    # Szacunek rozmiaru przy typach domyślnych pandas (object dla tekstów, 64 bity dla liczb),
+    # liczony bez materializowania kolumny
+    if pa.types.is_string(kolumna.type) or pa.types.is_large_string(kolumna.type):
+        niepuste = len(kolumna) - kolumna.null_count
+        znaki = pc.sum(pc.binary_length(kolumna)).as_py() or 0
+        return 8 * len(kolumna) + 49 * niepuste + znaki
+    return 8 * len(kolumna)
+
+
+def _kolumna_zwarta(nazwa, kolumna):
+    typ = TYPY_KOLUMN.get(nazwa)
+    if typ == "category":
+        seria = kolumna.dictionary_encode().to_pandas()
+        # Słownik Arrow ma kolejność wystąpień – porządkujemy, żeby groupby sortował alfabetycznie
+        return seria.cat.reorder_categories(seria.cat.categories.sort_values())
+    if typ is not None:
+        return kolumna.cast(pa.type_for_alias(typ)).to_pandas()
+    if nazwa in KOLUMNY_CALKOWITE and kolumna.null_count == 0:
+        try:
+            return kolumna.cast(pa.int32()).to_pandas()
+        except pa.ArrowInvalid:
+            pass
+    return kolumna.to_pandas()
+
+
+def zastosuj_schemat(tabela):
+    """Zamienia tabelę Arrow na DataFrame w zwartych typach; zwraca też raport pamięci."""
+    kolumny, wiersze_raportu = {}, []
+    for nazwa in tabela.column_names:
+        kolumna = tabela.column(nazwa)
+        seria = _kolumna_zwarta(nazwa, kolumna)
+        kolumny[nazwa] = seria
+        wiersze_raportu.append({
+            "Kolumna": nazwa,
+            "Typ": str(seria.dtype),
+            "Bajty przed": _rozmiar_domyslny(kolumna),
+            "Bajty po": int(seria.memory_usage(index=False, deep=True)),
+        })
+    df = pd.DataFrame(kolumny)
+    raport = pd.DataFrame(wiersze_raportu)
+    logger.info(
+        "Dane w pamięci: %.1f MB (typy domyślne ok. %.1f MB)",
+        raport["Bajty po"].sum() / 2**20, raport["Bajty przed"].sum() / 2**20,
+    )
+    return df, raport
+
+
+# --------------- KLASYFIKACJA PROMOCJI ----------------------
+def klasyfikuj_promocje(rodzaj_promocji):
+    """Kod koszyka (int8) dla każdego wiersza; reguły sprawdzamy raz na unikalną wartość."""
+    if not isinstance(rodzaj_promocji.dtype, pd.CategoricalDtype):
+        rodzaj_promocji = rodzaj_promocji.astype("category")
+    wartosci = pd.Series(rodzaj_promocji.cat.categories.astype(str))
+    kody = np.full(len(wartosci), -1, dtype=np.int8)
+    for koszyk, sposob, wzorzec in REGULY_PROMOCJI:
+        if sposob == "rowne":
+            pasuje = wartosci == wzorzec
+        elif sposob == "zawiera":
+            pasuje = wartosci.str.contains(wzorzec, case=False, regex=True)
+        else:
+            raise ValueError(f"Nieznany sposób dopasowania promocji: {sposob}")
+        kody[(kody == -1) & pasuje.to_numpy()] = KOSZYKI_PROMOCJI.index(koszyk)
+    # Kod kategorii -1 (brak wartości) trafia na dopisany na końcu koszyk -1
+    kody = np.append(kody, np.int8(-1))
+    return pd.Series(kody[rodzaj_promocji.cat.codes.to_numpy()], index=rodzaj_promocji.index)
+
+
+def nazwy_koszykow(kody):
+    """Zamienia kody koszyków na nazwy; -1 to KOSZYK_POZA_GRUPAMI."""
+    return np.array(KOSZYKI_PROMOCJI + [KOSZYK_POZA_GRUPAMI], dtype=object)[np.asarray(kody)]
+
+
+# --------------- OKRESY ----------------------
+def klucz_okresu(rok, miesiac):
+    """Okres jako jedna liczba całkowita Rok*12+Miesiąc – rośnie razem z datą."""
+    return rok.astype("int32") * 12 + miesiac.astype("int32")
+
+
+def rok_miesiac(okres):
+    return (okres - 1) // 12, (okres - 1) % 12 + 1
+
+
+def poczatek_miesiaca(okres):
+    """Seria dat – pierwszy dzień miesiąca dla każdego klucza okresu."""
+    rok, miesiac = rok_miesiac(okres)
+    return pd.to_datetime({"year": rok, "month": miesiac, "day": 1})
+
+
+def wytnij_okres(ramka, od, do):
+    """Wiersze z okresu [od, do] dla ramki posortowanej po kolumnie Okres – dwa searchsorted zamiast maski."""
+    okresy = ramka["Okres"].to_numpy()
+    return ramka.iloc[np.searchsorted(okresy, od, "left"):np.searchsorted(okresy, do, "right")]
+
+
+# --------------- ODCZYT ----------------------
+def wczytaj_sprzedaz(kolumny=None, katalog=KATALOG_MAGAZYNU, okresy=None):
+    """Czyta dane sprzedażowe z magazynu; `kolumny` ogranicza odczyt do wskazanych kolumn,
+    a `okresy` (lista par rok, miesiąc) do wskazanych partycji.
+
+    Zwraca parę (DataFrame w zwartych typach, raport pamięci per kolumna).
+    """
+    metadane = _wczytaj_metadane(katalog)
+    kolejnosc = metadane["kolumny"]
+    if kolumny is not None:
+        kolejnosc = [kolumna for kolumna in kolejnosc if kolumna in kolumny]
+    zbior = ds.dataset(sciezka_sprzedazy(katalog), format="parquet", partitioning=partycjonowanie())
+    filtr = None
+    if okresy is not None:
+        # Pusta lista okresów to filtr zawsze fałszywy – pusta ramka z wybranymi kolumnami
+        filtr = functools.reduce(operator.or_, [
+            (ds.field("Rok") == rok) & (ds.field("Miesiąc") == miesiac) for rok, miesiac in okresy
+        ], ds.scalar(False))
+    tabela = zbior.to_table(columns=kolejnosc, filter=filtr)
+    if "Indeks" in tabela.column_names:
+        # Wiersze każdego leku leżą obok siebie (zob. IndeksLekow), a w ich obrębie
+        # rosnąco po okresie (zob. wytnij_okres)
+        tabela = tabela.sort_by([
+            (kolumna, "ascending") for kolumna in ["Indeks"] + KOLUMNY_PARTYCJI if kolumna in tabela.column_names
+        ])
+    df, raport = zastosuj_schemat(tabela)
+    return dodaj_kolumny_pochodne(df), raport
+
+
+def dodaj_kolumny_pochodne(df):
+    """Dopisuje koszyk promocji i klucz okresu, jeśli ramka ma potrzebne kolumny."""
+    if "Rodzaj promocji poziom 2" in df.columns:
+        df["Koszyk promocji"] = klasyfikuj_promocje(df["Rodzaj promocji poziom 2"])
+    if "Rok" in df.columns and "Miesiąc" in df.columns:
+        df["Okres"] = klucz_okresu(df["Rok"], df["Miesiąc"])
+    return df
+
+
+# Kolumny pochodne i kolumny magazynu, z których się je liczy
+_ZRODLA_POCHODNYCH = {
+    "Koszyk promocji": ["Rodzaj promocji poziom 2"],
+    "Okres": ["Rok", "Miesiąc"],
+}
+# Tyle razy ponawiamy odczyt leniwych kolumn, gdy magazyn zmienia się w jego trakcie
+_PROBY_ODCZYTU = 3
+
+
+def _odcisk_plikow(pliki):
+    """(i-węzeł, mtime, rozmiar) każdego pliku; None, gdy któregoś już nie ma."""
+    odcisk = []
+    for sciezka in pliki:
+        try:
+            stat = os.stat(sciezka)
+        except FileNotFoundError:
+            return None
+        odcisk.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return odcisk
+
+
+class SprzedazLeniwa:
+    """Dane sprzedażowe magazynu wczytywane kolumnami – każda przy pierwszym użyciu, potem z pamięci.
+
+    Ramka wyłącznie z Indeksu nie płaci za odczyt i konwersję pozostałych kolumn. Wszystkie
+    kolumny mają ten sam porządek wierszy co wczytaj_sprzedaz (po Indeksie i okresie):
+    permutację liczymy raz z kolumn klucza, a każdą doczytaną kolumnę nią układamy.
+
+    Każda kolumna pochodzi z tej samej listy plików partycji, ustalonej przy pierwszym
+    odczycie. Gdy magazyn się zmieni (nowa wersja albo podmieniona partycja – dopisz_partycje
+    podmienia pliki, zanim wersja się zmieni), wczytane kolumny i permutacja są porzucane,
+    a kolumny wczytywane od nowa z aktualnych plików.
+    """
+
+    def __init__(self, katalog=KATALOG_MAGAZYNU):
+        self.katalog = katalog
+        self._blokada = threading.Lock()
+        self._wyczysc()
+
+    def _wyczysc(self):
+        self._kolumny = {}
+        self._raport = {}
+        self._porzadek = None
+        self._zbior = None
+        self._odcisk = None
+
+    @classmethod
+    def z_ramki(cls, df, raport, katalog=KATALOG_MAGAZYNU):
+        """Źródło z gotowej, pełnej ramki (np. z migawki) – z tym samym interfejsem."""
+        zrodlo = cls(katalog)
+        zrodlo._kolumny = dict(df.items())
+        zrodlo._raport = {wiersz["Kolumna"]: wiersz for wiersz in raport.to_dict("records")}
+        return zrodlo
+
+    def _czytaj(self, kolumny):
+        if self._zbior is None:
+            self._zbior = ds.dataset(sciezka_sprzedazy(self.katalog), format="parquet", partitioning=partycjonowanie())
+            self._odcisk = (wersja_magazynu(self.katalog), _odcisk_plikow(self._zbior.files))
+        return self._zbior.to_table(columns=kolumny)
+
+    def _aktualne(self):
+        # Źródło z gotowej ramki (z_ramki) nie czyta plików – jego kolumny są zawsze spójne
+        return self._zbior is None or self._odcisk == (wersja_magazynu(self.katalog), _odcisk_plikow(self._zbior.files))
+
+    def _doczytaj(self, kolumny):
+        tabela = self._czytaj(kolumny)
+        if self._porzadek is None:
+            klucz = [kolumna for kolumna in ["Indeks"] + KOLUMNY_PARTYCJI if kolumna in kolumny_magazynu(self.katalog)]
+            klucze = tabela.select(klucz) if set(klucz) <= set(kolumny) else self._czytaj(klucz)
+            self._porzadek = pc.sort_indices(klucze, sort_keys=[(kolumna, "ascending") for kolumna in klucz])
+        df, raport = zastosuj_schemat(tabela.take(self._porzadek))
+        self._kolumny.update(df.items())
+        self._raport.update((wiersz["Kolumna"], wiersz) for wiersz in raport.to_dict("records"))
+        for pochodna, zrodla in _ZRODLA_POCHODNYCH.items():
+            if pochodna not in self._kolumny and all(zrodlo in self._kolumny for zrodlo in zrodla):
+                self._kolumny[pochodna] = dodaj_kolumny_pochodne(
+                    pd.DataFrame({zrodlo: self._kolumny[zrodlo] for zrodlo in zrodla}, copy=False)
+                )[pochodna]
+
+    def ramka(self, kolumny=None):
+        """Ramka wskazanych kolumn (domyślnie wszystkich, z pochodnymi) – jak wczytaj_sprzedaz."""
+        with self._blokada:
+            for _ in range(_PROBY_ODCZYTU):
+                if not self._aktualne():
+                    self._wyczysc()
+                magazyn = kolumny_magazynu(self.katalog)
+                wszystkie = magazyn + list(_ZRODLA_POCHODNYCH)
+                wybrane = wszystkie if kolumny is None else [kolumna for kolumna in wszystkie if kolumna in kolumny]
+                potrzebne = set(wybrane) - set(self._kolumny)
+                for pochodna in potrzebne & set(_ZRODLA_POCHODNYCH):
+                    potrzebne |= set(_ZRODLA_POCHODNYCH[pochodna])
+                brakujace = [kolumna for kolumna in magazyn if kolumna in potrzebne and kolumna not in self._kolumny]
+                if not brakujace:
+                    break
+                try:
+                    self._doczytaj(brakujace)
+                except OSError:
+                    # Plik partycji zniknął w trakcie odczytu – następna próba od nowa
+                    self._wyczysc()
+                    continue
+                # Pliki bez zmian także po odczycie – nowe kolumny pasują do wczytanych wcześniej
+                if self._aktualne():
+                    break
+            else:
+                raise RuntimeError(f"Magazyn {self.katalog!r} zmieniał się przy każdej z {_PROBY_ODCZYTU} prób odczytu")
+            return pd.DataFrame({kolumna: self._kolumny[kolumna] for kolumna in wybrane}, copy=False)
+
+    def raport(self):
+        """Raport pamięci (jak z wczytaj_sprzedaz) dla kolumn wczytanych do tej pory."""
+        with self._blokada:
+            return pd.DataFrame(list(self._raport.values()), columns=["Kolumna", "Typ", "Bajty przed", "Bajty po"])
+
+
+def sciezka_sprzedazy(katalog=KATALOG_MAGAZYNU):
+    """Katalog partycji Parquet z danymi sprzedażowymi."""
+    return os.path.join(katalog, _PODKATALOG_SPRZEDAZY)
+
+
+def kolumny_magazynu(katalog=KATALOG_MAGAZYNU):
+    """Kolumny danych sprzedażowych w kolejności z pliku CSV."""
+    return _wczytaj_metadane(katalog)["kolumny"]
+
+
+def wczytaj_nazwy(katalog=KATALOG_MAGAZYNU):
+    return pq.read_table(os.path.join(katalog, _PLIK_NAZW_PARQUET)).to_pandas()
+
+
+# --------------- INDEKS LEKÓW ----------------------
+class IndeksLekow:
+    """Tabela przesunięć dla danych posortowanych po Indeksie: lek -> ciągły zakres wierszy.
+
+    Wybór leku to wtedy wycinek `df.iloc[indeks.zakres(lek)]` zamiast skanu całej tabeli.
+    """
+
+    def __init__(self, indeksy, wnioski=None):
+        # Po sortowaniu braki Indeksu są na końcu, więc pomijamy je jednym cięciem
+        niepuste = int(indeksy.notna().sum())
+        unikalne, starty = np.unique(indeksy.to_numpy()[:niepuste], return_index=True)
+        konce = np.append(starty[1:], niepuste)
+        self.lista = unikalne.tolist()
+        self._zakresy = dict(zip(self.lista, zip(starty.tolist(), konce.tolist())))
+
+        if wnioski is not None and "Nazwa leku" in wnioski.columns and "Indeks" in wnioski.columns:
+            nazwy = wnioski.drop_duplicates("Indeks")
+            self._nazwy = dict(zip(nazwy["Indeks"], nazwy["Nazwa leku"]))
+        else:
+            self._nazwy = None
+
+    def zakres(self, indeks):
+        start, stop = self._zakresy.get(indeks, (0, 0))
+        return slice(start, stop)
+
+    def nazwa(self, indeks):
+        if self._nazwy is None:
+            return "Brak danych"
+        return self._nazwy.get(indeks, "Nie znaleziono")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Buduje kolumnowy magazyn danych panelu z plików CSV.")
+    parser.add_argument("--wymus", action="store_true", help="przebuduj magazyn nawet bez zmian w CSV")
+    argumenty = parser.parse_args()
+    print(f"Wersja danych: {przygotuj_magazyn(wymus=argumenty.wymus)}")
@@ -0,0 +1,44 @@
+"""Dopisanie nowych miesięcy danych do magazynu bez przebudowy całej historii.
+
+Plik delty to CSV o schemacie pełne_dane.csv z kompletem wierszy jednego lub kilku
+miesięcy. Zastępuje on w magazynie tylko partycje tych miesięcy (także już istniejące
+– np. korekta), po czym przeliczane są agregaty i wymiar rynku tylko dla nich.
+Wersja danych zmienia się na końcu, więc panel przełącza się na nowe dane przy
+następnym przebiegu skryptu, wczytując gotowe agregaty z magazynu.
+
+Zmiana samego pełne_dane.csv nadal powoduje pełną przebudowę magazynu – miesiące
+dopisane tylko z delt trzeba wtedy dopisać ponownie albo uwzględnić w nowym pliku.
+
+    python dopisz_dane.py sprzedaz_2025_01.csv [kolejna_delta.csv ...]
+"""
+import argparse
+import time
+
+import agregaty
+import dane
+
+
+def dopisz(sciezka_delty, katalog=dane.KATALOG_MAGAZYNU):
+    """Dopisuje jeden plik delty; zwraca (dopisane okresy, nowa wersja danych)."""
+    agregaty_aktualne = dane.wersja_agregatow(katalog) == dane.wersja_magazynu(katalog)
+    okresy = dane.dopisz_partycje(sciezka_delty, katalog)
+    # Nieaktualne (albo jeszcze niezbudowane) agregaty i tak zostaną zbudowane od zera
+    # przy następnym odczycie – nie ma sensu przeliczać samych nowych miesięcy
+    if agregaty_aktualne:
+        agregaty.przelicz_okresy(okresy, katalog)
+    return okresy, dane.zarejestruj_dopisek(sciezka_delty, okresy, katalog)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dopisuje miesiące z plików delty do magazynu danych panelu.")
+    parser.add_argument("pliki", nargs="+", help="pliki CSV o schemacie pełne_dane.csv")
+    parser.add_argument("--katalog", default=dane.KATALOG_MAGAZYNU, help="katalog magazynu danych")
+    argumenty = parser.parse_args()
+
+    for sciezka in argumenty.pliki:
+        start = time.perf_counter()
+        okresy, wersja = dopisz(sciezka, argumenty.katalog)
+        print(
+            f"{sciezka}: {', '.join('{}-{:02d}'.format(*okres) for okres in okresy)} "
+            f"w {time.perf_counter() - start:.1f} s, wersja danych {wersja}"
+        )
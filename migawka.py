@@ -0,0 +1,159 @@
+"""Migawka danych sprzedażowych w pliku Arrow IPC otwieranym przez mmap – jedna kopia na host.
+
+Ramka po wczytaniu z magazynu (zwarte typy, kolumny pochodne, sortowanie po Indeksie)
+jest raz zapisywana bez kompresji do migawki wersji danych. Każdy proces panelu (także
+kolejne repliki na tej samej maszynie) mapuje ten plik tylko do odczytu: kolumny ramki
+to widoki NumPy na stronach pliku, współdzielonych przez system między procesami, więc
+prywatna pamięć procesu to tylko to, co liczy on sam. Kategorie zapisujemy jako kody
+(bez braków – brak to kod -1) ze słownikiem w metadanych, a kwoty z NaN zamiast maski
+braków – inaczej konwersja do pandas musiałaby kopiować kolumny.
+
+Migawka wersji to osobny plik, a wskaźnik `aktualna.json` (podmieniany atomowo) mówi,
+która wersja jest bieżąca. Stare pliki są usuwane po podmianie – procesy, które je
+jeszcze mapują, czytają dalej swoją wersję, dopóki nie przełączą się na nową.
+
+NEUCA_MIGAWKA=0 wyłącza migawkę – panel czyta wtedy magazyn Parquet do pamięci procesu.
+"""
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import dane
+
+WLACZONA = os.environ.get("NEUCA_MIGAWKA", "1") not in ("", "0")
+
+_KATALOG_MIGAWEK = "migawki"
+_WSKAZNIK = "aktualna.json"
+
+_blokada_zapisu = threading.Lock()
+
+
+def _katalog(katalog):
+    return os.path.join(katalog, _KATALOG_MIGAWEK)
+
+
+def sciezka_migawki(wersja, katalog=dane.KATALOG_MAGAZYNU):
+    return os.path.join(_katalog(katalog), f"sprzedaz-{wersja}.arrow")
+
+
+def aktualna_wersja(katalog=dane.KATALOG_MAGAZYNU):
+    """Wersja danych bieżącej migawki według wskaźnika; None, gdy migawki nie ma."""
+    try:
+        with open(os.path.join(_katalog(katalog), _WSKAZNIK), encoding="utf-8") as plik:
+            return json.load(plik)["wersja"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _zapisz_atomowo(sciezka, zapisz):
+    # Nazwa tymczasowa unikalna dla procesu i wątku – repliki mogą zapisywać tę samą wersję naraz
+    tymczasowa = f"{sciezka}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        zapisz(tymczasowa)
+        os.replace(tymczasowa, sciezka)
+    finally:
+        if os.path.exists(tymczasowa):
+            os.remove(tymczasowa)
+
+
+def zapisz_migawke(df, raport, wersja, katalog=dane.KATALOG_MAGAZYNU):
+    """Zapisuje migawkę ramki dla wersji, podmienia wskaźnik i usuwa migawki innych wersji."""
+    kolumny, kategorie = {}, {}
+    for nazwa, seria in df.items():
+        if isinstance(seria.dtype, pd.CategoricalDtype):
+            kolumny[nazwa] = pa.array(seria.cat.codes.to_numpy())
+            kategorie[nazwa] = {
+                "wartosci": seria.cat.categories.tolist(),
+                "typ": str(seria.cat.categories.dtype),
+            }
+        elif isinstance(seria.dtype, np.dtype) and seria.dtype.kind in "iuf":
+            # Z tablicy NumPy: NaN zostaje wartością, nie brakiem z maską
+            kolumny[nazwa] = pa.array(seria.to_numpy())
+        else:
+            kolumny[nazwa] = pa.array(seria)
+    tabela = pa.table(kolumny).replace_schema_metadata({
+        "wersja": wersja,
+        "kategorie": json.dumps(kategorie, ensure_ascii=False),
+        "raport": raport.to_json(orient="records", force_ascii=False),
+    })
+
+    def zapisz(sciezka):
+        with pa.OSFile(sciezka, "wb") as plik, ipc.new_file(plik, tabela.schema) as zapis:
+            zapis.write_table(tabela)
+
+    os.makedirs(_katalog(katalog), exist_ok=True)
+    sciezka = sciezka_migawki(wersja, katalog)
+    _zapisz_atomowo(sciezka, zapisz)
+
+    def zapisz_wskaznik(sciezka_wskaznika):
+        with open(sciezka_wskaznika, "w", encoding="utf-8") as plik:
+            json.dump({"wersja": wersja, "plik": os.path.basename(sciezka)}, plik, ensure_ascii=False)
+
+    _zapisz_atomowo(os.path.join(_katalog(katalog), _WSKAZNIK), zapisz_wskaznik)
+    for stara in glob.glob(os.path.join(_katalog(katalog), "sprzedaz-*.arrow")):
+        if stara != sciezka:
+            try:
+                os.remove(stara)
+            except OSError:  # np. Windows – plik zmapowany w innym procesie
+                pass
+    return sciezka
+
+
+def _liczbowa(kolumna):
+    return (pa.types.is_integer(kolumna.type) or pa.types.is_floating(kolumna.type)) and kolumna.null_count == 0
+
+
+def otworz_migawke(sciezka):
+    """(ramka, raport pamięci) z migawki – kolumny bez kopiowania, tylko do odczytu."""
+    tabela = ipc.open_file(pa.memory_map(sciezka, "r")).read_all()
+    metadane = tabela.schema.metadata
+    kategorie = json.loads(metadane[b"kategorie"])
+    kolumny = {}
+    for nazwa in tabela.column_names:
+        kolumna = tabela.column(nazwa)
+        if not _liczbowa(kolumna):
+            # Np. teksty: pandas z pyarrow trzyma je w buforach Arrow, też bez kopii
+            kolumny[nazwa] = kolumna.to_pandas()
+            continue
+        wartosci = (kolumna.chunk(0) if kolumna.num_chunks == 1 else kolumna.combine_chunks()).to_numpy(zero_copy_only=True)
+        if nazwa in kategorie:
+            typ = pd.CategoricalDtype(pd.Index(kategorie[nazwa]["wartosci"], dtype=kategorie[nazwa]["typ"]))
+            wartosci = pd.Categorical.from_codes(wartosci, dtype=typ, validate=False)
+        kolumny[nazwa] = wartosci
+    raport = pd.DataFrame(json.loads(metadane[b"raport"]))
+    return pd.DataFrame(kolumny, copy=False), raport
+
+
+def wczytaj_sprzedaz(wersja, kolumny=None, katalog=dane.KATALOG_MAGAZYNU):
+    """Jak dane.wczytaj_sprzedaz, ale z migawki wersji – zapisywanej przy pierwszym odczycie.
+
+    Wersja inna niż bieżąca wersja magazynu (proces jeszcze nie zauważył zmiany) jest
+    czytana wprost z magazynu, bez zapisu – żeby nie podmienić nowszej migawki starszą.
+    """
+    sciezka = sciezka_migawki(wersja, katalog)
+    if not os.path.exists(sciezka):
+        if wersja != dane.wersja_magazynu(katalog):
+            return dane.wczytaj_sprzedaz(kolumny=kolumny, katalog=katalog)
+        # Migawkę wersji zapisuje jeden proces; pozostałe czekają i otwierają gotowy plik
+        with dane.blokada_plikowa(_katalog(katalog) + ".blokada", _blokada_zapisu):
+            if not os.path.exists(sciezka):
+                df, raport = dane.wczytaj_sprzedaz(katalog=katalog)
+                zapisz_migawke(df, raport, wersja, katalog)
+                # Ramkę z odczytu porzucamy – ten proces też korzysta ze stron współdzielonych
+                del df
+                pa.default_memory_pool().release_unused()
+    try:
+        df, raport = otworz_migawke(sciezka)
+    except FileNotFoundError:
+        # Migawkę tej wersji właśnie usunęła nowsza – czytamy magazyn jak bez migawki
+        return dane.wczytaj_sprzedaz(kolumny=kolumny, katalog=katalog)
+    if kolumny is not None:
+        df = df[[kolumna for kolumna in df.columns if kolumna in kolumny]]
+        raport = raport[raport["Kolumna"].isin(kolumny)].reset_index(drop=True)
+    return df, raport
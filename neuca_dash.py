@@ -1,4 +1,5 @@
 import gc
+import os
 import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
@@ -6,61 +7,278 @@ import seaborn as sns
 import plotly.graph_objects as go
 import plotly.express as px
 
+import agregaty
+import analizy
+import bufor_wynikow
+import dane
+import migawka
+import pomiary
+import rozgrzewka
+import szkice
+import tabela_stronicowana
+import wykresy
+
+if dane.SILNIK == "duckdb":
+    import silnik_duckdb
+elif dane.SILNIK == "polars":
+    import silnik_polars
+
 st.set_page_config(page_title="Panel Główny – Neuca", layout="wide")
 
+# Limit wspólnego bufora wyników widoku leku (MB)
+LIMIT_BUFORA_MB = int(os.environ.get("NEUCA_BUFOR_MB", "256"))
+# Najwięcej leków naraz w porównaniu
+LIMIT_POROWNANIA = 500
+# Domyślny zakres dat w widoku leku
+ZAKRES_DAT_LEKU = (pd.to_datetime("2022-01-01"), pd.to_datetime("2024-12-31"))
+
 # --------------- MENU BOCZNE ------------------
 st.sidebar.title("📂 Projekt zespołowy Grupa II")
-wybor_sekcji = st.sidebar.radio("Wybierz moduł analityczny:", ["Filtrowanie po ID leku", "Podstawowe analizy unikalności i sprzedaży", "Tabela udziałowa"])
+MODULY = ["Filtrowanie po ID leku", "Porównanie leków", "Podstawowe analizy unikalności i sprzedaży", "Tabela udziałowa"]
+# Ukryta strona pomiarów wydajności: ?wydajnosc=1 w adresie albo NEUCA_WYDAJNOSC=1.
+# Włącza też w procesie szczegółowe pomiary (rozmiary figur), pomijane na co dzień
+if st.query_params.get("wydajnosc") or pomiary.SZCZEGOLOWE:
+    pomiary.wlacz_szczegolowe()
+    MODULY.append("Wydajność")
+wybor_sekcji = st.sidebar.radio("Wybierz moduł analityczny:", MODULY)
 
 # --------------- FUNKCJE ----------------------
-@st.cache_data
-def wczytaj_dane():
-    chunksize = 100000
-    df_list = []
-    for chunk in pd.read_csv("pełne_dane.csv", chunksize=chunksize, index_col=0, low_memory=False):
-        df_list.append(chunk)
-    df = pd.concat(df_list, axis=0)
-    wnioski = pd.read_csv("nazwy.csv", index_col=0)
-    return df, wnioski
+# Wersja danych zmienia się tylko po zmianie plików CSV, więc jest kluczem cache;
+# przy każdym przebiegu sprawdzamy jedynie mtime plików źródłowych.
+# cache_resource trzyma jeden egzemplarz danych dla wszystkich sesji (cache_data
+# kopiowałby całą ramkę przy każdym przebiegu); sesje dostają płytkie kopie
+# Copy-on-Write, więc żadna nie zmieni danych pozostałym. Po dopisaniu miesiąca
+# (nowa wersja) poprzedni egzemplarz wypada z cache (max_entries=1). Kolumny są
+# wczytywane przy pierwszym użyciu (indeks leków potrzebuje tylko kolumny Indeks),
+# a z migawką (NEUCA_MIGAWKA, domyślnie włączona) ramka to widok na plik zmapowany
+# w pamięci – wszystkie procesy panelu na maszynie dzielą jedną kopię danych, a strony
+# kolumn, których nikt nie czyta, w ogóle nie trafiają do pamięci
+@pomiary.buforowana(st.cache_resource(max_entries=1))
+def _zrodlo_sprzedazy(wersja_danych):
+    if migawka.WLACZONA:
+        return dane.SprzedazLeniwa.z_ramki(*migawka.wczytaj_sprzedaz(wersja_danych))
+    return dane.SprzedazLeniwa()
+
+def _wczytaj_dane(wersja_danych, kolumny=None):
+    zrodlo = _zrodlo_sprzedazy(wersja_danych)
+    return zrodlo.ramka(kolumny), _wczytaj_nazwy(wersja_danych), zrodlo.raport()
+
+def wczytaj_dane(wersja_danych, kolumny=None):
+    df, wnioski, raport_pamieci = _wczytaj_dane(wersja_danych, kolumny)
+    return df.copy(deep=False), wnioski.copy(deep=False), raport_pamieci
+
+@pomiary.buforowana(st.cache_resource(max_entries=1))
+def _wczytaj_nazwy(wersja_danych):
+    return dane.wczytaj_nazwy()
+
+# Tabela przesunięć i nazwy leków – liczone raz na wersję danych, nie przy każdym wyborze
+@pomiary.buforowana(st.cache_resource(max_entries=1))
+def wczytaj_indeks_lekow(wersja_danych):
+    if dane.SILNIK != "pandas":
+        # Bez surowych danych w pamięci – lista leków z kostki
+        return dane.IndeksLekow(_wczytaj_agregaty(wersja_danych).kostka["Indeks"], _wczytaj_nazwy(wersja_danych))
+    df, wnioski, _ = _wczytaj_dane(wersja_danych, ["Indeks"])
+    return dane.IndeksLekow(df["Indeks"], wnioski)
+
+# Silnik DuckDB: jedno połączenie na wersję danych (zapytania idą przez osobne kursory)
+@st.cache_resource(max_entries=1)
+def polaczenie_duckdb(wersja_danych):
+    return silnik_duckdb.polacz()
+
+# Wspólny dla sesji bufor LRU wyników widoku leku. Klucz zawiera wersję danych, więc
+# wpisy poprzedniej wersji nie są trafiane i wypadają jako najdawniej używane
+@st.cache_resource
+def bufor_lekow():
+    return bufor_wynikow.BuforWynikow(LIMIT_BUFORA_MB * 2**20)
+
+# Wiersze leku zapytaniem do magazynu (silniki bez surowych danych w pamięci)
+def wiersze_leku_z_magazynu(wersja_danych, indeks):
+    if dane.SILNIK == "duckdb":
+        def policz():
+            return silnik_duckdb.wiersze_leku(polaczenie_duckdb(wersja_danych), indeks)
+    else:
+        def policz():
+            return silnik_polars.wiersze_leku(indeks)
+    return bufor_lekow().pobierz((wersja_danych, "wiersze", indeks), pomiary.mierzona("wiersze_leku · liczenie")(policz))
+
+def widok_leku(wersja_danych, indeks, okres_od, okres_do):
+    return bufor_lekow().pobierz(
+        (wersja_danych, "widok", indeks, okres_od, okres_do),
+        lambda: pomiary.mierzona("widok_leku · liczenie")(analizy.widok_leku)(
+            _wczytaj_agregaty(wersja_danych), indeks, _wczytaj_nazwy(wersja_danych), okres_od, okres_do
+        ),
+    )
+
+# Czas wysłania figury (serializacja do JSON w st.plotly_chart) – osobno od czasu budowy
+def pokaz_wykres(nazwa, fig, **opcje):
+    with pomiary.mierz(f"wykres · {nazwa} · wysłanie"):
+        st.plotly_chart(fig, **opcje)
+
+def pokaz_bufor(bufor):
+    with st.sidebar.expander("📦 Bufor wyników leków"):
+        statystyki = bufor.statystyki()
+        st.markdown(
+            f"**{statystyki['Skuteczność [%]']:.0f}%** trafień "
+            f"({statystyki['Trafienia']} / {statystyki['Trafienia'] + statystyki['Chybienia']}), "
+            f"{statystyki['Wpisy']} wpisów, {statystyki['Zajęte [MB]']:.1f} z {statystyki['Limit [MB]']:.0f} MB"
+        )
+
+# Kostka agregatów miesięcznych i wymiar rynku wspólne dla wszystkich modułów, zapisane
+# w magazynie – moduły analityczne nie ładują pełnych danych. Buduje je od zera tylko
+# pierwszy przebieg po przebudowie magazynu; dopisanie miesiąca (dopisz_dane.py)
+# przelicza same jego partycje, a tu wczytujemy gotowe tabele nowej wersji.
+# Kolumny pochodne (uzupełniony rodzaj promocji, podział budżetu, cena jednostkowa)
+# są w nich policzone raz, przy budowie
+@pomiary.buforowana(st.cache_resource(max_entries=1))
+def _wczytaj_agregaty(wersja_danych):
+    if dane.SILNIK == "duckdb":
+        return agregaty.przygotuj_agregaty(
+            wersja_danych, zbuduj=lambda: silnik_duckdb.zbuduj_agregaty(polaczenie_duckdb(wersja_danych))
+        )
+    if dane.SILNIK == "polars":
+        return agregaty.przygotuj_agregaty(wersja_danych, zbuduj=silnik_polars.zbuduj_agregaty)
+    return agregaty.przygotuj_agregaty(wersja_danych)
+
+def wczytaj_agregaty(wersja_danych):
+    return _wczytaj_agregaty(wersja_danych).widok()
+
+# Tabele modułów dla zakresu okresu – małe wyniki, liczone raz na (wersja, zakres)
+# dla wszystkich sesji; cache_data daje każdej sesji własną kopię. Niezależne tabele
+# liczą się równolegle w puli wątków (NEUCA_WATKI, 1 – po kolei)
+@pomiary.buforowana(st.cache_data(max_entries=32))
+def tabele_analiz(wersja_danych, okres_od, okres_do, przyblizone=False):
+    szkice_hll = wczytaj_szkice(wersja_danych) if przyblizone else None
+    return analizy.tabele_analiz(_wczytaj_agregaty(wersja_danych), okres_od, okres_do, szkice=szkice_hll)
+
+# Szkice HyperLogLog komórek (Rok, Miesiąc, Kategoria, Rodzaj) – liczone z agregatów
+# tylko wtedy, gdy ktoś włączy tryb przybliżony
+@pomiary.buforowana(st.cache_resource(max_entries=1))
+def wczytaj_szkice(wersja_danych):
+    return szkice.zbuduj_szkice(_wczytaj_agregaty(wersja_danych))
+
+@pomiary.buforowana(st.cache_data(max_entries=32))
+def produkty_w_kategoriach(wersja_danych, kategorie, okres_od, okres_do, przyblizone=False):
+    szkice_hll = wczytaj_szkice(wersja_danych) if przyblizone else None
+    return analizy.produkty_w_kategoriach(_wczytaj_agregaty(wersja_danych), kategorie, okres_od, okres_do, szkice_hll)
+
+@pomiary.buforowana(st.cache_data(max_entries=32))
+def tabela_udzialowa(wersja_danych, okres_od, okres_do):
+    return analizy.tabela_udzialowa(_wczytaj_agregaty(wersja_danych), okres_od, okres_do)
+
+# Porównanie leków: wiersze wybranych leków to wycinki kostki (koszt rośnie z liczbą
+# wybranych wierszy), a wszystkie liczby – kilka grupowań po Indeksie zamiast widoku na lek
+@pomiary.buforowana(st.cache_data(max_entries=32))
+def porownanie_lekow(wersja_danych, indeksy, okres_od, okres_do):
+    return analizy.raport_lekow(
+        _wczytaj_agregaty(wersja_danych), _wczytaj_nazwy(wersja_danych), okres_od, okres_do, indeksy
+    )
+
+# Rozgrzewka: wątek w tle (jeden na wersję danych w procesie serwera) wywołuje po kolei
+# funkcje z cache – agregaty, domyślne widoki modułów (pełny zakres okresu) i indeks
+# leków – zanim poprosi o nie któraś sesja. Pozostałe kolumny danych sprzedażowych
+# wczytuje dopiero pierwsze otwarcie widoku leku
+@st.cache_resource(max_entries=1)
+def uruchom_rozgrzewke(wersja_danych):
+    def pelny_zakres():
+        okresy = _wczytaj_agregaty(wersja_danych).okresy
+        return okresy[0], okresy[-1]
+
+    kroki = [
+        ("Agregaty miesięczne", lambda: _wczytaj_agregaty(wersja_danych)),
+        ("Podstawowe analizy", lambda: tabele_analiz(wersja_danych, *pelny_zakres())),
+        ("Tabela udziałowa", lambda: tabela_udzialowa(wersja_danych, *pelny_zakres())),
+        ("Indeks leków", lambda: wczytaj_indeks_lekow(wersja_danych)),
+        ("Domyślny lek", lambda: widok_leku(
+            wersja_danych,
+            wczytaj_indeks_lekow(wersja_danych).lista[0],
+            *(data.year * 12 + data.month for data in ZAKRES_DAT_LEKU),
+        )),
+    ]
+    return rozgrzewka.Rozgrzewka(kroki).start()
+
+IKONY_ROZGRZEWKI = {
+    rozgrzewka.OCZEKUJE: "⏳",
+    rozgrzewka.W_TOKU: "🔄",
+    rozgrzewka.GOTOWE: "✅",
+    rozgrzewka.BLAD: "⚠️",
+}
+
+def pokaz_rozgrzewke(stan_rozgrzewki):
+    # Dopóki rozgrzewka trwa, sam stan odświeża się co 2 s, bez przeliczania strony
+    @st.fragment(run_every=None if stan_rozgrzewki.zakonczona else 2)
+    def stan():
+        kroki = stan_rozgrzewki.stan()
+        gotowe = sum(stan == rozgrzewka.GOTOWE for _, stan, _ in kroki)
+        with st.expander(f"🔥 Dane gotowe: {gotowe}/{len(kroki)}", expanded=not stan_rozgrzewki.zakonczona):
+            for nazwa, stan, czas in kroki:
+                opis = f" ({czas:.1f} s)" if czas is not None else ""
+                st.markdown(f"{IKONY_ROZGRZEWKI[stan]} {nazwa}{opis}")
+
+    with st.sidebar:
+        stan()
+
+# Ułamek jako procent z przecinkiem dziesiętnym, np. 0.0123 -> "1,2%"
+def format_procent(ulamek):
+    return f"{ulamek * 100:.1f}".replace(".", ",") + "%"
+
+# Zakres miesięcy jako para kluczy okresu (Rok*12+Miesiąc) – wspólny filtr modułów analitycznych
+def wybierz_zakres_okresu(okresy, klucz):
+    return st.sidebar.select_slider(
+        "Zakres okresu",
+        options=okresy,
+        value=(okresy[0], okresy[-1]),
+        format_func=lambda okres: "{}-{:02d}".format(*dane.rok_miesiac(okres)),
+        key=klucz,
+    )
+
+def pokaz_raport_pamieci(raport):
+    with st.sidebar.expander("💾 Pamięć danych"):
+        przed, po = raport["Bajty przed"].sum(), raport["Bajty po"].sum()
+        st.markdown(f"**{po / 2**20:,.1f} MB** (typy domyślne ok. {przed / 2**20:,.1f} MB)")
+        st.dataframe(raport, hide_index=True, use_container_width=True)
+
+wersja_danych = dane.przygotuj_magazyn()
+raport_pamieci = None
+pokaz_rozgrzewke(uruchom_rozgrzewke(wersja_danych))
 
 # --------------- Filtrowanie po leku -------------------
 if wybor_sekcji == "Filtrowanie po ID leku":
-    df, wnioski = wczytaj_dane()
+    if dane.SILNIK == "pandas":
+        df, _, raport_pamieci = wczytaj_dane(wersja_danych)
     st.title("Filtrowanie po leku")
 
-    unikalne_indeksy = df['Indeks'].dropna().unique()
-    wybor = st.selectbox("Wybierz ID leku:", sorted(unikalne_indeksy))
-    wynik = df[df['Indeks'] == wybor]
+    indeks_lekow = wczytaj_indeks_lekow(wersja_danych)
+    wybor = st.selectbox("Wybierz ID leku:", indeks_lekow.lista)
+    with pomiary.mierz("wiersze_leku"):
+        if dane.SILNIK != "pandas":
+            wynik = wiersze_leku_z_magazynu(wersja_danych, wybor)
+        else:
+            wynik = analizy.wiersze_leku(df, indeks_lekow, wybor)
 
     # Nazwa leku z wnioski
-    if 'Nazwa leku' in wnioski.columns and 'Indeks' in wnioski.columns:
-        dopasowanie = wnioski[wnioski['Indeks'] == wybor]
-        if not dopasowanie.empty:
-            nazwa_leku = dopasowanie.iloc[0]['Nazwa leku']
-        else:
-            nazwa_leku = "Nie znaleziono"
-    else:
-        nazwa_leku = "Brak danych"
+    nazwa_leku = indeks_lekow.nazwa(wybor)
 
     st.sidebar.subheader(f"Nazwa leku dla indeksu {wybor}:")
     st.sidebar.write(f"**{nazwa_leku}**")
 
+    opis = analizy.opis_leku(wynik)
+
     # Kategorie
-    kategorie = wynik['Kategoria nazwa'].dropna().unique()
+    kategorie = opis['Kategoria nazwa']
     if len(kategorie) > 0:
         st.sidebar.subheader("Kategorie leku:")
         for k in kategorie:
             st.sidebar.write(f"- {k}")
 
     # Rodzaje promocji
-    rodzaje_promocji = wynik['Rodzaj promocji poziom 2'].dropna().unique()
+    rodzaje_promocji = opis['Rodzaj promocji poziom 2']
     if len(rodzaje_promocji) > 0:
         st.sidebar.subheader("Rodzaje promocji:")
         for r in rodzaje_promocji:
             st.sidebar.write(f"- {r}")
 
     # Producenci i ich nazwy
-    producenci = wynik['Producent sprzedażowy kod'].dropna().unique()
+    producenci = opis['Producent sprzedażowy kod']
     if len(producenci) > 0:
         st.sidebar.subheader("Producenci:")
         for p in producenci:
@@ -70,257 +288,239 @@ if wybor_sekcji == "Filtrowanie po ID leku":
 
 
     st.write(f"**Liczba rekordów dla {wybor}:** {len(wynik)}")
-    st.dataframe(wynik)
-
-    st.subheader("Filtruj dane według zakresu dat")
-    min_date = pd.to_datetime("2022-01-01")
-    max_date = pd.to_datetime("2024-12-31")
-    start_date = st.date_input("Wybierz początek okresu", value=min_date, min_value=min_date, max_value=max_date)
-    end_date = st.date_input("Wybierz koniec okresu", value=max_date, min_value=min_date, max_value=max_date)
-
-    start_rok, start_miesiac = start_date.year, start_date.month
-    end_rok, end_miesiac = end_date.year, end_date.month
-
-    dane_okres = wynik[(
-        wynik['Rok'] >= start_rok) & 
-        (wynik['Rok'] <= end_rok) & 
-        ((wynik['Rok'] > start_rok) | (wynik['Miesiąc'] >= start_miesiac)) & 
-        ((wynik['Rok'] < end_rok) | (wynik['Miesiąc'] <= end_miesiac))]
-
-    ilosc_sprzedana = dane_okres['Sprzedaż ilość'].sum()
-    wartosc_sprzedazy = dane_okres['Sprzedaż budżetowa'].sum()
-
-    st.subheader(f"Podsumowanie dla okresu {start_date.strftime('%B %Y')} - {end_date.strftime('%B %Y')}")
-    st.markdown(f"- **Suma sprzedanych sztuk:** {ilosc_sprzedana:,.0f}")
-    st.markdown(f"- **Wartość sprzedaży:** {wartosc_sprzedazy:,.2f} zł")
-
-    if start_rok in [2023, 2024] or end_rok in [2023, 2024]:
-        # Liczymy dane rynkowe, ale tylko raz bierzemy pod uwagę kwotę lub ilość dla danego roku i miesiąca
-        dane_rynek = dane_okres.drop_duplicates(subset=['Rok', 'Miesiąc', 'Indeks'])
-        dane_rynek = dane_rynek.groupby(['Rok', 'Miesiąc']).agg({
-            'Sprzedaż rynek ilość': 'sum',
-            'Sprzedaż rynek wartość': 'sum'
-        }).reset_index()
-
-        ilosc_rynek = dane_rynek['Sprzedaż rynek ilość'].sum()
-        wartosc_rynek = dane_rynek['Sprzedaż rynek wartość'].sum()
-
-        st.markdown("**Dane rynkowe:**")
-        st.markdown(f"- **Suma sprzedanych sztuk na rynku:** {ilosc_rynek:,.0f}")
-        st.markdown(f"- **Wartość rynku:** {wartosc_rynek:,.2f} zł")
-
-        if wartosc_rynek > 0 and ilosc_rynek > 0:
-            # Wyświetlanie wykresów
-            st.subheader("📊 Udział Neuca w rynku")
-
-            # Wykres wartościowy
-            fig_value = go.Figure()
-            fig_value.add_trace(go.Bar(
-                x=[wartosc_sprzedazy / wartosc_rynek * 100],
-                y=["Wartość"],
-                orientation='h',
-                text=[f"{wartosc_sprzedazy / wartosc_rynek * 100:.1f}%"],
-                textposition='inside',
-                marker=dict(color='mediumseagreen'),
-                name=f"Udział wartościowy: {wartosc_sprzedazy / wartosc_rynek * 100:.1f}%"
-            ))
-            fig_value.add_trace(go.Bar(
-                x=[100 - wartosc_sprzedazy / wartosc_rynek * 100],
-                y=["Wartość"],
-                orientation='h',
-                marker=dict(color='lightgray'),
-                showlegend=False
-            ))
-            fig_value.update_layout(
-                barmode='stack',
-                xaxis=dict(range=[0, 100], title="Udział [%]"),
-                title="Udział wartościowy Neuca w rynku",
-                height=120
-            )
-            st.plotly_chart(fig_value, use_container_width=True)
-
-            # Wykres ilościowy
-            fig_qty = go.Figure()
-            fig_qty.add_trace(go.Bar(
-                x=[ilosc_sprzedana / ilosc_rynek * 100],
-                y=["Ilość"],
-                orientation='h',
-                text=[f"{ilosc_sprzedana / ilosc_rynek * 100:.1f}%"],
-                textposition='inside',
-                marker=dict(color='cornflowerblue'),
-                name=f"Udział ilościowy: {ilosc_sprzedana / ilosc_rynek * 100:.1f}%"
-            ))
-            fig_qty.add_trace(go.Bar(
-                x=[100 - ilosc_sprzedana / ilosc_rynek * 100],
-                y=["Ilość"],
-                orientation='h',
-                marker=dict(color='lightgray'),
-                showlegend=False
-            ))
-            fig_qty.update_layout(
-                barmode='stack',
-                xaxis=dict(range=[0, 100], title="Udział [%]"),
-                title="Udział ilościowy Neuca w rynku",
-                height=120
-            )
-            st.plotly_chart(fig_qty, use_container_width=True)
-
-            # Wyświetlenie wniosków
-            st.sidebar.markdown(f"**Udział ilościowy:** {ilosc_sprzedana / ilosc_rynek * 100:.1f}%")
-            st.sidebar.markdown(f"**Udział wartościowy:** {wartosc_sprzedazy / wartosc_rynek * 100:.1f}%")
-            # Wykres sprzedaży z promocji (z podziałem na kategorie)
-            sprzedaz_promocja_centralne = dane_okres[dane_okres['Rodzaj promocji poziom 2'] == 'Centralne']['Sprzedaż ilość'].sum()
-            sprzedaz_promocja_partner = dane_okres[dane_okres['Rodzaj promocji poziom 2'] == 'Partner']['Sprzedaż ilość'].sum()
-            sprzedaz_promocja_ipra_rpm = dane_okres[dane_okres['Rodzaj promocji poziom 2'].str.contains('regionalne pozostałe|IPRA|RPM', case=False, na=False)]['Sprzedaż ilość'].sum()
-            sprzedaz_promocja_sieciowe = dane_okres[dane_okres['Rodzaj promocji poziom 2'].str.contains('sieciowe', case=False, na=False)]['Sprzedaż ilość'].sum()
-            sprzedaz_promocja_zgz = dane_okres[dane_okres['Rodzaj promocji poziom 2'].str.contains('ZGZ', case=False, na=False)]['Sprzedaż ilość'].sum()
-            sprzedaz_promocja_synoptis = dane_okres[dane_okres['Rodzaj promocji poziom 2'].str.contains('Synoptis - akcje własne', case=False, na=False)]['Sprzedaż ilość'].sum()
-
-    # Całkowita sprzedaż promocyjna
-            total_promocja = sprzedaz_promocja_centralne + sprzedaz_promocja_partner + sprzedaz_promocja_ipra_rpm + sprzedaz_promocja_sieciowe + sprzedaz_promocja_zgz + sprzedaz_promocja_synoptis
-
-# Obliczanie procentów dla poszczególnych kategorii promocji
-            sprzedaz_promocja_centralne_pct = (sprzedaz_promocja_centralne / total_promocja) * 100 if total_promocja else 0
-            sprzedaz_promocja_partner_pct = (sprzedaz_promocja_partner / total_promocja) * 100 if total_promocja else 0
-            sprzedaz_promocja_ipra_rpm_pct = (sprzedaz_promocja_ipra_rpm / total_promocja) * 100 if total_promocja else 0
-            sprzedaz_promocja_sieciowe_pct = (sprzedaz_promocja_sieciowe / total_promocja) * 100 if total_promocja else 0
-            sprzedaz_promocja_zgz_pct = (sprzedaz_promocja_zgz / total_promocja) * 100 if total_promocja else 0
-            sprzedaz_promocja_synoptis_pct = (sprzedaz_promocja_synoptis / total_promocja) * 100 if total_promocja else 0
-
-# Tworzenie wykresu
-            fig_sprzedaz = go.Figure()
-
-# Dodanie słupków dla każdej kategorii promocji
-            fig_sprzedaz.add_trace(go.Bar(
-                x=["Centralne", "Partner", "Regionalne", "Sieciowe", "ZGZ", "Synoptis"],
-                y=[sprzedaz_promocja_centralne_pct, sprzedaz_promocja_partner_pct, sprzedaz_promocja_ipra_rpm_pct, 
-                   sprzedaz_promocja_sieciowe_pct, sprzedaz_promocja_zgz_pct, sprzedaz_promocja_synoptis_pct],
-                text=[f"{sprzedaz_promocja_centralne_pct:.1f}%", f"{sprzedaz_promocja_partner_pct:.1f}%", 
-                      f"{sprzedaz_promocja_ipra_rpm_pct:.1f}%", f"{sprzedaz_promocja_sieciowe_pct:.1f}%", 
-                      f"{sprzedaz_promocja_zgz_pct:.1f}%", f"{sprzedaz_promocja_synoptis_pct:.1f}%"],
-                textposition='inside',
-                marker=dict(color=['skyblue', 'orange', 'yellow', 'red', 'purple', 'pink']),
-                name="Udziały w promocji"
+    tabela_stronicowana.pokaz_tabele(
+        wynik, "wiersze_leku", f"lek_{wybor}", column_config={"Koszyk promocji": None, "Okres": None}
+    )
+
+    # Zmiana dat przelicza tylko ten fragment (podsumowanie okresu, wykresy, udziały w pasku
+    # bocznym) – wiersze leku, jego opis i tabela zostają z ostatniego pełnego przebiegu
+    @st.fragment
+    @pomiary.mierzona("fragment · okres leku")
+    def okres_leku(wersja_danych, wybor):
+        st.subheader("Filtruj dane według zakresu dat")
+        min_date, max_date = ZAKRES_DAT_LEKU
+        start_date = st.date_input("Wybierz początek okresu", value=min_date, min_value=min_date, max_value=max_date)
+        end_date = st.date_input("Wybierz koniec okresu", value=max_date, min_value=min_date, max_value=max_date)
+
+        start_rok, start_miesiac = start_date.year, start_date.month
+        end_rok, end_miesiac = end_date.year, end_date.month
+        okres_od, okres_do = start_rok * 12 + start_miesiac, end_rok * 12 + end_miesiac
+
+        # Sumy, promocje, budżet i trendy liczymy z kostki leku, dane rynkowe z wymiaru rynku;
+        # komplet wyników dla (lek, okres) bierzemy ze wspólnego bufora
+        with pomiary.mierz("widok_leku"):
+            widok = widok_leku(wersja_danych, wybor, okres_od, okres_do)
+        podsumowanie_leku = widok.podsumowanie
+        ilosc_sprzedana = podsumowanie_leku.ilosc
+        wartosc_sprzedazy = podsumowanie_leku.wartosc
+
+        st.subheader(f"Podsumowanie dla okresu {start_date.strftime('%B %Y')} - {end_date.strftime('%B %Y')}")
+        st.markdown(f"- **Suma sprzedanych sztuk:** {ilosc_sprzedana:,.0f}")
+        st.markdown(f"- **Wartość sprzedaży:** {wartosc_sprzedazy:,.2f} zł")
+
+        if start_rok in [2023, 2024] or end_rok in [2023, 2024]:
+            ilosc_rynek = podsumowanie_leku.ilosc_rynek
+            wartosc_rynek = podsumowanie_leku.wartosc_rynek
+
+            st.markdown("**Dane rynkowe:**")
+            st.markdown(f"- **Suma sprzedanych sztuk na rynku:** {ilosc_rynek:,.0f}")
+            st.markdown(f"- **Wartość rynku:** {wartosc_rynek:,.2f} zł")
+
+            if wartosc_rynek > 0 and ilosc_rynek > 0:
+                # Wyświetlanie wykresów
+                st.subheader("📊 Udział Neuca w rynku")
+
+                # Wykres wartościowy
+                fig_value = go.Figure()
+                fig_value.add_trace(go.Bar(
+                    x=[wartosc_sprzedazy / wartosc_rynek * 100],
+                    y=["Wartość"],
+                    orientation='h',
+                    text=[f"{wartosc_sprzedazy / wartosc_rynek * 100:.1f}%"],
+                    textposition='inside',
+                    marker=dict(color='mediumseagreen'),
+                    name=f"Udział wartościowy: {wartosc_sprzedazy / wartosc_rynek * 100:.1f}%"
                 ))
+                fig_value.add_trace(go.Bar(
+                    x=[100 - wartosc_sprzedazy / wartosc_rynek * 100],
+                    y=["Wartość"],
+                    orientation='h',
+                    marker=dict(color='lightgray'),
+                    showlegend=False
+                ))
+                fig_value.update_layout(
+                    barmode='stack',
+                    xaxis=dict(range=[0, 100], title="Udział [%]"),
+                    title="Udział wartościowy Neuca w rynku",
+                    height=120
+                )
+                pokaz_wykres("udzial_wartosciowy", fig_value, use_container_width=True)
+
+                # Wykres ilościowy
+                fig_qty = go.Figure()
+                fig_qty.add_trace(go.Bar(
+                    x=[ilosc_sprzedana / ilosc_rynek * 100],
+                    y=["Ilość"],
+                    orientation='h',
+                    text=[f"{ilosc_sprzedana / ilosc_rynek * 100:.1f}%"],
+                    textposition='inside',
+                    marker=dict(color='cornflowerblue'),
+                    name=f"Udział ilościowy: {ilosc_sprzedana / ilosc_rynek * 100:.1f}%"
+                ))
+                fig_qty.add_trace(go.Bar(
+                    x=[100 - ilosc_sprzedana / ilosc_rynek * 100],
+                    y=["Ilość"],
+                    orientation='h',
+                    marker=dict(color='lightgray'),
+                    showlegend=False
+                ))
+                fig_qty.update_layout(
+                    barmode='stack',
+                    xaxis=dict(range=[0, 100], title="Udział [%]"),
+                    title="Udział ilościowy Neuca w rynku",
+                    height=120
+                )
+                pokaz_wykres("udzial_ilosciowy", fig_qty, use_container_width=True)
+
+                # Wyświetlenie wniosków
+                st.sidebar.markdown(f"**Udział ilościowy:** {ilosc_sprzedana / ilosc_rynek * 100:.1f}%")
+                st.sidebar.markdown(f"**Udział wartościowy:** {wartosc_sprzedazy / wartosc_rynek * 100:.1f}%")
+                # Wykres sprzedaży z promocji (z podziałem na kategorie)
+                sprzedaz_koszykow = widok.koszyki
+                sprzedaz_koszykow_pct = sprzedaz_koszykow['Udział [%]']
+
+    # Tworzenie wykresu
+                fig_sprzedaz = go.Figure()
+
+    # Dodanie słupków dla każdej kategorii promocji
+                fig_sprzedaz.add_trace(go.Bar(
+                    x=sprzedaz_koszykow['Grupa promocji'],
+                    y=sprzedaz_koszykow_pct.tolist(),
+                    text=[f"{pct:.1f}%" for pct in sprzedaz_koszykow_pct],
+                    textposition='inside',
+                    marker=dict(color=['skyblue', 'orange', 'yellow', 'red', 'purple', 'pink']),
+                    name="Udziały w promocji"
+                    ))
+
+    # Dostosowanie wykresu
+                fig_sprzedaz.update_layout(
+                    barmode='stack',
+                    title="Udział sprzedaży w promocjach (podział na kategorie)",
+                    xaxis_title="Rodzaj promocji",
+                    yaxis_title="Udział [%]",
+                    yaxis=dict(range=[0, 100]),
+                    height=400
+                    )   
 
-# Dostosowanie wykresu
-            fig_sprzedaz.update_layout(
-                barmode='stack',
-                title="Udział sprzedaży w promocjach (podział na kategorie)",
-                xaxis_title="Rodzaj promocji",
-                yaxis_title="Udział [%]",
-                yaxis=dict(range=[0, 100]),
-                height=400
-                )   
-
-# Wyświetlanie wykresu w Streamlit
-            st.plotly_chart(fig_sprzedaz, use_container_width=True)
-
-# Zakładając, że dane_okres i wnioski są już załadowane, wykonajmy odpowiednie obliczenia
-            dane_okres['Budget_ZP'] = dane_okres['Sprzedaż budżetowa ZP'].fillna(0)
-            dane_okres['Budget_Promocyjna'] = dane_okres['Sprzedaż budżetowa promocyjna'].fillna(0)
-            dane_okres['Budget_Normalna'] = (dane_okres['Sprzedaż budżetowa'] - dane_okres['Budget_ZP'] - dane_okres['Budget_Promocyjna']).clip(lower=0)
-
-# Grupowanie po leku
-            podsumowanie = dane_okres.groupby('Indeks')[['Budget_ZP', 'Budget_Promocyjna', 'Budget_Normalna']].sum().reset_index()
-
-# Dodanie kolumny 'Suma_budzetowa' (suma wszystkich składowych budżetu)
-            podsumowanie['Suma_budzetowa'] = podsumowanie[['Budget_ZP', 'Budget_Promocyjna', 'Budget_Normalna']].sum(axis=1)
+    # Wyświetlanie wykresu w Streamlit
+                pokaz_wykres("promocje_kategorie", fig_sprzedaz, use_container_width=True)
 
-# Łączenie z danymi o nazwach leków
-            podsumowanie = podsumowanie.merge(wnioski[['Indeks', 'Nazwa leku']], on='Indeks', how='left')
+    # Struktura budżetu leku, posortowana po sumie budżetowej
+                df_plot = widok.budzet
 
-# Obliczenia procentów dla każdej kategorii budżetu
-            podsumowanie['Percent_Budget_ZP'] = podsumowanie['Budget_ZP'] / podsumowanie['Suma_budzetowa'] * 100
-            podsumowanie['Percent_Budget_Promocyjna'] = podsumowanie['Budget_Promocyjna'] / podsumowanie['Suma_budzetowa'] * 100
-            podsumowanie['Percent_Budget_Normalna'] = podsumowanie['Budget_Normalna'] / podsumowanie['Suma_budzetowa'] * 100
+    # Najwięcej LIMIT_KATEGORII leków, udziały w dymkach z customdata
+                fig = wykresy.struktura_budzetu(df_plot)
 
-# Sortowanie danych po sumie budżetowej
-            df_plot = podsumowanie.sort_values(by='Suma_budzetowa', ascending=False)
+    # Wyświetlanie wykresu w Streamlit
+                pokaz_wykres("struktura_budzetu", fig)
+      
+        with st.expander("📈 Trendy miesięczne sprzedaży"):
+            dane_trendy = widok.trend
 
-# Tworzenie wykresu
             fig = go.Figure()
-
-# Dodanie poszczególnych warstw wykresu
-            fig.add_bar(
-                x=df_plot['Nazwa leku'],
-                y=df_plot['Budget_ZP'],
-                name='ZP',
-                hovertext=df_plot['Percent_Budget_ZP'].apply(lambda x: f'{x:.2f}%'),
-                hoverinfo='text'
-                )
-            fig.add_bar(
-                x=df_plot['Nazwa leku'],
-                y=df_plot['Budget_Promocyjna'],
-                name='Promocyjna',
-                hovertext=df_plot['Percent_Budget_Promocyjna'].apply(lambda x: f'{x:.2f}%'),
-                hoverinfo='text'
-                )
-            fig.add_bar(
-                x=df_plot['Nazwa leku'],
-                y=df_plot['Budget_Normalna'],
-                name='Pozostała',
-                hovertext=df_plot['Percent_Budget_Normalna'].apply(lambda x: f'{x:.2f}%'),
-                hoverinfo='text'
-                )
-
-# Aktualizacja wyglądu wykresu (usunięcie osi pionowej)
+            fig.add_trace(go.Scatter(
+                x=dane_trendy['Data'],
+                y=dane_trendy['Sprzedaż ilość'],
+                mode='lines+markers',
+                name='Sprzedaż ilość',
+                line=dict(color='royalblue')
+            ))
             fig.update_layout(
-                barmode='stack',
-                title='Struktura sprzedaży budżetowej wg leku',
-                xaxis_title='Lek',
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),  # Ukrycie osi Y
-                height=600,
-                showlegend=True,
-                )
-
+                title="📦 Miesięczna sprzedaż leku",
+                xaxis_title="Data",
+                yaxis_title="Sprzedaż (sztuki)",
+                yaxis=dict(range=[0, dane_trendy['Sprzedaż ilość'].max() * 1.1]),  # Oś Y zaczyna się od 0
+                height=400
+            )
+            pokaz_wykres("sprzedaz_leku", fig, use_container_width=True)
+        with st.expander("📊 Średnia cena jednostkowa"):
+            ceny = widok.ceny
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=ceny['Data'], y=ceny['Cena jednostkowa'], mode='lines+markers'))
+            fig.update_layout(title="Średnia cena jednostkowa miesięcznie", xaxis_title="Data", yaxis_title="Cena (PLN)",
+            yaxis=dict(range=[0, ceny['Cena jednostkowa'].max() * 1.1]),height=400)
+            pokaz_wykres("cena_leku", fig, use_container_width=True)
+
+    okres_leku(wersja_danych, wybor)
+# --------------- Porównanie leków -------------------
+if wybor_sekcji == "Porównanie leków":
+    st.title("Porównanie leków")
+    agr = wczytaj_agregaty(wersja_danych)
+    indeks_lekow = wczytaj_indeks_lekow(wersja_danych)
+    okres_od, okres_do = wybierz_zakres_okresu(agr.okresy, "okres_porownania")
+    wybrane = st.multiselect(
+        "Wybierz leki do porównania:",
+        indeks_lekow.lista,
+        default=indeks_lekow.lista[:3],
+        format_func=lambda indeks: f"{indeks} – {indeks_lekow.nazwa(indeks)}",
+        max_selections=LIMIT_POROWNANIA,
+        key="porownanie_leki",
+    )
+
+    if not wybrane:
+        st.info("Wybierz co najmniej jeden lek.")
+    else:
+        podsumowanie, trend = porownanie_lekow(wersja_danych, tuple(sorted(wybrane)), okres_od, okres_do)
+        if podsumowanie.empty:
+            st.info("Wybrane leki nie mają sprzedaży w tym okresie.")
+        else:
+            st.subheader("Tabela porównawcza")
+            tabela_stronicowana.pokaz_tabele(
+                podsumowanie, "porownanie", "porownanie_lekow", use_container_width=True
+            )
 
-# Wyświetlanie wykresu w Streamlit
-            st.plotly_chart(fig)
-      
-    with st.expander("📈 Trendy miesięczne sprzedaży"):
-        dane_trendy = (
-            dane_okres
-            .groupby(['Rok', 'Miesiąc'])['Sprzedaż ilość']
-            .sum()
-            .reset_index()
-        )
-        dane_trendy['Data'] = pd.to_datetime(
-            dane_trendy.rename(columns={'Rok': 'year', 'Miesiąc': 'month'})
-            .assign(day=1)[['year', 'month', 'day']]
-        )
+            kol1, kol2 = st.columns(2)
+            with kol1:
+                pokaz_wykres("porownanie_udzialy", wykresy.udzialy_lekow(podsumowanie), use_container_width=True)
+            with kol2:
+                pokaz_wykres("porownanie_promocje", wykresy.promocje_lekow(podsumowanie), use_container_width=True)
+            pokaz_wykres(
+                "porownanie_budzet",
+                wykresy.struktura_budzetu(podsumowanie.sort_values("Suma_budzetowa", ascending=False)),
+                use_container_width=True,
+            )
+            pokaz_wykres(
+                "porownanie_trend",
+                wykresy.trend_lekow(trend, podsumowanie, "Sprzedaż ilość", "📦 Miesięczna sprzedaż (sztuki)"),
+                use_container_width=True,
+            )
+            pokaz_wykres(
+                "porownanie_ceny",
+                wykresy.trend_lekow(trend, podsumowanie, "Cena jednostkowa", "Średnia cena jednostkowa (PLN)"),
+                use_container_width=True,
+            )
 
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=dane_trendy['Data'],
-            y=dane_trendy['Sprzedaż ilość'],
-            mode='lines+markers',
-            name='Sprzedaż ilość',
-            line=dict(color='royalblue')
-        ))
-        fig.update_layout(
-            title="📦 Miesięczna sprzedaż leku",
-            xaxis_title="Data",
-            yaxis_title="Sprzedaż (sztuki)",
-            yaxis=dict(range=[0, dane_trendy['Sprzedaż ilość'].max() * 1.1]),  # Oś Y zaczyna się od 0
-            height=400
-        )
-        st.plotly_chart(fig, use_container_width=True)
-    with st.expander("📊 Średnia cena jednostkowa"):
-        dane_okres['Cena jednostkowa'] = dane_okres['Sprzedaż budżetowa'] / dane_okres['Sprzedaż ilość'].replace(0, pd.NA)
-        ceny = dane_okres.groupby(['Rok', 'Miesiąc'])['Cena jednostkowa'].mean().reset_index()
-        ceny['Data'] = pd.to_datetime(ceny.rename(columns={'Rok': 'year', 'Miesiąc': 'month'}).assign(day=1)[['year', 'month', 'day']])
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=ceny['Data'], y=ceny['Cena jednostkowa'], mode='lines+markers'))
-        fig.update_layout(title="Średnia cena jednostkowa miesięcznie", xaxis_title="Data", yaxis_title="Cena (PLN)",
-        yaxis=dict(range=[0, ceny['Cena jednostkowa'].max() * 1.1]),height=400)
-        st.plotly_chart(fig, use_container_width=True)
 # --------------- Unikalnosc produktów-------------------
 if wybor_sekcji == "Podstawowe analizy unikalności i sprzedaży":
-        df, wnioski = wczytaj_dane()
+        # Wszystkie tabele liczymy z kostki; brak rodzaju promocji jest w niej już
+        # zamieniony na "Normalna sprzedaż"
+        agr = wczytaj_agregaty(wersja_danych)
+        okres_od, okres_do = wybierz_zakres_okresu(agr.okresy, "okres_analiz")
+        przyblizone = st.sidebar.toggle(
+            "Przybliżone liczby unikalnych",
+            key="przyblizone_unikalne",
+            help="Liczby unikalnych produktów i promocji ze szkiców HyperLogLog – szybsze "
+                 "dla dużych danych, z niewielkim błędem. Wyłącz, aby policzyć dokładnie.",
+        )
+        tabele = tabele_analiz(wersja_danych, okres_od, okres_do, przyblizone)
+        dostepne_lata, dostepne_kategorie = tabele["dostepne_wartosci"]
         st.title("Analizy")
-        # Zamiana NaN w kolumnie "Rodzaj promocji poziom 2" na "Normalna sprzedaż"
-        df["Rodzaj promocji poziom 2"] = df["Rodzaj promocji poziom 2"].fillna("Normalna sprzedaż")
+        if przyblizone:
+            blad = szkice.blad_wzgledny()
+            st.info(
+                f"Liczby unikalnych produktów i promocji są przybliżone (HyperLogLog): błąd względny "
+                f"ok. ±{format_procent(blad)} (1σ), w 95% przypadków do ±{format_procent(2 * blad)}."
+            )
 
         # Tworzenie zakładek
         zakladki = st.tabs(["Unikalne produkty", "Sprzedaż produktów","Typy promocji"])
@@ -334,24 +534,12 @@ if wybor_sekcji == "Podstawowe analizy unikalności i sprzedaży":
 
             with kol1:
                 st.markdown("#### Podział wg kategorii leku")
-                produkty_kategoria = (
-                    df.groupby("Kategoria nazwa")["Indeks"]
-                    .nunique()
-                    .reset_index()
-                    .rename(columns={"Indeks": "Liczba unikalnych produktów"})
-                    .sort_values(by="Liczba unikalnych produktów", ascending=False)
-                )
+                produkty_kategoria = tabele["produkty_wg_kategorii"]
                 st.dataframe(produkty_kategoria, use_container_width=True)
 
             with kol2:
                 st.markdown("#### Podział wg roku")
-                produkty_rok = (
-                    df.groupby("Rok")["Indeks"]
-                    .nunique()
-                    .reset_index()
-                    .rename(columns={"Indeks": "Liczba unikalnych produktów"})
-                    .sort_values(by="Rok")
-                )
+                produkty_rok = tabele["produkty_wg_roku"]
                 st.dataframe(produkty_rok, use_container_width=True)
 
             # DOLNA SEKCJA: tabela + wykres
@@ -359,109 +547,113 @@ if wybor_sekcji == "Podstawowe analizy unikalności i sprzedaży":
 
             with dol1:
                 st.markdown("#### Podział wg roku i miesiąca")
-                produkty_miesiac = (
-                    df.groupby(["Rok", "Miesiąc", "Kategoria nazwa"])["Indeks"]
-                    .nunique()
-                    .reset_index()
-                    .rename(columns={"Indeks": "Liczba unikalnych produktów"})
-                    .sort_values(by=["Rok", "Miesiąc"])
+                produkty_miesiac = tabele["produkty_wg_miesiaca"]
+                tabela_stronicowana.pokaz_tabele(
+                    produkty_miesiac, "produkty_miesiac", "produkty_wg_miesiaca", use_container_width=True
                 )
-                st.dataframe(produkty_miesiac, use_container_width=True)
 
             with dol2:
                 st.markdown("#### Wykres: liczba unikalnych produktów wg roku i miesiąca")
 
-                # Filtrowanie danych do wykresu
-                dostepne_lata = sorted(df["Rok"].dropna().unique())
-                wybrany_rok = st.selectbox("Wybierz rok", dostepne_lata, index=len(dostepne_lata) - 1)
-
-                dostepne_kategorie = sorted(df["Kategoria nazwa"].dropna().unique())
-                wybrane_kategorie = st.multiselect("Wybierz kategorię (opcjonalnie)", dostepne_kategorie, default=dostepne_kategorie)
-
-                # Filtrowanie danych
-                df_filtr = produkty_miesiac[
-                    (produkty_miesiac["Rok"] == wybrany_rok) &
-                    (produkty_miesiac["Kategoria nazwa"].isin(wybrane_kategorie))
-                ].copy()
-
-                df_filtr["Rok-Miesiac"] = (
-                    df_filtr["Rok"].astype(str) + "-" +
-                    df_filtr["Miesiąc"].astype(str).str.zfill(2)
-                )
-
-                fig = px.bar(
-                    df_filtr,
-                    x="Rok-Miesiac",
-                    y="Liczba unikalnych produktów",
-                    color="Kategoria nazwa",
-                    labels={"Rok-Miesiac": "Rok-Miesiąc", "Kategoria nazwa": "Kategoria"},
-                    title=f"Unikalne produkty w {wybrany_rok} (wg miesiąca)",
-                    height=400
-                )
-                fig.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig, use_container_width=True)
+                # Rok i kategorie wykresu przeliczają tylko ten fragment, tabele obok zostają
+                @st.fragment
+                @pomiary.mierzona("fragment · produkty_miesiac")
+                def wykres_produktow(produkty_miesiac, dostepne_lata, dostepne_kategorie, okres_od, okres_do, przyblizone):
+                    # Filtrowanie danych do wykresu
+                    wybrany_rok = st.selectbox("Wybierz rok", dostepne_lata, index=len(dostepne_lata) - 1)
+
+                    wybrane_kategorie = st.multiselect("Wybierz kategorię (opcjonalnie)", dostepne_kategorie, default=dostepne_kategorie)
+
+                    # Filtrowanie danych
+                    df_filtr = produkty_miesiac[
+                        (produkty_miesiac["Rok"] == wybrany_rok) &
+                        (produkty_miesiac["Kategoria nazwa"].isin(wybrane_kategorie))
+                    ].copy()
+
+                    df_filtr["Rok-Miesiac"] = (
+                        df_filtr["Rok"].astype(str) + "-" +
+                        df_filtr["Miesiąc"].astype(str).str.zfill(2)
+                    )
+
+                    fig = px.bar(
+                        df_filtr,
+                        x="Rok-Miesiac",
+                        y="Liczba unikalnych produktów",
+                        color="Kategoria nazwa",
+                        labels={"Rok-Miesiac": "Rok-Miesiąc", "Kategoria nazwa": "Kategoria"},
+                        title=f"Unikalne produkty w {wybrany_rok} (wg miesiąca)",
+                        height=400
+                    )
+                    fig.update_layout(xaxis_tickangle=-45)
+                    pokaz_wykres("produkty_miesiac", fig, use_container_width=True)
+
+                    # Łączna liczba w wybranych kategoriach – nie jest sumą słupków (lek bywa w kilku miesiącach)
+                    laczna_liczba = produkty_w_kategoriach(
+                        wersja_danych,
+                        wybrane_kategorie,
+                        max(okres_od, int(wybrany_rok) * 12 + 1),
+                        min(okres_do, int(wybrany_rok) * 12 + 12),
+                        przyblizone,
+                    )
+                    st.metric(f"Unikalne produkty w wybranych kategoriach ({wybrany_rok})", f"{laczna_liczba:,}".replace(",", " "))
+
+                wykres_produktow(produkty_miesiac, dostepne_lata, dostepne_kategorie, okres_od, okres_do, przyblizone)
 
             # PODZIAŁ WG RODZAJU PROMOCJI
             st.markdown("#### Podział wg rodzaju promocji poziom 2")
-            produkty_rodzaj = (
-                df.groupby("Rodzaj promocji poziom 2")["Indeks"]
-                .nunique()
-                .reset_index()
-                .rename(columns={"Indeks": "Liczba unikalnych produktów"})
-                .sort_values(by="Liczba unikalnych produktów", ascending=False)
-            )
+            produkty_rodzaj = tabele["produkty_wg_rodzaju"]
             st.dataframe(produkty_rodzaj, use_container_width=True)
 
             # Tabela: unikalne promocje wg roku, miesiąca, rodzaju promocji
             st.markdown("#### Liczba unikalnych promocji wg roku, miesiąca i rodzaju promocji")
-            promocje_trend = (
-                df.groupby(["Rok", "Miesiąc", "Rodzaj promocji poziom 2"])["Id promocji"]
-                .nunique()
-                .reset_index()
-                .rename(columns={"Id promocji": "Liczba unikalnych promocji"})
-                .sort_values(by=["Rok", "Miesiąc"])
+            promocje_trend = tabele["promocje_wg_miesiaca"]
+            tabela_stronicowana.pokaz_tabele(
+                promocje_trend, "promocje_trend", "promocje_wg_miesiaca", use_container_width=True
             )
-            st.dataframe(promocje_trend, use_container_width=True)
 
             # Wykres liniowy dla wybranych rodzajów promocji na jednym wykresie
             st.markdown("#### Trend liczby unikalnych promocji wg rodzaju")
-            wybrane_lata = sorted(promocje_trend["Rok"].unique())
-            wybrany_rok_trend = st.selectbox("Wybierz rok do analizy trendu", wybrane_lata, index=len(wybrane_lata) - 1)
-
-            df_trend_filtered = promocje_trend[promocje_trend["Rok"] == wybrany_rok_trend].copy()
-            df_trend_filtered["Miesiąc"] = df_trend_filtered["Miesiąc"].astype(int)
-
-    # Pomijanie "normalnej sprzedaży"
-            df_trend_filtered = df_trend_filtered[
-            df_trend_filtered["Rodzaj promocji poziom 2"].str.lower() != "normalna sprzedaż"
-            ]
-
-            dostepne_rodzaje = sorted(df_trend_filtered["Rodzaj promocji poziom 2"].unique())
-            wybrane_rodzaje = st.multiselect(
-                "Wybierz rodzaj(e) promocji do wyświetlenia", 
-            options=dostepne_rodzaje, 
-            default=dostepne_rodzaje
-            )
+            @st.fragment
+            @pomiary.mierzona("fragment · promocje_trend")
+            def trend_promocji(promocje_trend):
+                wybrane_lata = sorted(promocje_trend["Rok"].unique())
+                wybrany_rok_trend = st.selectbox("Wybierz rok do analizy trendu", wybrane_lata, index=len(wybrane_lata) - 1)
+
+                df_trend_filtered = promocje_trend[promocje_trend["Rok"] == wybrany_rok_trend].copy()
+                df_trend_filtered["Miesiąc"] = df_trend_filtered["Miesiąc"].astype(int)
+
+        # Pomijanie "normalnej sprzedaży"
+                df_trend_filtered = df_trend_filtered[
+                df_trend_filtered["Rodzaj promocji poziom 2"].str.lower() != "normalna sprzedaż"
+                ]
+
+                dostepne_rodzaje = sorted(df_trend_filtered["Rodzaj promocji poziom 2"].unique())
+                wybrane_rodzaje = st.multiselect(
+                    "Wybierz rodzaj(e) promocji do wyświetlenia", 
+                options=dostepne_rodzaje, 
+                default=dostepne_rodzaje
+                )
 
-            df_temp = df_trend_filtered[df_trend_filtered["Rodzaj promocji poziom 2"].isin(wybrane_rodzaje)]
+                df_temp = df_trend_filtered[df_trend_filtered["Rodzaj promocji poziom 2"].isin(wybrane_rodzaje)]
 
-            if not df_temp.empty:
-                fig = px.line(
-                    df_temp,
-                    x="Miesiąc",
-                    y="Liczba unikalnych promocji",
-                    color="Rodzaj promocji poziom 2",
-                    markers=True,
-                    title=f"Trend promocji wg rodzaju ({wybrany_rok_trend})"
-                )
-                fig.update_layout(
-                    xaxis=dict(tickmode='linear', dtick=1),
-                    yaxis=dict(range=[0, df_temp["Liczba unikalnych promocji"].max() * 1.1])
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Brak danych dla wybranych rodzajów promocji.")
+                if not df_temp.empty:
+                    fig = px.line(
+                        df_temp,
+                        x="Miesiąc",
+                        y="Liczba unikalnych promocji",
+                        color="Rodzaj promocji poziom 2",
+                        markers=True,
+                        title=f"Trend promocji wg rodzaju ({wybrany_rok_trend})"
+                    )
+                    fig.update_layout(
+                        xaxis=dict(tickmode='linear', dtick=1),
+                        yaxis=dict(range=[0, df_temp["Liczba unikalnych promocji"].max() * 1.1])
+                    )
+                    pokaz_wykres("promocje_trend", fig, use_container_width=True)
+                else:
+                    st.info("Brak danych dla wybranych rodzajów promocji.")
 
+            trend_promocji(promocje_trend)
 
 
         # Zakładka 2 – Sprzedaż produktów
@@ -470,63 +662,34 @@ if wybor_sekcji == "Podstawowe analizy unikalności i sprzedaży":
 
             # Tabela: liczba sprzedanych sztuk wg roku i miesiąca
             st.markdown("#### Liczba sprzedanych sztuk wg roku i miesiąca")
-            sprzedaz_miesiac = (
-                df.groupby(["Rok", "Miesiąc"])["Sprzedaż ilość"]
-                .sum()
-                .reset_index()
-                .rename(columns={"Ilość": "Liczba sprzedanych sztuk"})
-                .sort_values(by=["Rok", "Miesiąc"])
-            )
+            sprzedaz_miesiac = tabele["sprzedaz_wg_miesiaca"]
             st.dataframe(sprzedaz_miesiac, use_container_width=True)
 
             # Tabela: liczba sprzedanych sztuk wg roku
             st.markdown("#### Liczba sprzedanych sztuk wg roku")
-            sprzedaz_rok = (
-                df.groupby("Rok")["Sprzedaż ilość"]
-                .sum()
-                .reset_index()
-                .rename(columns={"Sprzedaż ilość": "Liczba sprzedanych sztuk"})
-                .sort_values(by="Rok")
-            )
+            sprzedaz_rok = tabele["sprzedaz_wg_roku"]
             st.dataframe(sprzedaz_rok, use_container_width=True)
 
             # Wykres: liczba sprzedanych sztuk wg rodzaju promocji, miesiąca i roku
             st.markdown("#### Wykres: liczba sprzedanych sztuk wg rodzaju promocji (miesiące)")
-            wybrane_lata_sprz = sorted(df["Rok"].dropna().unique())
-            wybrany_rok_sprz = st.selectbox("Wybierz rok do wykresu", wybrane_lata_sprz, index=len(wybrane_lata_sprz) - 1)
-
-            sprzedaz_trend = (
-                df.groupby(["Rok", "Miesiąc", "Rodzaj promocji poziom 2"])["Sprzedaż ilość"]
-                .sum()
-                .reset_index()
-                .rename(columns={"Sprzedaż ilość": "Liczba sprzedanych sztuk"})
-            )
-            df_sprz_filtered = sprzedaz_trend[sprzedaz_trend["Rok"] == wybrany_rok_sprz].copy()
-            df_sprz_filtered["Miesiąc"] = df_sprz_filtered["Miesiąc"].astype(int)
-
-            rodzaje_sprz = df_sprz_filtered["Rodzaj promocji poziom 2"].unique()
-            for rodzaj in rodzaje_sprz:
-                df_temp = df_sprz_filtered[df_sprz_filtered["Rodzaj promocji poziom 2"] == rodzaj]
-                fig = px.line(
-                    df_temp,
-                    x="Miesiąc",
-                    y="Liczba sprzedanych sztuk",
-                    title=f"Sprzedaż: {rodzaj} ({wybrany_rok_sprz})",
-                    markers=True
-                )
-                fig.update_layout(xaxis=dict(tickmode='linear', dtick=1),yaxis=dict(range=[0, df_temp["Liczba sprzedanych sztuk"].max() * 1.1]))
-                st.plotly_chart(fig, use_container_width=True)
+            @st.fragment
+            @pomiary.mierzona("fragment · sprzedaz_wg_rodzaju")
+            def wykres_sprzedazy(sprzedaz_trend, dostepne_lata):
+                wybrany_rok_sprz = st.selectbox("Wybierz rok do wykresu", dostepne_lata, index=len(dostepne_lata) - 1)
+
+                df_sprz_filtered = sprzedaz_trend[sprzedaz_trend["Rok"] == wybrany_rok_sprz].copy()
+                df_sprz_filtered["Miesiąc"] = df_sprz_filtered["Miesiąc"].astype(int)
+
+                # Jedna figura z panelem na rodzaj promocji zamiast osobnej figury na każdy rodzaj
+                fig = wykresy.sprzedaz_wg_rodzaju(df_sprz_filtered, wybrany_rok_sprz)
+                pokaz_wykres("sprzedaz_wg_rodzaju", fig, use_container_width=True)
+
+            wykres_sprzedazy(tabele["sprzedaz_wg_rodzaju"], dostepne_lata)
 
         with zakladki[2]:
             st.subheader("Informacje na podstawie typu promocji")
 
-            tabela = df.groupby("Rodzaj promocji poziom 2").agg(
-                liczba_obserwacji=("Rodzaj promocji poziom 2", "count"),
-                suma_sprzedaz_ilosc=("Sprzedaż ilość", "sum"),
-                suma_sprzedaz_promocyjna=("Sprzedaż budżetowa promocyjna", "sum"),
-                suma_sprzedaz_zp=("Sprzedaż budżetowa ZP", "sum"),
-                suma_sprzedaz_budzetowa=("Sprzedaż budżetowa", "sum")
-            ).reset_index()
+            tabela = tabele["tabela_typow_promocji"]
 
     # Formatowanie kolumn liczbowych
             tabela_formatted = tabela.copy()
@@ -535,93 +698,59 @@ if wybor_sekcji == "Podstawowe analizy unikalności i sprzedaży":
 
             st.dataframe(tabela_formatted, use_container_width=True)
 
+            # Te same grupy promocji, co na wykresie w widoku leku
+            st.markdown("#### Sprzedaż wg grup promocji")
+            tabela_koszyki = tabele["tabela_grup_promocji"]
+            st.dataframe(tabela_koszyki, use_container_width=True, hide_index=True)
+
+
+            @st.fragment
+            @pomiary.mierzona("fragment · udzial_kategorii")
+            def wykres_udzialu_kategorii(zbiorcze_z_kategoria, dostepne_kategorie):
+                # Możliwość wyboru kategorii do analizy
+                # Użycie unikalnego klucza dla multiselect
+                wybrane_kategorie = st.multiselect(
+                    "Wybierz kategorię (opcjonalnie)", 
+                    dostepne_kategorie, 
+                    default=dostepne_kategorie,
+                    key="kategorie_multiselect"  # Dodanie unikalnego klucza
+                )
+
+                # Zbiorcze dane wg rodzaju promocji i kategorii, udział kategorii w ramach rodzaju promocji
+                df_proc = analizy.udzial_kategorii(zbiorcze_z_kategoria, wybrane_kategorie)
 
-            # Możliwość wyboru kategorii do analizy
-            dostepne_kategorie = sorted(df["Kategoria nazwa"].dropna().unique())
-            
-            # Użycie unikalnego klucza dla multiselect
-            wybrane_kategorie = st.multiselect(
-                "Wybierz kategorię (opcjonalnie)", 
-                dostepne_kategorie, 
-                default=dostepne_kategorie,
-                key="kategorie_multiselect"  # Dodanie unikalnego klucza
-            )
+               # Wykres słupkowy: Procentowy udział kategorii w ramach rodzaju promocji
+                st.markdown("#### Udział procentowy kategorii w ramach rodzaju promocji")
 
-            # Zbiorcze dane wg rodzaju promocji i kategorii
-            zbiorcze_z_kategoria = df.groupby(["Rodzaj promocji poziom 2", "Kategoria nazwa"]).agg(
-                Liczba_obserwacji=("Indeks", "count"),
-                Suma_sprzedaz_ilosc=("Sprzedaż ilość", "sum"),
-                Suma_sprzedaz_promocyjna=("Sprzedaż budżetowa promocyjna", "sum"),
-                Suma_sprzedaz_zp=("Sprzedaż budżetowa ZP", "sum"),
-                Suma_sprzedaz_budzetowa=("Sprzedaż budżetowa", "sum")
-            ).reset_index()
-
-            # Filtrowanie tabeli po wybranych kategoriach
-            zbiorcze_z_kategoria_filtr = zbiorcze_z_kategoria[zbiorcze_z_kategoria["Kategoria nazwa"].isin(wybrane_kategorie)]
-
-           # Wykres słupkowy: Procentowy udział kategorii w ramach rodzaju promocji
-            st.markdown("#### Udział procentowy kategorii w ramach rodzaju promocji")
-
-            # Oblicz udział procentowy w ramach każdej grupy rodzaju promocji
-            df_proc = zbiorcze_z_kategoria_filtr.copy()
-            df_proc["Liczba_obserwacji"] = df_proc["Liczba_obserwacji"].astype(float)
-
-            # Obliczenie sumy obserwacji dla każdego rodzaju promocji
-            suma_obserwacji = df_proc.groupby("Rodzaj promocji poziom 2")["Liczba_obserwacji"].transform("sum")
-            df_proc["Udział (%)"] = (df_proc["Liczba_obserwacji"] / suma_obserwacji) * 100
-           
-            fig = px.bar(
-               df_proc,
-               x="Rodzaj promocji poziom 2",
-               y="Udział (%)",
-               color="Kategoria nazwa",
-               title="Udział procentowy kategorii w ramach rodzaju promocji",
-               labels={"Rodzaj promocji poziom 2": "Rodzaj promocji"},
-               height=400
-               )   
-            fig.update_layout(
-               xaxis_tickangle=-45,
-               barmode="stack",
-               yaxis=dict(range=[0, 100])
-               )
-            st.plotly_chart(fig, use_container_width=True)
+                fig = px.bar(
+                   df_proc,
+                   x="Rodzaj promocji poziom 2",
+                   y="Udział (%)",
+                   color="Kategoria nazwa",
+                   title="Udział procentowy kategorii w ramach rodzaju promocji",
+                   labels={"Rodzaj promocji poziom 2": "Rodzaj promocji"},
+                   height=400
+                   )   
+                fig.update_layout(
+                   xaxis_tickangle=-45,
+                   barmode="stack",
+                   yaxis=dict(range=[0, 100])
+                   )
+                pokaz_wykres("udzial_kategorii", fig, use_container_width=True)
+
+            wykres_udzialu_kategorii(tabele["zbiorcze_wg_kategorii"], dostepne_kategorie)
 
 
             # Średnia liczba sztuk na promocję wg rodzaju promocji
             st.markdown("#### Średnia liczba sztuk na promocję wg rodzaju promocji")
-            srednia_na_promocje = (
-                df.groupby("Rodzaj promocji poziom 2").agg({
-                    "Sprzedaż ilość": "sum",
-                    "Id promocji": pd.Series.nunique
-                }).reset_index()
-            )
-            srednia_na_promocje["Średnia liczba sztuk na promocję"] = srednia_na_promocje["Sprzedaż ilość"] / srednia_na_promocje["Id promocji"]
-            srednia_na_promocje = srednia_na_promocje[["Rodzaj promocji poziom 2", "Średnia liczba sztuk na promocję"]]
+            srednia_na_promocje = tabele["srednia_na_promocje"]
             st.dataframe(srednia_na_promocje, use_container_width=True)
 
 if wybor_sekcji == "Tabela udziałowa":
-   df,wnioski = wczytaj_dane()
-
-   dane_miesieczne = df.groupby(["Rok", "Miesiąc"]).agg(
-        Neuca_sprzedaz=("Sprzedaż budżetowa", "sum"),
-        Rynek_sprzedaz=("Sprzedaż rynek wartość", "sum"),
-        Sprzedaz_zp=("Sprzedaż budżetowa ZP", "sum"),
-        Sprzedaz_promo=("Sprzedaż budżetowa promocyjna", "sum")
-    ).reset_index()
-
-    # Udział NEUCA na rynku
-   dane_miesieczne["Udział NEUCA [%]"] = round(
-        100 * dane_miesieczne["Neuca_sprzedaz"] / dane_miesieczne["Rynek_sprzedaz"], 2
-        )
-
-    # Struktura sprzedaży wewnątrz NEUCA
-   dane_miesieczne["ZP - %"] = round(
-        100 * dane_miesieczne["Sprzedaz_zp"] / dane_miesieczne["Neuca_sprzedaz"], 2
-        )
-   dane_miesieczne["Promo - %"] = round(
-        100 * dane_miesieczne["Sprzedaz_promo"] / dane_miesieczne["Neuca_sprzedaz"], 2
-        )
-   dane_miesieczne["Pozostałe - %"] = 100 - dane_miesieczne["ZP - %"] - dane_miesieczne["Promo - %"]
+   # Sumy NEUCA z kostki łączone z wymiarem rynku (dane rynkowe liczone raz na lek i miesiąc)
+   agr = wczytaj_agregaty(wersja_danych)
+   okres_od, okres_do = wybierz_zakres_okresu(agr.okresy, "okres_udzialow")
+   dane_miesieczne = tabela_udzialowa(wersja_danych, okres_od, okres_do)
 
 # Wyświetlanie osobno dla każdego roku
    for rok in [2023, 2024]:
@@ -636,4 +765,58 @@ if wybor_sekcji == "Tabela udziałowa":
             use_container_width=True
             )
 
-gc.collect()
\ No newline at end of file
+# --------------- Wydajność -------------------
+if wybor_sekcji == "Wydajność":
+    st.title("Wydajność")
+    st.caption("Pomiary procesu serwera od jego startu – wspólne dla wszystkich sesji.")
+
+    biezacy, szczyt = pomiary.pamiec_procesu()
+    prywatna = pomiary.pamiec_prywatna()
+    kol1, kol2, kol3 = st.columns(3)
+    kol1.metric("Pamięć procesu (RSS)", "–" if biezacy is None else f"{biezacy / 2**20:,.0f} MB")
+    kol2.metric(
+        "w tym prywatna", "–" if prywatna is None else f"{prywatna / 2**20:,.0f} MB",
+        help="Pamięć anonimowa procesu – bez stron plików (np. migawki danych) współdzielonych z innymi procesami.",
+    )
+    kol3.metric("Szczyt pamięci (RSS)", "–" if szczyt is None else f"{szczyt / 2**20:,.0f} MB")
+
+    st.subheader("Czasy bloków")
+    bloki = pd.DataFrame(pomiary.bloki())
+    if bloki.empty:
+        st.info("Brak pomiarów – otwórz najpierw któryś z modułów.")
+    else:
+        st.dataframe(bloki.round(3), hide_index=True, use_container_width=True)
+        blok = st.selectbox("Histogram czasów bloku:", bloki["Blok"], key="wydajnosc_blok")
+        fig = px.histogram(
+            x=pomiary.czasy(blok) * 1000, nbins=30,
+            labels={"x": "Czas [ms]"}, title=f"{blok} – ostatnie {pomiary.POJEMNOSC} pomiarów",
+        )
+        fig.update_layout(yaxis_title="Liczba")
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Cache")
+    st.dataframe(pd.DataFrame(pomiary.cache()).round(1), hide_index=True, use_container_width=True)
+    statystyki_bufora = bufor_lekow().statystyki()
+    st.dataframe(pd.DataFrame([statystyki_bufora]).round(1), hide_index=True, use_container_width=True)
+
+    st.subheader("Rozmiary wyników i wykresów")
+    st.dataframe(pd.DataFrame(pomiary.rozmiary()).round(2), hide_index=True, use_container_width=True)
+
+    bufory = {"leki": statystyki_bufora}
+    kol1, kol2 = st.columns(2)
+    kol1.download_button(
+        "Pobierz JSON", lambda: pomiary.do_json(bufory), file_name="pomiary.json",
+        mime="application/json", on_click="ignore",
+    )
+    kol2.download_button(
+        "Pobierz OpenMetrics", lambda: pomiary.do_openmetrics(bufory), file_name="pomiary.txt",
+        mime="application/openmetrics-text; version=1.0.0; charset=utf-8", on_click="ignore",
+    )
+
+if raport_pamieci is not None:
+    pokaz_raport_pamieci(raport_pamieci)
+if wybor_sekcji == "Filtrowanie po ID leku":
+    pokaz_bufor(bufor_lekow())
+
+
+gc.collect()
@@ -0,0 +1,257 @@
+"""Lekkie pomiary czasu i pamięci gorących ścieżek panelu, wspólne dla całego procesu.
+
+Bloki mierzymy menedżerem kontekstu `mierz(nazwa)` albo dekoratorem `mierzona(nazwa)`;
+funkcje z cache Streamlita opakowuje `buforowana(dekorator_cache)`, które dodatkowo
+liczy trafienia i chybienia cache oraz rozmiar policzonego wyniku. Dla każdego bloku
+trzymamy ostatnie POJEMNOSC czasów (histogramy, percentyle) i sumy od startu procesu.
+
+Eksport: `do_json()` (struktura do logów) i `do_openmetrics()` (tekst dla Prometheusa).
+NEUCA_POMIARY_LOG=1 wypisuje też każdy pomiar do logu jako wiersz JSON. Pomiary, które
+same sporo kosztują (rozmiar JSON figur), działają tylko przy SZCZEGOLOWE – włączanym
+przez NEUCA_WYDAJNOSC=1 albo pierwsze otwarcie panelu z ?wydajnosc=1.
+"""
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import bufor_wynikow
+
+try:
+    import resource
+except ImportError:  # Windows – bez szczytowego RSS
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Tyle ostatnich czasów każdego bloku trzymamy do histogramów i percentyli
+POJEMNOSC = 1000
+LOGUJ = os.environ.get("NEUCA_POMIARY_LOG", "") not in ("", "0")
+SZCZEGOLOWE = os.environ.get("NEUCA_WYDAJNOSC", "") not in ("", "0")
+
+_blokada = threading.Lock()
+_czasy = collections.defaultdict(lambda: collections.deque(maxlen=POJEMNOSC))
+_sumy = collections.defaultdict(lambda: [0, 0.0])  # blok -> [liczba, suma sekund]
+_rozmiary = {}
+_cache = collections.defaultdict(lambda: [0, 0])  # funkcja -> [wywołania, chybienia]
+
+
+def wlacz_szczegolowe():
+    """Włącza kosztowne pomiary dla całego procesu (do jego końca)."""
+    global SZCZEGOLOWE
+    SZCZEGOLOWE = True
+
+
+def zapisz(blok, sekundy):
+    with _blokada:
+        _czasy[blok].append(sekundy)
+        suma = _sumy[blok]
+        suma[0] += 1
+        suma[1] += sekundy
+    if LOGUJ:
+        logger.info(json.dumps({"blok": blok, "sekundy": round(sekundy, 6)}, ensure_ascii=False))
+
+
+def zapisz_bajty(obiekt, bajty):
+    with _blokada:
+        _rozmiary[obiekt] = bajty
+
+
+def zapisz_rozmiar(obiekt, wynik):
+    """Zapamiętuje rozmiar wyniku w bajtach (ramki liczone z memory_usage(deep=True))."""
+    zapisz_bajty(obiekt, bufor_wynikow.rozmiar(wynik))
+
+
+@contextlib.contextmanager
+def mierz(blok):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        zapisz(blok, time.perf_counter() - start)
+
+
+def mierzona(blok=None):
+    """Dekorator mierzący czas każdego wywołania (domyślnie pod nazwą funkcji)."""
+    def dekorator(funkcja):
+        nazwa = blok or funkcja.__name__
+
+        @functools.wraps(funkcja)
+        def opakowana(*args, **kwargs):
+            with mierz(nazwa):
+                return funkcja(*args, **kwargs)
+        return opakowana
+    return dekorator
+
+
+def buforowana(dekorator_cache):
+    """Jak dekorator_cache (np. st.cache_data(...)), ale z licznikami trafień i pomiarem czasu.
+
+    Czas wywołania trafia do bloku "<funkcja>", czas samego liczenia (chybienie cache)
+    do "<funkcja> · liczenie", a rozmiar wyniku do tabeli rozmiarów.
+    """
+    def dekorator(funkcja):
+        nazwa = funkcja.__name__
+
+        @functools.wraps(funkcja)
+        def liczona(*args, **kwargs):
+            with _blokada:
+                _cache[nazwa][1] += 1
+            with mierz(f"{nazwa} · liczenie"):
+                wynik = funkcja(*args, **kwargs)
+            zapisz_rozmiar(nazwa, wynik)
+            return wynik
+
+        z_cache = dekorator_cache(liczona)
+
+        @functools.wraps(funkcja)
+        def wywolanie(*args, **kwargs):
+            with _blokada:
+                _cache[nazwa][0] += 1
+            with mierz(nazwa):
+                return z_cache(*args, **kwargs)
+
+        wywolanie.clear = z_cache.clear
+        return wywolanie
+    return dekorator
+
+
+def pamiec_procesu():
+    """(bieżący RSS, szczytowy RSS) w bajtach; None, gdy system ich nie udostępnia."""
+    biezacy = szczyt = None
+    try:
+        with open("/proc/self/statm") as plik:
+            biezacy = int(plik.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss: kilobajty w Linuksie, bajty w macOS
+        szczyt = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        szczyt *= 1 if os.uname().sysname == "Darwin" else 1024
+    return biezacy, szczyt
+
+
+def pamiec_prywatna():
+    """Pamięć anonimowa procesu w bajtach (RSS bez stron plików zmapowanych w pamięci); None poza Linuksem."""
+    try:
+        with open("/proc/self/smaps_rollup") as plik:
+            for linia in plik:
+                if linia.startswith("Anonymous:"):
+                    return int(linia.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# --------------- ODCZYT ----------------------
+def czasy(blok):
+    """Ostatnie czasy bloku w sekundach (do histogramu)."""
+    with _blokada:
+        return np.array(_czasy.get(blok, ()), dtype=np.float64)
+
+
+def bloki():
+    """Podsumowanie bloków: liczba i średnia od startu, percentyle z ostatnich POJEMNOSC pomiarów."""
+    with _blokada:
+        migawka = {blok: (np.array(ostatnie), *_sumy[blok]) for blok, ostatnie in _czasy.items()}
+    wiersze = []
+    for blok, (ostatnie, liczba, suma) in sorted(migawka.items()):
+        p50, p95 = np.percentile(ostatnie, [50, 95])
+        wiersze.append({
+            "Blok": blok, "Liczba": liczba, "Suma [s]": suma, "Średnia [ms]": 1000 * suma / liczba,
+            "p50 [ms]": 1000 * p50, "p95 [ms]": 1000 * p95, "Maks. [ms]": 1000 * ostatnie.max(),
+        })
+    return wiersze
+
+
+def cache():
+    """Trafienia funkcji z cache Streamlita (trafienia = wywołania - chybienia)."""
+    with _blokada:
+        migawka = {nazwa: tuple(liczniki) for nazwa, liczniki in _cache.items()}
+    return [
+        {
+            "Funkcja": nazwa, "Wywołania": wywolania, "Chybienia": chybienia,
+            "Skuteczność [%]": 100 * (wywolania - chybienia) / wywolania if wywolania else 0.0,
+        }
+        for nazwa, (wywolania, chybienia) in sorted(migawka.items())
+    ]
+
+
+def rozmiary():
+    with _blokada:
+        return [{"Obiekt": nazwa, "Rozmiar [MB]": bajty / 2**20} for nazwa, bajty in sorted(_rozmiary.items())]
+
+
+# --------------- EKSPORT ----------------------
+def do_json(bufory=None):
+    """Wszystkie pomiary jako tekst JSON; bufory to {nazwa: BuforWynikow.statystyki()}."""
+    biezacy, szczyt = pamiec_procesu()
+    return json.dumps({
+        "czas": time.time(),
+        "pamiec": {"rss_bajty": biezacy, "rss_szczyt_bajty": szczyt, "prywatna_bajty": pamiec_prywatna()},
+        "bloki": bloki(),
+        "cache": cache(),
+        "bufory": bufory or {},
+        "rozmiary": rozmiary(),
+    }, ensure_ascii=False, indent=2)
+
+
+def _etykieta(wartosc):
+    return str(wartosc).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def do_openmetrics(bufory=None, prefiks="neuca"):
+    """Pomiary w formacie tekstowym OpenMetrics (zakończone "# EOF")."""
+    linie = []
+
+    def metryka(nazwa, typ, jednostka, opis, probki):
+        linie.append(f"# TYPE {prefiks}_{nazwa} {typ}")
+        if jednostka:
+            linie.append(f"# UNIT {prefiks}_{nazwa} {jednostka}")
+        linie.append(f"# HELP {prefiks}_{nazwa} {opis}")
+        for przyrostek, etykiety, wartosc in probki:
+            opis_etykiet = ",".join(f'{klucz}="{_etykieta(w)}"' for klucz, w in etykiety.items())
+            opis_etykiet = f"{{{opis_etykiet}}}" if opis_etykiet else ""
+            linie.append(f"{prefiks}_{nazwa}{przyrostek}{opis_etykiet} {wartosc:.9g}")
+
+    wiersze = bloki()
+    metryka("blok_seconds", "summary", "seconds", "Czas bloku panelu (kwantyle z ostatnich pomiarów).", [
+        probka
+        for w in wiersze
+        for probka in (
+            ("", {"blok": w["Blok"], "quantile": "0.5"}, w["p50 [ms]"] / 1000),
+            ("", {"blok": w["Blok"], "quantile": "0.95"}, w["p95 [ms]"] / 1000),
+            ("_sum", {"blok": w["Blok"]}, w["Suma [s]"]),
+            ("_count", {"blok": w["Blok"]}, w["Liczba"]),
+        )
+    ])
+    wiersze = cache()
+    metryka("cache_wywolania", "counter", "", "Wywołania funkcji z cache Streamlita.",
+            [("_total", {"funkcja": w["Funkcja"]}, w["Wywołania"]) for w in wiersze])
+    metryka("cache_chybienia", "counter", "", "Chybienia cache (wynik liczony od nowa).",
+            [("_total", {"funkcja": w["Funkcja"]}, w["Chybienia"]) for w in wiersze])
+    for nazwa, statystyki in (bufory or {}).items():
+        metryka(f"bufor_{nazwa}_trafienia", "counter", "", f"Trafienia bufora {nazwa}.",
+                [("_total", {}, statystyki["Trafienia"])])
+        metryka(f"bufor_{nazwa}_chybienia", "counter", "", f"Chybienia bufora {nazwa}.",
+                [("_total", {}, statystyki["Chybienia"])])
+        metryka(f"bufor_{nazwa}_bytes", "gauge", "bytes", f"Zajętość bufora {nazwa}.",
+                [("", {}, statystyki["Zajęte [MB]"] * 2**20)])
+    metryka("obiekt_bytes", "gauge", "bytes", "Rozmiar ostatnio policzonego wyniku.",
+            [("", {"obiekt": w["Obiekt"]}, w["Rozmiar [MB]"] * 2**20) for w in rozmiary()])
+    biezacy, szczyt = pamiec_procesu()
+    if biezacy is not None:
+        metryka("rss_bytes", "gauge", "bytes", "Bieżąca pamięć rezydentna procesu.", [("", {}, biezacy)])
+    prywatna = pamiec_prywatna()
+    if prywatna is not None:
+        metryka("prywatna_bytes", "gauge", "bytes", "Pamięć anonimowa procesu (bez stron plików).", [("", {}, prywatna)])
+    if szczyt is not None:
+        metryka("rss_szczyt_bytes", "gauge", "bytes", "Szczytowa pamięć rezydentna procesu.", [("", {}, szczyt)])
+    linie.append("# EOF")
+    return "\n".join(linie) + "\n"
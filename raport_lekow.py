@@ -0,0 +1,89 @@
+"""Raport wsadowy liczb widoku "Filtrowanie po ID leku" dla wszystkich leków naraz.
+
+Dla każdego leku i zadanego okresu: sumy sprzedaży i rynku, udział ilościowy i
+wartościowy, sprzedaż grup promocji, podział budżetu (ZP / promocyjna / pozostała)
+oraz miesięczny trend sprzedaży i średniej ceny jednostkowej. Wszystko liczone z
+kostki agregatów kilkoma grupowaniami po Indeksie (analizy.raport_lekow) zamiast
+osobnego filtra dla każdego leku.
+
+Wynik .xlsx to skoroszyt z arkuszami "Podsumowanie" i "Trend" (wymaga openpyxl);
+każda inna ścieżka to katalog z plikami podsumowanie.parquet i trend.parquet.
+--procesy N dzieli leki na N ciągłych zakresów Indeksu liczonych w osobnych procesach,
+z których każdy sam wczytuje agregaty z magazynu.
+
+    python raport_lekow.py raport_2024 --od 2024-01 --do 2024-12
+    python raport_lekow.py raport.xlsx --procesy 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import agregaty
+import analizy
+import dane
+
+
+def _okres(tekst):
+    """"RRRR-MM" -> klucz okresu (Rok*12+Miesiąc)."""
+    try:
+        rok, miesiac = (int(czesc) for czesc in tekst.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"okres w postaci RRRR-MM, jest {tekst!r}") from None
+    if not 1 <= miesiac <= 12:
+        raise argparse.ArgumentTypeError(f"miesiąc poza zakresem 1-12: {tekst!r}")
+    return rok * 12 + miesiac
+
+
+def _policz_zakres(katalog, od, do, indeksy):
+    # Proces roboczy: agregaty z magazynu zamiast kopii przesyłanej z procesu głównego
+    return analizy.raport_lekow(agregaty.wczytaj_agregaty(katalog), dane.wczytaj_nazwy(katalog), od, do, indeksy)
+
+
+def policz_raport(katalog=dane.KATALOG_MAGAZYNU, od=None, do=None, procesy=1):
+    """(podsumowanie, trend) dla wszystkich leków z aktualnych agregatów magazynu."""
+    wersja = dane.wersja_magazynu(katalog)
+    if wersja is None:
+        raise FileNotFoundError(f"Brak magazynu danych w {katalog!r} – najpierw zbuduj go z pełnych danych")
+    # Nieaktualne agregaty są przebudowywane i zapisywane, zanim wczytają je procesy robocze
+    agr = agregaty.przygotuj_agregaty(wersja, katalog)
+    if procesy <= 1:
+        return analizy.raport_lekow(agr, dane.wczytaj_nazwy(katalog), od, do)
+
+    # Leki w kostce są posortowane po Indeksie – każdy proces dostaje ciągły zakres
+    zakresy = [czesc.tolist() for czesc in np.array_split(np.array(agr.indeks_kostki.lista), procesy) if len(czesc)]
+    with ProcessPoolExecutor(max_workers=len(zakresy)) as pula:
+        czesci = list(pula.map(_policz_zakres, *zip(*[(katalog, od, do, zakres) for zakres in zakresy])))
+    return tuple(pd.concat(tabele, ignore_index=True) for tabele in zip(*czesci))
+
+
+def zapisz_raport(podsumowanie, trend, sciezka):
+    if sciezka.lower().endswith(".xlsx"):
+        with pd.ExcelWriter(sciezka) as plik:
+            podsumowanie.to_excel(plik, sheet_name="Podsumowanie", index=False)
+            trend.to_excel(plik, sheet_name="Trend", index=False)
+        return
+    os.makedirs(sciezka, exist_ok=True)
+    podsumowanie.to_parquet(os.path.join(sciezka, "podsumowanie.parquet"), index=False)
+    trend.to_parquet(os.path.join(sciezka, "trend.parquet"), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raport widoku leku dla wszystkich leków do Parquet albo Excela.")
+    parser.add_argument("wyjscie", help="plik .xlsx albo katalog na pliki Parquet")
+    parser.add_argument("--od", type=_okres, help="pierwszy miesiąc okresu (RRRR-MM), domyślnie początek danych")
+    parser.add_argument("--do", type=_okres, help="ostatni miesiąc okresu (RRRR-MM), domyślnie koniec danych")
+    parser.add_argument("--procesy", type=int, default=1, help="liczba procesów liczących zakresy Indeksu")
+    parser.add_argument("--katalog", default=dane.KATALOG_MAGAZYNU, help="katalog magazynu danych")
+    argumenty = parser.parse_args()
+
+    start = time.perf_counter()
+    podsumowanie, trend = policz_raport(argumenty.katalog, argumenty.od, argumenty.do, argumenty.procesy)
+    zapisz_raport(podsumowanie, trend, argumenty.wyjscie)
+    print(
+        f"{argumenty.wyjscie}: {len(podsumowanie)} leków, {len(trend)} wierszy trendu "
+        f"w {time.perf_counter() - start:.1f} s"
+    )
@@ -0,0 +1,50 @@
+"""Równoległe liczenie niezależnych obliczeń panelu we wspólnej puli wątków.
+
+Wątki, a nie procesy: zadania czytają te same, współdzielone agregaty (proces
+potomny musiałby je dostać w kopii), a grupowania pandas/NumPy w dużej części
+zwalniają GIL. Pula jest jedna na proces serwera, więc wiele sesji naraz nie
+mnoży liczby wątków ponad NEUCA_WATKI.
+
+NEUCA_WATKI=1 wyłącza pulę – zadania liczą się po kolei w wątku wywołującym,
+z czytelnym śladem stosu przy błędzie (do debugowania).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Domyślnie tyle wątków, ile rdzeni, ale nie więcej niż 8 – zadań jest kilkanaście
+WATKI = int(os.environ.get("NEUCA_WATKI", "0")) or min(8, os.cpu_count() or 1)
+if WATKI < 1:
+    raise ValueError(f"NEUCA_WATKI musi być dodatnie, jest {WATKI}")
+
+_pula = None
+_blokada = threading.Lock()
+
+
+def _wspolna_pula():
+    global _pula
+    with _blokada:
+        if _pula is None:
+            _pula = ThreadPoolExecutor(max_workers=WATKI, thread_name_prefix="obliczenia")
+        return _pula
+
+
+def _zbierz(pula, zadania):
+    przyszle = {nazwa: pula.submit(funkcja) for nazwa, funkcja in zadania.items()}
+    return {nazwa: wynik.result() for nazwa, wynik in przyszle.items()}
+
+
+def policz(zadania, watki=None):
+    """Wyniki słownika {nazwa: funkcja bez argumentów} – w tej samej kolejności kluczy.
+
+    Wszystkie wyniki są zebrane przed powrotem; pierwszy błąd zadania jest zgłaszany
+    dalej. Zadania nie mogą same zlecać pracy do puli (czekałyby na siebie nawzajem).
+    Liczba wątków inna niż NEUCA_WATKI (np. w benchmarku) dostaje własną, chwilową pulę.
+    """
+    watki = WATKI if watki is None else watki
+    if watki <= 1 or len(zadania) <= 1:
+        return {nazwa: funkcja() for nazwa, funkcja in zadania.items()}
+    if watki == WATKI:
+        return _zbierz(_wspolna_pula(), zadania)
+    with ThreadPoolExecutor(max_workers=watki, thread_name_prefix="obliczenia") as pula:
+        return _zbierz(pula, zadania)
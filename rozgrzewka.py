@@ -0,0 +1,75 @@
+"""Rozgrzewanie cache panelu w tle: dane, indeks leków i domyślne widoki modułów.
+
+Pierwszy przebieg skryptu na serwerze (i pierwszy po nowej wersji danych) uruchamia
+wątek, który po kolei wywołuje te same funkcje z cache, których używają moduły.
+Kolejne sesje zastają wyniki gotowe, a stan kroków widać w pasku bocznym.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+NAZWA_WATKU = "rozgrzewka-panelu"
+
+OCZEKUJE = "oczekuje"
+W_TOKU = "w toku"
+GOTOWE = "gotowe"
+BLAD = "błąd"
+
+
+class _BezOstrzezeniaOKontekscie(logging.Filter):
+    # Funkcje z cache Streamlita wołane poza sesją działają poprawnie, ale przy każdym
+    # wywołaniu Streamlit ostrzega o braku kontekstu skryptu – w wątku rozgrzewki to szum
+    def filter(self, rekord):
+        return threading.current_thread().name != NAZWA_WATKU
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_BezOstrzezeniaOKontekscie())
+
+
+class Rozgrzewka:
+    """Wątek wykonujący po kolei nazwane kroki; stan kroków można czytać z dowolnej sesji.
+
+    Błąd jednego kroku nie przerywa pozostałych – sesja, która potrzebuje tego wyniku,
+    policzy go sama (i pokaże błąd użytkownikowi).
+    """
+
+    def __init__(self, kroki):
+        self._kroki = list(kroki)
+        self._stan = {nazwa: OCZEKUJE for nazwa, _ in self._kroki}
+        self._czasy = {}
+        self._blokada = threading.Lock()
+        self._watek = threading.Thread(target=self._uruchom, name=NAZWA_WATKU, daemon=True)
+
+    def start(self):
+        self._watek.start()
+        return self
+
+    def _ustaw(self, nazwa, stan, czas=None):
+        with self._blokada:
+            self._stan[nazwa] = stan
+            if czas is not None:
+                self._czasy[nazwa] = czas
+
+    def _uruchom(self):
+        for nazwa, funkcja in self._kroki:
+            self._ustaw(nazwa, W_TOKU)
+            start = time.perf_counter()
+            try:
+                funkcja()
+            except Exception:
+                logger.exception("Rozgrzewka: krok %r nie powiódł się", nazwa)
+                self._ustaw(nazwa, BLAD)
+                continue
+            self._ustaw(nazwa, GOTOWE, time.perf_counter() - start)
+            logger.info("Rozgrzewka: %s w %.2f s", nazwa, self._czasy[nazwa])
+
+    def stan(self):
+        """Lista (nazwa kroku, stan, czas w sekundach albo None) w kolejności kroków."""
+        with self._blokada:
+            return [(nazwa, self._stan[nazwa], self._czasy.get(nazwa)) for nazwa, _ in self._kroki]
+
+    @property
+    def zakonczona(self):
+        return all(stan in (GOTOWE, BLAD) for _, stan, _ in self.stan())
@@ -0,0 +1,131 @@
+"""Silnik DuckDB – agregaty i wiersze leku liczone zapytaniami SQL wprost na magazynie Parquet.
+
+Włączany zmienną środowiskową NEUCA_SILNIK=duckdb. Surowe wiersze nie są ładowane
+do pamięci procesu: DuckDB skanuje partycje strumieniowo (w razie potrzeby z zapisem
+na dysk), a do pandas wracają tylko kostka, zbiór promocji, wymiar rynku i wiersze
+wybranego leku. Moduł analizy liczy z nich te same tabele co w trybie pandas.
+
+Zapytania odtwarzają semantykę pandas: suma pustej grupy to 0, brak rodzaju promocji
+to "Normalna sprzedaż", a dane rynkowe to pierwsza niepusta wartość w kolejności
+wierszy magazynu.
+"""
+import os
+
+import duckdb
+
+import agregaty
+import dane
+
+# Limit pamięci DuckDB (np. "4GB"); domyślnie DuckDB bierze 80% RAM
+LIMIT_PAMIECI = os.environ.get("NEUCA_DUCKDB_PAMIEC")
+
+# Kolejność wierszy jak przy odczycie pyarrow: plik partycji, potem wiersz w pliku
+_KOLEJNOSC_WIERSZY = "filename, file_row_number"
+
+
+def _k(nazwa):
+    """Nazwa kolumny jako identyfikator SQL (polskie znaki i spacje)."""
+    return '"' + nazwa.replace('"', '""') + '"'
+
+
+def _tekst(wartosc):
+    return "'" + str(wartosc).replace("'", "''") + "'"
+
+
+def polacz(katalog=dane.KATALOG_MAGAZYNU):
+    """Połączenie z widokiem `sprzedaz` na partycjach magazynu.
+
+    Połączenie jest wspólne; każde zapytanie idzie przez własny kursor, więc można
+    go używać z wielu sesji (wątków) naraz.
+    """
+    polaczenie = duckdb.connect()
+    if LIMIT_PAMIECI:
+        polaczenie.execute(f"SET memory_limit = {_tekst(LIMIT_PAMIECI)}")
+    polaczenie.execute(f"SET temp_directory = {_tekst(katalog + '.tmp')}")
+    pliki = os.path.join(dane.sciezka_sprzedazy(katalog), "**", "*.parquet")
+    polaczenie.execute(
+        f"CREATE VIEW sprzedaz AS SELECT * FROM read_parquet({_tekst(pliki)}, "
+        "hive_partitioning = true, filename = true, file_row_number = true)"
+    )
+    return polaczenie
+
+
+def _zapytanie(polaczenie, sql, parametry=None):
+    # Relacja z to_arrow_table – fetch_arrow_table połączenia jest przestarzałe od duckdb 1.5,
+    # a to_arrow_table połączenia nie ma w starszych wersjach
+    tabela = polaczenie.cursor().sql(sql, params=parametry).to_arrow_table()
+    df, _ = dane.zastosuj_schemat(tabela)
+    return df
+
+
+def zbuduj_kostke(polaczenie):
+    """Kostka miar i zbiór unikalnych promocji – ten sam układ co agregaty.zbuduj_kostke."""
+    klucz = [kolumna for kolumna in agregaty.KLUCZ_KOSTKI if kolumna != "Koszyk promocji"]
+    budzet, ilosc = _k("Sprzedaż budżetowa"), _k("Sprzedaż ilość")
+    pozostaly = (
+        f"greatest({budzet} - coalesce({_k('Sprzedaż budżetowa ZP')}, 0)"
+        f" - coalesce({_k('Sprzedaż budżetowa promocyjna')}, 0), 0)"
+    )
+    cena = f"{budzet} / nullif({ilosc}, 0)"
+    miary = ", ".join(
+        [f"coalesce(sum({_k(miara)}), 0) AS {_k(miara)}" for miara in agregaty.MIARY]
+        + [
+            f"coalesce(sum({pozostaly}), 0) AS {_k('Budżet normalna')}",
+            f"coalesce(sum({cena}), 0) AS {_k('Suma cen jednostkowych')}",
+            f"count({cena}) AS {_k('Liczba cen')}",
+            f"count(*) AS {_k('Liczba wierszy')}",
+        ]
+    )
+    kolumny_klucza = ", ".join(map(_k, klucz))
+    kostka = _zapytanie(
+        polaczenie,
+        f"SELECT {kolumny_klucza}, {miary} FROM sprzedaz GROUP BY ALL ORDER BY {kolumny_klucza}",
+    )
+    # Koszyk liczymy z rodzaju przed uzupełnieniem braków – jak w warstwie danych
+    kostka.insert(
+        len(klucz), "Koszyk promocji", dane.klasyfikuj_promocje(kostka["Rodzaj promocji poziom 2"])
+    )
+    kostka["Rodzaj promocji poziom 2"] = agregaty.uzupelnij_promocje(kostka["Rodzaj promocji poziom 2"])
+    kostka = agregaty.uporzadkuj_po_lekach(kostka)
+    kostka["Data"] = dane.poczatek_miesiaca(kostka["Okres"])
+
+    rodzaj = _k("Rodzaj promocji poziom 2")
+    kolumny_promocji = ", ".join(
+        f"coalesce({rodzaj}, {_tekst(agregaty.BRAK_PROMOCJI)}) AS {rodzaj}" if kolumna == "Rodzaj promocji poziom 2"
+        else _k(kolumna)
+        for kolumna in agregaty.KLUCZ_PROMOCJI
+    )
+    promocje = _zapytanie(polaczenie, f"SELECT DISTINCT {kolumny_promocji} FROM sprzedaz")
+    promocje["Okres"] = dane.klucz_okresu(promocje["Rok"], promocje["Miesiąc"])
+    return kostka, promocje
+
+
+def zbuduj_wymiar_rynku(polaczenie):
+    """Dane rynkowe raz na (Rok, Miesiąc, Indeks) – pierwsza niepusta wartość, jak groupby().first()."""
+    miary = ", ".join(
+        f"first({_k(miara)} ORDER BY {_KOLEJNOSC_WIERSZY}) FILTER (WHERE {_k(miara)} IS NOT NULL) AS {_k(miara)}"
+        for miara in agregaty.MIARY_RYNKU
+    )
+    rynek = _zapytanie(
+        polaczenie,
+        f"SELECT {', '.join(map(_k, agregaty.KLUCZ_RYNKU))}, {miary} FROM sprzedaz "
+        f"WHERE {_k('Indeks')} IS NOT NULL GROUP BY ALL",
+    )
+    return agregaty.uporzadkuj_po_lekach(rynek)
+
+
+def zbuduj_agregaty(polaczenie):
+    kostka, promocje = zbuduj_kostke(polaczenie)
+    return agregaty.zloz_agregaty(kostka, promocje, zbuduj_wymiar_rynku(polaczenie))
+
+
+def wiersze_leku(polaczenie, indeks, katalog=dane.KATALOG_MAGAZYNU):
+    """Surowe wiersze jednego leku w kolejności okresu – jak wycinek IndeksuLekow w trybie pandas."""
+    kolumny = ", ".join(map(_k, dane.kolumny_magazynu(katalog)))
+    df = _zapytanie(
+        polaczenie,
+        f"SELECT {kolumny} FROM sprzedaz WHERE {_k('Indeks')} = ? "
+        f"ORDER BY {_k('Rok')}, {_k('Miesiąc')}, {_KOLEJNOSC_WIERSZY}",
+        [indeks],
+    )
+    return dane.dodaj_kolumny_pochodne(df)
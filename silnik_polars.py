@@ -0,0 +1,114 @@
+"""Silnik Polars – agregaty i wiersze leku liczone leniwymi zapytaniami wprost na magazynie Parquet.
+
+Włączany zmienną środowiskową NEUCA_SILNIK=polars. Zapytania są planami LazyFrame:
+Polars czyta tylko potrzebne kolumny (projection pushdown), pomija partycje i grupy
+wierszy niepasujące do filtra (predicate pushdown), a agregacje wykonuje wielowątkowo
+silnikiem strumieniowym, bez ładowania całego magazynu do pamięci. Do pandas wracają
+tylko kostka, zbiór promocji, wymiar rynku i wiersze wybranego leku – tabele modułów
+liczy z nich moduł analizy, tak jak w pozostałych silnikach.
+
+Semantyka jak w pandas: suma pustej grupy to 0, brak rodzaju promocji to
+"Normalna sprzedaż", a dane rynkowe to pierwsza niepusta wartość w kolejności
+wierszy magazynu.
+"""
+import os
+
+import polars as pl
+
+import agregaty
+import dane
+
+# Silnik wykonania zapytań agregujących cały magazyn; "in-memory" – klasyczny silnik Polars
+SILNIK_WYKONANIA = os.environ.get("NEUCA_POLARS_SILNIK", "streaming")
+
+_WIERSZ = "__wiersz"
+
+
+def skanuj(katalog=dane.KATALOG_MAGAZYNU):
+    """Leniwa ramka na partycjach magazynu z numerem wiersza w kolejności odczytu pyarrow."""
+    pliki = os.path.join(dane.sciezka_sprzedazy(katalog), "**", "*.parquet")
+    return pl.scan_parquet(pliki, hive_partitioning=True, row_index_name=_WIERSZ)
+
+
+def _do_pandas(ramka):
+    # Najstarszy poziom zgodności: teksty jako large_string, które zna zastosuj_schemat
+    df, _ = dane.zastosuj_schemat(ramka.to_arrow(compat_level=pl.CompatLevel.oldest()))
+    return df
+
+
+def zbuduj_kostke(katalog=dane.KATALOG_MAGAZYNU):
+    """Kostka miar i zbiór unikalnych promocji – ten sam układ co agregaty.zbuduj_kostke."""
+    klucz = [kolumna for kolumna in agregaty.KLUCZ_KOSTKI if kolumna != "Koszyk promocji"]
+    budzet, ilosc = pl.col("Sprzedaż budżetowa"), pl.col("Sprzedaż ilość").cast(pl.Float64)
+    pozostaly = (
+        budzet - pl.col("Sprzedaż budżetowa ZP").fill_null(0) - pl.col("Sprzedaż budżetowa promocyjna").fill_null(0)
+    ).clip(lower_bound=0)
+    cena = pl.when(ilosc != 0).then(budzet / ilosc)
+
+    kostka = _do_pandas(
+        skanuj(katalog)
+        .group_by(klucz)
+        .agg(
+            *[pl.col(miara).sum() for miara in agregaty.MIARY],
+            pozostaly.sum().alias("Budżet normalna"),
+            cena.sum().alias("Suma cen jednostkowych"),
+            cena.count().cast(pl.Int64).alias("Liczba cen"),
+            pl.len().cast(pl.Int64).alias("Liczba wierszy"),
+        )
+        .sort(klucz, nulls_last=False)
+        .collect(engine=SILNIK_WYKONANIA)
+    )
+    # Koszyk liczymy z rodzaju przed uzupełnieniem braków – jak w warstwie danych
+    kostka.insert(
+        len(klucz), "Koszyk promocji", dane.klasyfikuj_promocje(kostka["Rodzaj promocji poziom 2"])
+    )
+    kostka["Rodzaj promocji poziom 2"] = agregaty.uzupelnij_promocje(kostka["Rodzaj promocji poziom 2"])
+    kostka = agregaty.uporzadkuj_po_lekach(kostka)
+    kostka["Data"] = dane.poczatek_miesiaca(kostka["Okres"])
+
+    promocje = _do_pandas(
+        skanuj(katalog)
+        .select(
+            pl.col("Rodzaj promocji poziom 2").fill_null(agregaty.BRAK_PROMOCJI)
+            if kolumna == "Rodzaj promocji poziom 2" else pl.col(kolumna)
+            for kolumna in agregaty.KLUCZ_PROMOCJI
+        )
+        .unique()
+        .collect(engine=SILNIK_WYKONANIA)
+    )
+    promocje["Okres"] = dane.klucz_okresu(promocje["Rok"], promocje["Miesiąc"])
+    return kostka, promocje
+
+
+def zbuduj_wymiar_rynku(katalog=dane.KATALOG_MAGAZYNU):
+    """Dane rynkowe raz na (Rok, Miesiąc, Indeks) – pierwsza niepusta wartość, jak groupby().first()."""
+    # Numer wiersza jawnie porządkuje "pierwszą" wartość – silnik strumieniowy nie gwarantuje
+    # kolejności wierszy wewnątrz grupy
+    rynek = _do_pandas(
+        skanuj(katalog)
+        .filter(pl.col("Indeks").is_not_null())
+        .group_by(agregaty.KLUCZ_RYNKU)
+        .agg(
+            pl.col(miara).sort_by(pl.col(miara).is_null(), _WIERSZ).first()
+            for miara in agregaty.MIARY_RYNKU
+        )
+        .collect(engine=SILNIK_WYKONANIA)
+    )
+    return agregaty.uporzadkuj_po_lekach(rynek)
+
+
+def zbuduj_agregaty(katalog=dane.KATALOG_MAGAZYNU):
+    kostka, promocje = zbuduj_kostke(katalog)
+    return agregaty.zloz_agregaty(kostka, promocje, zbuduj_wymiar_rynku(katalog))
+
+
+def wiersze_leku(indeks, katalog=dane.KATALOG_MAGAZYNU):
+    """Surowe wiersze jednego leku w kolejności okresu – jak wycinek IndeksuLekow w trybie pandas."""
+    df = _do_pandas(
+        skanuj(katalog)
+        .filter(pl.col("Indeks") == indeks)
+        .sort(["Rok", "Miesiąc", _WIERSZ])
+        .select(dane.kolumny_magazynu(katalog))
+        .collect()
+    )
+    return dane.dodaj_kolumny_pochodne(df)
@@ -0,0 +1,117 @@
+"""Tabela stronicowana: do przeglądarki trafia tylko widoczna strona wyników.
+
+Sortowanie i filtrowanie odbywają się po stronie serwera, a pełny wynik (po filtrze)
+można pobrać jako CSV albo Parquet – plik powstaje dopiero po kliknięciu przycisku,
+więc nie jest osadzany w stronie. Rozmiar danych wysyłanych przy każdej interakcji
+zależy od rozmiaru strony, a nie od liczby pasujących wierszy.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ROZMIARY_STRON = [25, 50, 100, 250]
+BEZ_SORTOWANIA = "(bez sortowania)"
+
+
+def _pasuje(kolumna, fraza):
+    """Maska wierszy, w których wartość kolumny zawiera frazę (bez rozróżniania wielkości liter)."""
+    if isinstance(kolumna.dtype, pd.CategoricalDtype):
+        # Frazę sprawdzamy raz na kategorię, nie na wiersz
+        kategorie = pd.Series(kolumna.cat.categories.astype(str))
+        trafione = np.append(kategorie.str.contains(fraza, case=False, regex=False).to_numpy(), False)
+        return trafione[kolumna.cat.codes.to_numpy()]
+    tekst = kolumna.astype("string").str.contains(fraza, case=False, regex=False)
+    return tekst.fillna(False).to_numpy(dtype=bool)
+
+
+def pozycje_wierszy(ramka, kolumna_filtra=None, fraza="", kolumna_sortowania=None, rosnaco=True):
+    """Pozycje (iloc) wierszy po filtrze i sortowaniu – bez kopiowania samej ramki."""
+    pozycje = np.arange(len(ramka))
+    if kolumna_filtra and fraza:
+        pozycje = pozycje[_pasuje(ramka[kolumna_filtra], fraza)]
+    if kolumna_sortowania:
+        klucz = ramka[kolumna_sortowania].iloc[pozycje].reset_index(drop=True)
+        kolejnosc = klucz.sort_values(ascending=rosnaco, kind="stable", na_position="last").index
+        pozycje = pozycje[kolejnosc.to_numpy()]
+    return pozycje
+
+
+def do_csv(ramka):
+    return ramka.to_csv(index=False).encode("utf-8")
+
+
+def do_parquet(ramka):
+    bufor = io.BytesIO()
+    ramka.to_parquet(bufor, index=False)
+    return bufor.getvalue()
+
+
+def _liczba(n):
+    """Liczba całkowita ze spacją jako separatorem tysięcy."""
+    return f"{n:,}".replace(",", " ")
+
+
+def _wroc_na_pierwsza(klucz):
+    st.session_state[f"{klucz}_strona"] = 1
+
+
+def pokaz_tabele(ramka, klucz, nazwa_pliku, column_config=None, **opcje):
+    """st.dataframe z jedną stroną wyników, sortowaniem, filtrem i pobieraniem całości.
+
+    Kolumny ukryte w column_config (wartość None) są pomijane także w filtrze,
+    sortowaniu i pobieranym pliku. Pozostałe opcje trafiają wprost do st.dataframe.
+    """
+    ukryte = {nazwa for nazwa, ustawienie in (column_config or {}).items() if ustawienie is None}
+    kolumny = [kolumna for kolumna in ramka.columns if kolumna not in ukryte]
+    zmiana = dict(on_change=_wroc_na_pierwsza, args=(klucz,))
+
+    sort1, sort2, filtr1, filtr2 = st.columns([2, 1, 2, 2])
+    kolumna_sortowania = sort1.selectbox(
+        "Sortuj wg", [BEZ_SORTOWANIA] + kolumny, key=f"{klucz}_sortowanie", **zmiana
+    )
+    rosnaco = sort2.radio("Kierunek", ["rosnąco", "malejąco"], key=f"{klucz}_kierunek", **zmiana) == "rosnąco"
+    kolumna_filtra = filtr1.selectbox("Filtruj kolumnę", kolumny, key=f"{klucz}_kolumna_filtra", **zmiana)
+    fraza = filtr2.text_input("Zawiera", key=f"{klucz}_fraza", **zmiana).strip()
+
+    pozycje = pozycje_wierszy(
+        ramka,
+        kolumna_filtra,
+        fraza,
+        None if kolumna_sortowania == BEZ_SORTOWANIA else kolumna_sortowania,
+        rosnaco,
+    )
+
+    stronicowanie1, stronicowanie2, opis = st.columns([1, 1, 2])
+    rozmiar_strony = stronicowanie1.selectbox(
+        "Wierszy na stronę", ROZMIARY_STRON, index=1, key=f"{klucz}_rozmiar", **zmiana
+    )
+    liczba_stron = max(1, -(-len(pozycje) // rozmiar_strony))
+    if st.session_state.get(f"{klucz}_strona", 1) > liczba_stron:
+        _wroc_na_pierwsza(klucz)
+    strona = stronicowanie2.number_input(
+        "Strona", min_value=1, max_value=liczba_stron, step=1, key=f"{klucz}_strona"
+    )
+    poczatek = (strona - 1) * rozmiar_strony
+    koniec = min(poczatek + rozmiar_strony, len(pozycje))
+    opis.caption(
+        f"Wiersze {_liczba(poczatek + 1 if len(pozycje) else 0)}–{_liczba(koniec)} z {_liczba(len(pozycje))} "
+        f"(wszystkich {_liczba(len(ramka))}), strona {strona} z {liczba_stron}"
+    )
+
+    st.dataframe(ramka.iloc[pozycje[poczatek:koniec]], column_config=column_config, **opcje)
+
+    # Plik powstaje w osobnym wątku dopiero po kliknięciu – funkcje dostają gotowe pozycje
+    def wynik():
+        return ramka.iloc[pozycje][kolumny]
+
+    pobierz1, pobierz2, _ = st.columns([1, 1, 4])
+    pobierz1.download_button(
+        "⬇️ Pobierz CSV", lambda: do_csv(wynik()), file_name=f"{nazwa_pliku}.csv",
+        mime="text/csv", key=f"{klucz}_csv", on_click="ignore",
+    )
+    pobierz2.download_button(
+        "⬇️ Pobierz Parquet", lambda: do_parquet(wynik()), file_name=f"{nazwa_pliku}.parquet",
+        mime="application/vnd.apache.parquet", key=f"{klucz}_parquet", on_click="ignore",
+    )
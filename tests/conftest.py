@@ -0,0 +1,38 @@
+"""Wspólne dane testów: mały magazyn z danych syntetycznych (benchmarki.generator_danych)."""
+import pyarrow.dataset as ds
+import pytest
+
+import dane
+from benchmarki import generator_danych
+
+WIERSZE = 20000
+
+
+@pytest.fixture(scope="session")
+def pliki_csv(tmp_path_factory):
+    """(pełne_dane.csv, nazwy.csv) – generowane raz na całą sesję testów."""
+    return generator_danych.zapisz_csv(str(tmp_path_factory.mktemp("csv")), WIERSZE)
+
+
+@pytest.fixture
+def magazyn(pliki_csv, tmp_path):
+    """Świeży magazyn dla testu, który może go zmieniać."""
+    katalog = str(tmp_path / "magazyn_danych")
+    dane.przygotuj_magazyn(*pliki_csv, katalog)
+    return katalog
+
+
+@pytest.fixture
+def zapisz_delte(tmp_path):
+    """Funkcja zapisująca plik delty z wierszy magazynu: miesiąc `z_okresu` przeniesiony na `na_okres`."""
+    def zapisz(katalog, z_okresu, na_okres, frakcja=1.0, mnoznik=1, nazwa="delta.csv"):
+        tabela = ds.dataset(dane.sciezka_sprzedazy(katalog), partitioning=dane.partycjonowanie()).to_table()
+        df = tabela.to_pandas()[dane.kolumny_magazynu(katalog)]
+        (rok, miesiac), (nowy_rok, nowy_miesiac) = z_okresu, na_okres
+        miesiac_df = df[(df["Rok"] == rok) & (df["Miesiąc"] == miesiac)]
+        miesiac_df = miesiac_df.sample(frac=frakcja, random_state=0).assign(Rok=nowy_rok, **{"Miesiąc": nowy_miesiac})
+        miesiac_df["Sprzedaż ilość"] = miesiac_df["Sprzedaż ilość"] * mnoznik
+        sciezka = str(tmp_path / nazwa)
+        miesiac_df.to_csv(sciezka)
+        return sciezka
+    return zapisz
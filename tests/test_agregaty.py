@@ -0,0 +1,38 @@
+import pandas as pd
+
+import agregaty
+import analizy
+import dane
+
+
+def _wiersze(indeks, miesiac, budzet, rynek, liczba):
+    """`liczba` wierszy leku w miesiącu – każdy z tymi samymi danymi rynkowymi."""
+    return pd.DataFrame({
+        "Rok": 2024,
+        "Miesiąc": miesiac,
+        "Indeks": indeks,
+        "Kategoria nazwa": "Leki",
+        "Rodzaj promocji poziom 2": None,
+        "Id promocji": None,
+        "Sprzedaż ilość": 1,
+        "Sprzedaż budżetowa": budzet,
+        "Sprzedaż budżetowa ZP": 0.0,
+        "Sprzedaż budżetowa promocyjna": 0.0,
+        "Sprzedaż rynek ilość": 10,
+        "Sprzedaż rynek wartość": rynek,
+    }, index=range(liczba))
+
+
+def test_udzial_liczy_rynek_raz_na_lek_i_miesiac():
+    df = pd.concat([
+        _wiersze(1, 1, 100.0, 1000.0, liczba=3),
+        _wiersze(2, 1, 50.0, 500.0, liczba=1),
+        _wiersze(1, 2, 100.0, 1000.0, liczba=5),
+    ], ignore_index=True)
+    df = dane.dodaj_kolumny_pochodne(df)
+
+    tabela = analizy.tabela_udzialowa(agregaty.zbuduj_agregaty(df)).set_index("Miesiąc")
+    assert tabela.loc[1, "Rynek_sprzedaz"] == 1500.0
+    assert tabela.loc[1, "Udział NEUCA [%]"] == 23.33
+    assert tabela.loc[2, "Rynek_sprzedaz"] == 1000.0
+    assert tabela.loc[2, "Udział NEUCA [%]"] == 50.0
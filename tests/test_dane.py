@@ -0,0 +1,29 @@
+import pandas as pd
+
+import dane
+
+KOLUMNY = ["Indeks", "Rok", "Miesiąc", "Sprzedaż ilość", "Sprzedaż budżetowa"]
+
+
+def test_sprzedaz_leniwa_jak_wczytaj_sprzedaz(magazyn):
+    oczekiwane, _ = dane.wczytaj_sprzedaz(katalog=magazyn)
+    zrodlo = dane.SprzedazLeniwa(magazyn)
+    zrodlo.ramka(["Indeks"])
+    pd.testing.assert_frame_equal(zrodlo.ramka(), oczekiwane)
+
+
+def test_sprzedaz_leniwa_po_podmianie_partycji(magazyn, zapisz_delte):
+    zrodlo = dane.SprzedazLeniwa(magazyn)
+    przed = zrodlo.ramka(["Indeks"])
+    rok, miesiac = dane.wczytaj_sprzedaz(kolumny=["Rok", "Miesiąc"], katalog=magazyn)[0].iloc[-1][["Rok", "Miesiąc"]]
+    # Ostatni miesiąc zastąpiony mniejszą liczbą wierszy, a nowy dopisany – wersja jeszcze bez zmian
+    dane.dopisz_partycje(zapisz_delte(magazyn, (rok, miesiac), (rok, miesiac), frakcja=0.5, mnoznik=2, nazwa="korekta.csv"), magazyn)
+    dane.dopisz_partycje(zapisz_delte(magazyn, (rok, miesiac), (rok + 1, 1), nazwa="nowy.csv"), magazyn)
+
+    oczekiwane, _ = dane.wczytaj_sprzedaz(katalog=magazyn)
+    assert len(oczekiwane) != len(przed)
+    po = zrodlo.ramka(KOLUMNY)
+    pd.testing.assert_frame_equal(po, oczekiwane[KOLUMNY])
+    indeks_lekow = dane.IndeksLekow(po["Indeks"])
+    for lek in indeks_lekow.lista[:50]:
+        assert (po["Indeks"].iloc[indeks_lekow.zakres(lek)] == lek).all()
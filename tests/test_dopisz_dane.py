@@ -0,0 +1,50 @@
+import pandas as pd
+
+import agregaty
+import dane
+import dopisz_dane
+
+
+def _posortowane(ramka, klucz):
+    return ramka.sort_values(klucz, kind="stable", ignore_index=True)
+
+
+def test_dopisz_jak_pelna_przebudowa(pliki_csv, magazyn, zapisz_delte, tmp_path):
+    agregaty.przygotuj_agregaty(dane.wersja_magazynu(magazyn), magazyn)
+    rok, miesiac = dane.wczytaj_sprzedaz(kolumny=["Rok", "Miesiąc"], katalog=magazyn)[0].iloc[-1][["Rok", "Miesiąc"]]
+    # Korekta istniejącego miesiąca i nowy miesiąc – oba przez dopisz, jak z wiersza poleceń
+    delty = [
+        zapisz_delte(magazyn, (rok, miesiac), (rok, miesiac), frakcja=0.5, mnoznik=2, nazwa="korekta.csv"),
+        zapisz_delte(magazyn, (rok, miesiac), (rok + 1, 1), nazwa="nowy.csv"),
+    ]
+    for sciezka in delty:
+        dopisz_dane.dopisz(sciezka, magazyn)
+    assert dane.wersja_agregatow(magazyn) == dane.wersja_magazynu(magazyn)
+
+    # Te same dane jako jeden plik CSV zbudowany od zera
+    sciezka_danych, sciezka_nazw = pliki_csv
+    pelne = pd.read_csv(sciezka_danych, index_col=0, low_memory=False)
+    pelne = pelne[~((pelne["Rok"] == rok) & (pelne["Miesiąc"] == miesiac))]
+    sciezka_pelnych = str(tmp_path / "pelne_po_dopisaniu.csv")
+    pd.concat([pelne] + [pd.read_csv(sciezka, index_col=0) for sciezka in delty], ignore_index=True).to_csv(sciezka_pelnych)
+    przebudowa = str(tmp_path / "przebudowa")
+    dane.zbuduj_magazyn(sciezka_pelnych, sciezka_nazw, przebudowa)
+
+    kolumny = dane.kolumny_magazynu(magazyn)
+    pd.testing.assert_frame_equal(
+        _posortowane(dane.wczytaj_sprzedaz(katalog=magazyn)[0], kolumny),
+        _posortowane(dane.wczytaj_sprzedaz(katalog=przebudowa)[0], kolumny),
+    )
+
+    dopisane = agregaty.wczytaj_agregaty(magazyn)
+    oczekiwane = agregaty.przygotuj_agregaty(dane.wersja_magazynu(przebudowa), przebudowa)
+    assert dopisane.okresy == oczekiwane.okresy
+    for nazwa, klucz in [
+        ("kostka", agregaty.KLUCZ_KOSTKI),
+        ("promocje", agregaty.KLUCZ_PROMOCJI),
+        ("rynek", agregaty.KLUCZ_RYNKU),
+    ]:
+        pd.testing.assert_frame_equal(
+            _posortowane(getattr(dopisane, nazwa), klucz),
+            _posortowane(getattr(oczekiwane, nazwa), klucz),
+        )
@@ -0,0 +1,28 @@
+"""Zgodność silników duckdb i polars z wersją pandas (benchmarki.zgodnosc) na małych danych syntetycznych."""
+import pytest
+
+import dane
+from benchmarki import generator_danych, zgodnosc
+
+# Na tyle dużo, żeby każdy miesiąc, rodzaj promocji i koszyk miał wiersze, a test trwał sekundy
+WIERSZE = 20000
+LEKI = 20
+
+
+@pytest.fixture(scope="module")
+def magazyn(tmp_path_factory):
+    katalog = tmp_path_factory.mktemp("zgodnosc")
+    sciezka_danych, sciezka_nazw = generator_danych.zapisz_csv(str(katalog), WIERSZE)
+    magazyn = str(katalog / "magazyn_danych")
+    dane.przygotuj_magazyn(sciezka_danych, sciezka_nazw, magazyn)
+    return magazyn
+
+
+@pytest.mark.parametrize("silnik", list(zgodnosc.SILNIKI))
+def test_silnik_zgodny_z_pandas(magazyn, silnik):
+    pytest.importorskip(silnik)
+    wyniki = zgodnosc.sprawdz(magazyn, [silnik], liczba_lekow=LEKI)
+    roznice = [f"{w['Sprawdzenie']}: {w['Szczegóły']}" for w in wyniki if w["Wynik"] != "zgodne"]
+    assert not roznice, "\n".join(roznice)
+    # Sprawdzenia agregatów, tabel modułów, widoku i wierszy leków – nie tylko budowa
+    assert len(wyniki) > 4
@@ -0,0 +1,174 @@
+"""Budowanie cięższych wykresów panelu z ograniczonym rozmiarem figury.
+
+Zasady: liczba kategorii na osi jest ograniczona (top-N + "Pozostałe"), opisy
+w dymkach składa przeglądarka z customdata (hovertemplate) zamiast tekstu
+budowanego w Pythonie element po elemencie, a serie jednego rodzaju trafiają
+do jednej figury z panelami zamiast N osobnych figur. Czas budowy każdej figury
+trafia do modułu pomiary, a rozmiar JSON – tylko przy pomiary.SZCZEGOLOWE (dodatkowa
+serializacja kosztuje tyle, co wysłanie figury).
+"""
+import functools
+import logging
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import dane
+import pomiary
+
+logger = logging.getLogger(__name__)
+
+# Maksymalna liczba kategorii na osi; reszta trafia do jednej pozycji
+LIMIT_KATEGORII = 15
+POZOSTALE = "Pozostałe"
+# Figura większa niż ten rozmiar JSON jest odnotowywana w logu
+LIMIT_ROZMIARU = 1 * 2**20
+
+_SKLADNIKI_BUDZETU = [
+    ("Budget_ZP", "ZP"),
+    ("Budget_Promocyjna", "Promocyjna"),
+    ("Budget_Normalna", "Pozostała"),
+]
+
+def mierzony(funkcja):
+    """Zapisuje w pomiarach czas budowy, a przy szczegółowych pomiarach też rozmiar JSON figury."""
+    @functools.wraps(funkcja)
+    def opakowana(*args, **kwargs):
+        with pomiary.mierz(f"wykres · {funkcja.__name__}"):
+            fig = funkcja(*args, **kwargs)
+        if not pomiary.SZCZEGOLOWE:
+            return fig
+        bajty = len(pio.to_json(fig, validate=False))
+        pomiary.zapisz_bajty(f"wykres · {funkcja.__name__} (JSON)", bajty)
+        if bajty > LIMIT_ROZMIARU:
+            logger.warning("Wykres %s ma %.1f MB JSON", funkcja.__name__, bajty / 2**20)
+        return fig
+    return opakowana
+
+
+def ogranicz_kategorie(ramka, kategoria, miary, limit=LIMIT_KATEGORII):
+    """Pierwsze `limit` wierszy ramki (już posortowanej) i suma pozostałych jako "Pozostałe"."""
+    if len(ramka) <= limit:
+        return ramka
+    reszta = ramka.iloc[limit - 1:]
+    pozostale = pd.DataFrame({kategoria: [f"{POZOSTALE} ({len(reszta)})"], **{m: [reszta[m].sum()] for m in miary}})
+    return pd.concat([ramka.iloc[:limit - 1], pozostale], ignore_index=True)
+
+
+@mierzony
+def struktura_budzetu(budzet, limit=LIMIT_KATEGORII):
+    """Słupki skumulowane ZP / promocyjna / pozostała wg leku; w dymku udział w budżecie leku."""
+    miary = [skladnik for skladnik, _ in _SKLADNIKI_BUDZETU] + ["Suma_budzetowa"]
+    wykres = ogranicz_kategorie(budzet, "Nazwa leku", miary, limit)
+
+    fig = go.Figure()
+    for skladnik, nazwa in _SKLADNIKI_BUDZETU:
+        fig.add_bar(
+            x=wykres["Nazwa leku"],
+            y=wykres[skladnik],
+            name=nazwa,
+            customdata=(wykres[skladnik] / wykres["Suma_budzetowa"] * 100).to_numpy(),
+            hovertemplate="%{customdata:.2f}%<extra></extra>",
+        )
+    fig.update_layout(
+        barmode='stack',
+        title='Struktura sprzedaży budżetowej wg leku',
+        xaxis_title='Lek',
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),  # Ukrycie osi Y
+        height=600,
+        showlegend=True,
+    )
+    return fig
+
+
+@mierzony
+def sprzedaz_wg_rodzaju(sprzedaz, rok, wysokosc_panelu=300):
+    """Miesięczna sprzedaż każdego rodzaju promocji – jedna figura, po panelu (z tytułem) na rodzaj.
+
+    Osie Y paneli są niezależne i zaczynają się od zera, jak w osobnych wykresach.
+    """
+    rodzaje = sprzedaz["Rodzaj promocji poziom 2"].unique()
+    fig = px.line(
+        sprzedaz,
+        x="Miesiąc",
+        y="Liczba sprzedanych sztuk",
+        facet_col="Rodzaj promocji poziom 2",
+        facet_col_wrap=1,
+        category_orders={"Rodzaj promocji poziom 2": list(rodzaje)},
+        markers=True,
+        facet_row_spacing=min(0.04, 0.5 / max(len(rodzaje), 2)),
+        height=max(1, len(rodzaje)) * wysokosc_panelu,
+        render_mode="auto",  # WebGL, gdy punktów jest dużo
+    )
+    fig.for_each_annotation(lambda opis: opis.update(text=f"Sprzedaż: {opis.text.split('=', 1)[-1]} ({rok})"))
+    fig.update_yaxes(matches=None, rangemode="tozero", title_text="Liczba sprzedanych sztuk")
+    fig.update_xaxes(tickmode='linear', dtick=1, showticklabels=True)
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def _najwieksze_leki(podsumowanie, limit):
+    """`limit` leków o największej sprzedaży budżetowej z etykietą "nazwa (indeks)" i dopiskiem do tytułu."""
+    wykres = podsumowanie.nlargest(limit, "Sprzedaż budżetowa").assign(
+        Lek=lambda ramka: ramka["Nazwa leku"].astype("string").fillna("?") + " (" + ramka["Indeks"].astype("string") + ")"
+    )
+    dopisek = f" – {len(wykres)} z {len(podsumowanie)} leków o największej sprzedaży" if len(wykres) < len(podsumowanie) else ""
+    return wykres, dopisek
+
+
+@mierzony
+def udzialy_lekow(podsumowanie, limit=LIMIT_KATEGORII):
+    """Udział wartościowy i ilościowy NEUCA w rynku – para słupków poziomych na lek."""
+    wykres, dopisek = _najwieksze_leki(podsumowanie, limit)
+    fig = go.Figure()
+    for miara, nazwa in [("Udział wartościowy [%]", "Wartościowy"), ("Udział ilościowy [%]", "Ilościowy")]:
+        fig.add_bar(
+            y=wykres["Lek"], x=wykres[miara], name=nazwa, orientation="h",
+            hovertemplate="%{x:.2f}%<extra></extra>",
+        )
+    fig.update_layout(
+        barmode="group",
+        title=f"Udział NEUCA w rynku{dopisek}",
+        xaxis_title="Udział [%]",
+        yaxis=dict(autorange="reversed"),
+        height=max(300, 40 * len(wykres) + 150),
+    )
+    return fig
+
+
+@mierzony
+def promocje_lekow(podsumowanie, limit=LIMIT_KATEGORII):
+    """Struktura sprzedaży (sztuki) w grupach promocji – słupek 100% na lek, w dymku liczba sztuk."""
+    wykres, dopisek = _najwieksze_leki(podsumowanie, limit)
+    fig = go.Figure()
+    for koszyk in dane.KOSZYKI_PROMOCJI:
+        fig.add_bar(
+            y=wykres["Lek"], x=wykres[f"{koszyk} – udział [%]"], name=koszyk, orientation="h",
+            customdata=wykres[f"{koszyk} – ilość"].to_numpy(),
+            hovertemplate="%{x:.1f}% (%{customdata:,.0f} szt.)<extra></extra>",
+        )
+    fig.update_layout(
+        barmode="stack",
+        title=f"Udział grup promocji w sprzedaży{dopisek}",
+        xaxis=dict(range=[0, 100], title="Udział [%]"),
+        yaxis=dict(autorange="reversed"),
+        height=max(300, 30 * len(wykres) + 150),
+    )
+    return fig
+
+
+@mierzony
+def trend_lekow(trend, podsumowanie, miara, tytul, limit=LIMIT_KATEGORII):
+    """Miesięczny przebieg miary – linie leków nałożone na jednej osi."""
+    wykres, dopisek = _najwieksze_leki(podsumowanie, limit)
+    linie = trend.merge(wykres[["Indeks", "Lek"]], on="Indeks")
+    fig = px.line(
+        linie, x="Data", y=miara, color="Lek",
+        category_orders={"Lek": wykres["Lek"].tolist()},
+        markers=True, title=f"{tytul}{dopisek}",
+        render_mode="auto",  # WebGL, gdy punktów jest dużo
+    )
+    fig.update_layout(hovermode="x unified", height=450)
+    return fig